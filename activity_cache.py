@@ -0,0 +1,198 @@
+"""
+Strava Activity Detail Cache
+============================
+
+On-disk cache of `GET /activities/{id}` responses, so re-running a backfill
+or switching the target form doesn't spend the daily Strava budget on
+activities fetched minutes earlier.
+
+Layout (under STRAVA_ACTIVITY_CACHE_DIR, default .cache/activities):
+    blobs/ab/abcdef....json   activity JSON, named by the SHA-256 of its content
+    refs/<activity_id>.json   {"sha256": ..., "fetched_at": ...}
+
+Blobs are content-addressed: a read whose content doesn't hash to its name is
+treated as a miss, so a torn write can never be served. Refs carry the fetch
+time for the TTL; their mtime is touched on every hit and drives LRU eviction
+once the blobs exceed the size limit.
+
+Configuration (environment variables):
+    STRAVA_ACTIVITY_CACHE_DIR     Cache directory (default: .cache/activities)
+    STRAVA_ACTIVITY_CACHE_TTL     Seconds a cached detail stays fresh (default: 86400)
+    STRAVA_ACTIVITY_CACHE_MAX_MB  Size limit before eviction (default: 200)
+    STRAVA_TRUST_CACHE            true = serve cached details regardless of age
+"""
+
+import contextlib
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import Counter
+
+CACHE_DIR = os.environ.get("STRAVA_ACTIVITY_CACHE_DIR", ".cache/activities")
+CACHE_TTL = int(os.environ.get("STRAVA_ACTIVITY_CACHE_TTL", "86400"))
+CACHE_MAX_BYTES = int(float(os.environ.get("STRAVA_ACTIVITY_CACHE_MAX_MB", "200")) * 1024 * 1024)
+TRUST_CACHE = os.environ.get("STRAVA_TRUST_CACHE", "false").lower() == "true"
+
+# Check the size limit every this many writes rather than on each one
+EVICT_EVERY = 25
+
+# A blob is written just before its ref, so a new blob without a ref may be a
+# put in progress (in another thread or process) rather than an orphan
+ORPHAN_GRACE_SECONDS = 300
+
+
+def _atomic_write(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _unlink_quietly(path):
+    # Another thread or process (a sharded backfill) may have evicted it already
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(path)
+
+
+class ActivityCache:
+    def __init__(self, cache_dir=None, ttl=CACHE_TTL, max_bytes=CACHE_MAX_BYTES, trust=TRUST_CACHE):
+        self.cache_dir = cache_dir or CACHE_DIR
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.trust = trust
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def _ref_path(self, activity_id):
+        return os.path.join(self.cache_dir, "refs", f"{activity_id}.json")
+
+    def _blob_path(self, digest):
+        return os.path.join(self.cache_dir, "blobs", digest[:2], f"{digest}.json")
+
+    def get(self, activity_id):
+        """Return the cached activity detail, or None on a miss/expired entry."""
+        ref_path = self._ref_path(activity_id)
+        try:
+            with open(ref_path) as f:
+                ref = json.load(f)
+            if not self.trust and time.time() - ref["fetched_at"] > self.ttl:
+                self.misses += 1
+                return None
+
+            digest = ref["sha256"]
+            with open(self._blob_path(digest), 'rb') as f:
+                data = f.read()
+            if hashlib.sha256(data).hexdigest() != digest:
+                self.misses += 1
+                return None
+
+            os.utime(ref_path)  # Mark as recently used for eviction
+            self.hits += 1
+            return json.loads(data)
+        except (OSError, ValueError, KeyError):
+            self.misses += 1
+            return None
+
+    def put(self, activity_id, activity):
+        """Store an activity detail response."""
+        data = json.dumps(activity, sort_keys=True, separators=(',', ':')).encode('utf-8')
+        digest = hashlib.sha256(data).hexdigest()
+        try:
+            blob_path = self._blob_path(digest)
+            if not os.path.exists(blob_path):
+                _atomic_write(blob_path, data)
+            ref = {"sha256": digest, "fetched_at": time.time()}
+            _atomic_write(self._ref_path(activity_id), json.dumps(ref).encode('utf-8'))
+        except OSError as e:
+            print(f"Warning: Could not write activity cache: {e}")
+            return
+
+        with self._lock:
+            self._writes += 1
+            due = self._writes % EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def evict(self):
+        """Drop least-recently-used entries until the cache fits max_bytes.
+
+        Returns:
+            int: number of refs removed
+        """
+        refs_dir = os.path.join(self.cache_dir, "refs")
+        blobs_dir = os.path.join(self.cache_dir, "blobs")
+        if not os.path.isdir(refs_dir):
+            return 0
+
+        with self._lock:
+            refs = []
+            for entry in os.scandir(refs_dir):
+                try:
+                    with open(entry.path) as f:
+                        refs.append((entry.stat().st_mtime, entry.path, json.load(f)["sha256"]))
+                except (OSError, ValueError, KeyError):
+                    _unlink_quietly(entry.path)
+
+            blob_sizes = {}
+            blob_mtimes = {}
+            for root, _dirs, files in os.walk(blobs_dir):
+                for name in files:
+                    if not name.endswith('.json'):
+                        continue
+                    try:
+                        stat = os.stat(os.path.join(root, name))
+                    except FileNotFoundError:
+                        continue
+                    digest = name[:-len('.json')]
+                    blob_sizes[digest] = stat.st_size
+                    blob_mtimes[digest] = stat.st_mtime
+
+            # Orphaned blobs (activity re-fetched with new content) go first
+            ref_counts = Counter(digest for _mtime, _path, digest in refs)
+            grace_cutoff = time.time() - ORPHAN_GRACE_SECONDS
+            for digest in set(blob_sizes) - set(ref_counts):
+                if blob_mtimes[digest] > grace_cutoff:
+                    continue
+                _unlink_quietly(self._blob_path(digest))
+                del blob_sizes[digest]
+
+            total = sum(blob_sizes.values())
+            removed = 0
+            refs.sort()
+            for _mtime, path, digest in refs:
+                if total <= self.max_bytes:
+                    break
+                _unlink_quietly(path)
+                removed += 1
+                ref_counts[digest] -= 1
+                if digest in blob_sizes and ref_counts[digest] <= 0:
+                    _unlink_quietly(self._blob_path(digest))
+                    total -= blob_sizes.pop(digest)
+            return removed
+
+
+_cache = None
+
+def get_activity_cache():
+    """Return the process-wide activity cache."""
+    global _cache
+    if _cache is None:
+        _cache = ActivityCache()
+    return _cache
+
+
+def set_trust_cache(enabled=True):
+    """Serve cached details regardless of age (for re-running a backfill)."""
+    get_activity_cache().trust = enabled
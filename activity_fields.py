@@ -0,0 +1,86 @@
+"""
+Strava Field Requirements
+=========================
+
+Lets each Fulcrum payload builder declare the Strava fields it reads, so a
+sync can skip `GET /activities/{id}` when the `/athlete/activities` summary
+already carries everything needed.
+
+Summaries include distance, times, heart rate, elevation, temperature, power,
+gear and `map.summary_polyline`. A few fields only ever come back from the
+detail endpoint (DETAIL_ONLY_FIELDS), so a builder that needs one of them
+forces a detail fetch - unless summary-only mode is on and the field is
+merely optional for that builder, in which case it's left blank.
+"""
+
+from collections import namedtuple
+
+# Fields the list endpoint never returns
+DETAIL_ONLY_FIELDS = frozenset([
+    "calories",
+    "description",
+    "device_name",
+    "segment_efforts",
+    "splits_metric",
+    "splits_standard",
+    "laps",
+    "map.polyline",
+])
+
+# required: the record is useless without it (fetch details if it's missing)
+# optional: used if present, may be left blank in summary-only mode
+FieldSpec = namedtuple("FieldSpec", ["required", "optional"])
+
+
+def has_field(activity, path):
+    value = activity
+    for part in path.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return False
+        value = value[part]
+    return True
+
+
+def fields_needing_detail(summary, specs, summary_only=False):
+    """List the fields that force a detail fetch for these builders.
+
+    Args:
+        summary: activity summary from /athlete/activities
+        specs: FieldSpec for each builder that will run
+        summary_only: leave optional detail-only fields blank instead of fetching
+
+    Returns:
+        list of field paths (empty if the summary is enough)
+    """
+    missing = []
+    for spec in specs:
+        for field in spec.required:
+            if field in DETAIL_ONLY_FIELDS or not has_field(summary, field):
+                missing.append(field)
+        if not summary_only:
+            # Optional summary fields that are absent are absent from the
+            # detail response too, so only detail-only fields count here
+            missing.extend(field for field in spec.optional if field in DETAIL_ONLY_FIELDS)
+    return sorted(set(missing))
+
+
+def resolve_activity(summary, specs, fetch, cache=None, summary_only=False):
+    """Return the activity data to build payloads from.
+
+    Uses a cached detail response if there is one, the summary itself if it
+    covers every needed field, and only otherwise calls `fetch(activity_id)`.
+
+    Returns:
+        tuple: (activity dict or None, source) where source is 'cache',
+        'summary' or 'detail'
+    """
+    activity_id = summary["id"]
+    if cache is not None:
+        cached = cache.get(activity_id)
+        if cached is not None:
+            return cached, "cache"
+
+    if not fields_needing_detail(summary, specs, summary_only):
+        return summary, "summary"
+
+    return fetch(activity_id), "detail"
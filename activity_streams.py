@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+"""
+Strava Activity Streams Store
+=============================
+
+Optional stage that fetches an activity's full-resolution streams
+(`GET /activities/{id}/streams`: latlng, time, distance, heartrate, altitude,
+cadence) and keeps them on disk in a compact binary form, so higher-fidelity
+geometry and per-mile splits can be derived later without fetching again.
+
+Storage (under STRAVA_STREAMS_DIR, default .cache/streams), one file per
+activity:
+
+    STRM1\\n | header length (4 bytes) | JSON header | zlib(body)
+
+Each stream is scaled to integers (latlng x 1e6, altitude/distance x 10),
+delta-encoded and stored as a typed array('i'), so a 40,000-point ultra
+takes a few hundred KB instead of several MB of per-point JSON. Missing
+samples (None, e.g. heart rate dropouts) are kept as gaps: a channel with
+any has `"gaps": true` in the header and a presence bitmap after its deltas.
+
+Configuration (environment variables):
+    STRAVA_STREAMS_ENABLED  true = fetch streams for new activities (default: false)
+    STRAVA_STREAMS_DIR      Store directory (default: .cache/streams)
+
+Usage:
+    python3 activity_streams.py fetch <activity_id>   # Fetch and store
+    python3 activity_streams.py splits <activity_id>  # Per-mile splits
+    python3 activity_streams.py status                # Store size
+"""
+
+import json
+import math
+import os
+import struct
+import sys
+import tempfile
+import zlib
+from array import array
+
+import requests
+
+from http_client import get_session
+from strava_tokens import get_valid_access_token
+
+STREAMS_ENABLED = os.environ.get("STRAVA_STREAMS_ENABLED", "false").lower() == "true"
+STREAMS_DIR = os.environ.get("STRAVA_STREAMS_DIR", ".cache/streams")
+STREAM_KEYS = ("latlng", "time", "distance", "heartrate", "altitude", "cadence")
+
+MAGIC = b"STRM1\n"
+METERS_PER_MILE = 1609.344
+EARTH_RADIUS_M = 6371008.8
+
+# Integer scale per stored channel (latlng is split into lat and lng)
+SCALES = {
+    "lat": 1000000,
+    "lng": 1000000,
+    "time": 1,
+    "distance": 10,
+    "heartrate": 1,
+    "altitude": 10,
+    "cadence": 1,
+}
+
+
+def streams_enabled():
+    return STREAMS_ENABLED
+
+
+def set_streams_enabled(enabled=True):
+    """Fetch and store streams for activities processed from now on."""
+    global STREAMS_ENABLED
+    STREAMS_ENABLED = enabled
+
+
+def fetch_streams(activity_id, access_token=None):
+    """Fetch an activity's streams from Strava.
+
+    Returns:
+        dict: stream type -> list of values, or None if unavailable
+    """
+    url = f"https://www.strava.com/api/v3/activities/{activity_id}/streams"
+    headers = {"Authorization": f"Bearer {access_token or get_valid_access_token()}"}
+    params = {"keys": ",".join(STREAM_KEYS), "key_by_type": "true"}
+    try:
+        resp = get_session().get(url, headers=headers, params=params)
+    except requests.exceptions.RequestException as e:
+        print(f"Error fetching streams for {activity_id}: {e}")
+        return None
+    if resp.status_code != 200:
+        print(f"Error fetching streams for {activity_id}: {resp.status_code}")
+        return None
+    return {name: stream.get("data") or [] for name, stream in resp.json().items()}
+
+
+def _channels(streams):
+    """Split streams into named flat numeric channels."""
+    channels = {}
+    latlng = streams.get("latlng")
+    if latlng:
+        channels["lat"] = [point[0] if point else None for point in latlng]
+        channels["lng"] = [point[1] if point else None for point in latlng]
+    for name in ("time", "distance", "heartrate", "altitude", "cadence"):
+        if streams.get(name):
+            channels[name] = streams[name]
+    return channels
+
+
+def encode_streams(activity_id, streams):
+    """Serialize streams to the compact store format (bytes)."""
+    fields = []
+    body = bytearray()
+    for name, values in _channels(streams).items():
+        scale = SCALES[name]
+        deltas = array("i")
+        present = bytearray((len(values) + 7) // 8)
+        previous = 0
+        for i, value in enumerate(values):
+            if value is None:
+                # A gap repeats the previous value in the deltas
+                deltas.append(0)
+                continue
+            present[i // 8] |= 1 << (i % 8)
+            current = int(round(value * scale))
+            deltas.append(current - previous)
+            previous = current
+        field = {"name": name, "scale": scale, "count": len(deltas)}
+        body += deltas.tobytes()
+        if None in values:
+            field["gaps"] = True
+            body += present
+        fields.append(field)
+
+    header = json.dumps({"activity_id": activity_id, "fields": fields}).encode("utf-8")
+    return MAGIC + struct.pack("<I", len(header)) + header + zlib.compress(bytes(body), 6)
+
+
+def _read_channels(data):
+    """Parse a streams file into (name, scale, deltas, presence bitmap or None) per channel.
+
+    Deltas stay in their typed arrays (4 bytes a sample) until iterated.
+    """
+    if not data.startswith(MAGIC):
+        raise ValueError("Not a streams file")
+    offset = len(MAGIC)
+    (header_length,) = struct.unpack_from("<I", data, offset)
+    offset += 4
+    header = json.loads(data[offset:offset + header_length])
+    body = zlib.decompress(data[offset + header_length:])
+
+    channels = []
+    position = 0
+    for field in header["fields"]:
+        deltas = array("i")
+        size = field["count"] * deltas.itemsize
+        deltas.frombytes(body[position:position + size])
+        position += size
+
+        present = None
+        if field.get("gaps"):
+            mask_size = (field["count"] + 7) // 8
+            present = body[position:position + mask_size]
+            position += mask_size
+        channels.append((field["name"], field["scale"], deltas, present))
+    return channels
+
+
+def _iter_channel(scale, deltas, present):
+    running = 0
+    for i, delta in enumerate(deltas):
+        running += delta
+        if present is not None and not present[i // 8] >> (i % 8) & 1:
+            yield None
+        else:
+            yield running if scale == 1 else running / scale
+
+
+def decode_streams(data):
+    """Inverse of encode_streams.
+
+    Returns:
+        dict: stream type -> list of values (latlng as [lat, lng] pairs)
+    """
+    channels = {name: list(_iter_channel(scale, deltas, present))
+                for name, scale, deltas, present in _read_channels(data)}
+
+    streams = {name: values for name, values in channels.items() if name not in ("lat", "lng")}
+    if "lat" in channels:
+        streams["latlng"] = [[lat, lng] if lat is not None and lng is not None else None
+                             for lat, lng in zip(channels["lat"], channels["lng"])]
+    return streams
+
+
+def _rows(channels):
+    """Yield {stream type: value} per sample from {channel name: value iterator}."""
+    lat, lng = channels.pop("lat", None), channels.pop("lng", None)
+    names = list(channels)
+    iterators = [channels[name] for name in names]
+    if lat is not None:
+        names.append("latlng")
+        iterators.append(([a, b] if a is not None and b is not None else None for a, b in zip(lat, lng)))
+    for values in zip(*iterators):
+        yield dict(zip(names, values))
+
+
+def iter_stream_rows(data):
+    """Yield one {stream type: value} dict per sample from a streams file.
+
+    Values are decoded as they're reached, so only the compact delta arrays
+    are held in memory rather than a list per stream.
+    """
+    return _rows({name: _iter_channel(scale, deltas, present)
+                  for name, scale, deltas, present in _read_channels(data)})
+
+
+def stream_rows(streams):
+    """iter_stream_rows for streams already decoded into lists (e.g. just fetched)."""
+    channels = {name: iter(values) for name, values in streams.items() if name != "latlng" and values}
+    if streams.get("latlng"):
+        channels["lat"] = (point[0] if point else None for point in streams["latlng"])
+        channels["lng"] = (point[1] if point else None for point in streams["latlng"])
+    return _rows(channels)
+
+
+class StreamStore:
+    def __init__(self, store_dir=None):
+        self.store_dir = store_dir or STREAMS_DIR
+
+    def _path(self, activity_id):
+        return os.path.join(self.store_dir, f"{activity_id}.strm")
+
+    def has(self, activity_id):
+        return os.path.exists(self._path(activity_id))
+
+    def load(self, activity_id):
+        """Return the stored streams, or None if not stored (or unreadable)."""
+        try:
+            with open(self._path(activity_id), "rb") as f:
+                return decode_streams(f.read())
+        except (OSError, ValueError, zlib.error, struct.error):
+            return None
+
+    def iter_rows(self, activity_id):
+        """Stored streams as lazily decoded per-sample rows (see iter_stream_rows), or None."""
+        try:
+            with open(self._path(activity_id), "rb") as f:
+                return iter_stream_rows(f.read())
+        except (OSError, ValueError, zlib.error, struct.error):
+            return None
+
+    def save(self, activity_id, streams):
+        os.makedirs(self.store_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=self.store_dir)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(encode_streams(activity_id, streams))
+            os.replace(tmp_path, self._path(activity_id))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+    def get(self, activity_id, fetch=True):
+        """Stored streams, fetching and storing them first if allowed."""
+        streams = self.load(activity_id)
+        if streams is None and fetch:
+            streams = fetch_streams(activity_id)
+            if streams:
+                self.save(activity_id, streams)
+        return streams
+
+    def stats(self):
+        """(file count, total bytes)"""
+        if not os.path.isdir(self.store_dir):
+            return 0, 0
+        sizes = [entry.stat().st_size for entry in os.scandir(self.store_dir) if entry.name.endswith(".strm")]
+        return len(sizes), sum(sizes)
+
+
+_store = None
+
+def get_stream_store():
+    global _store
+    if _store is None:
+        _store = StreamStore()
+    return _store
+
+
+def streams_linestring(streams):
+    """Full-resolution GeoJSON LineString from stored streams (None without GPS)."""
+    latlng = [point for point in (streams or {}).get("latlng") or () if point]
+    if len(latlng) < 2:
+        return None
+    return {"type": "LineString", "coordinates": [[lng, lat] for lat, lng in latlng]}
+
+
+def _haversine(lat1, lng1, lat2, lng2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = (math.sin((p2 - p1) / 2) ** 2
+         + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lng2 - lng1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def _carry_forward(values):
+    """Fill gaps (None) with the last value seen (0 before the first)."""
+    filled = []
+    last = 0
+    for value in values:
+        last = last if value is None else value
+        filled.append(last)
+    return filled
+
+
+def cumulative_distance(streams):
+    """Distance in meters at each point (Strava's distance stream, or from GPS)."""
+    if streams.get("distance"):
+        return _carry_forward(streams["distance"])
+    latlng = streams.get("latlng") or []
+    distance = [0.0] * len(latlng)
+    previous = None
+    for i in range(1, len(latlng)):
+        distance[i] = distance[i - 1]
+        previous = latlng[i - 1] or previous
+        if previous and latlng[i]:
+            distance[i] += _haversine(*previous, *latlng[i])
+    return distance
+
+
+def mile_splits(streams):
+    """Per-mile splits; a final partial mile is included if longer than 0.1 mi.
+
+    Returns:
+        list of dicts: mile, miles, seconds, pace_seconds (per mile),
+        average_heartrate, elevation_gain_ft
+    """
+    time = _carry_forward(streams.get("time") or [])
+    distance = cumulative_distance(streams)
+    if not time or len(time) != len(distance):
+        return []
+    heartrate = streams.get("heartrate")
+    altitude = streams.get("altitude")
+
+    def split(start, end, number):
+        miles = (distance[end] - distance[start]) / METERS_PER_MILE
+        seconds = time[end] - time[start]
+        result = {
+            "mile": number,
+            "miles": round(miles, 2),
+            "seconds": seconds,
+            "pace_seconds": round(seconds / miles, 1) if miles > 0 else None,
+            "average_heartrate": None,
+            "elevation_gain_ft": None,
+        }
+        # Gaps are left out rather than counted as zeros
+        if heartrate:
+            window = [bpm for bpm in heartrate[start:end + 1] if bpm is not None]
+            if window:
+                result["average_heartrate"] = round(sum(window) / len(window))
+        if altitude:
+            window = [meters for meters in altitude[start:end + 1] if meters is not None]
+            if window:
+                gain = sum(max(b - a, 0) for a, b in zip(window, window[1:]))
+                result["elevation_gain_ft"] = round(gain * 3.28084, 1)
+        return result
+
+    splits = []
+    start = 0
+    mark = METERS_PER_MILE
+    for i, d in enumerate(distance):
+        if d >= mark:
+            splits.append(split(start, i, len(splits) + 1))
+            start = i
+            mark += METERS_PER_MILE
+    if distance and distance[-1] - distance[start] > 0.1 * METERS_PER_MILE:
+        splits.append(split(start, len(distance) - 1, len(splits) + 1))
+    return splits
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    store = get_stream_store()
+
+    if command == "status":
+        count, size = store.stats()
+        print(f"📦 {count} activities stored in {store.store_dir} ({size / 1024 / 1024:.1f} MB)")
+        return 0
+
+    if command in ("fetch", "splits") and len(sys.argv) > 2:
+        activity_id = sys.argv[2]
+        streams = store.get(activity_id, fetch=(command == "fetch") or not store.has(activity_id))
+        if not streams:
+            print(f"❌ No streams for activity {activity_id}")
+            return 1
+        points = len(streams.get("time") or streams.get("latlng") or [])
+        print(f"✓ Activity {activity_id}: {points} points ({', '.join(sorted(streams))})")
+        if command == "splits":
+            for s in mile_splits(streams):
+                pace = f"{int(s['pace_seconds'] // 60)}:{int(s['pace_seconds'] % 60):02d}" if s['pace_seconds'] else "-"
+                print(f"  Mile {s['mile']:>3} ({s['miles']:.2f} mi): {pace} /mi"
+                      f"  HR {s['average_heartrate'] or '-'}  +{s['elevation_gain_ft'] or 0} ft")
+        return 0
+
+    print(__doc__)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
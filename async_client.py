@@ -0,0 +1,101 @@
+"""
+Async Strava/Fulcrum Client
+===========================
+
+asyncio front end for the bridge's blocking operations - token refresh,
+activity detail fetch, duplicate lookup and Fulcrum record creation - plus a
+bounded-concurrency pipeline runner, so backfills and syncs can keep several
+activities in flight instead of handling them strictly one after another.
+
+The calls run on a dedicated thread pool over the shared pooled session
+(http_client.py), so they keep its keep-alive connections, retry policy and
+Strava rate limiter. That way concurrency never exceeds Strava's budget: the
+limiter makes excess calls wait instead of letting them fail. No async HTTP
+dependency is needed.
+
+Example:
+    async with AsyncBridgeClient(concurrency=8) as client:
+        results = await run_pipeline(summaries, handle_one, concurrency=8)
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_CONCURRENCY = int(os.environ.get("BRIDGE_CONCURRENCY", "4"))
+
+_END = object()
+
+
+class AsyncBridgeClient:
+    """Awaitable wrappers around the bridge's Strava and Fulcrum calls."""
+
+    def __init__(self, concurrency=DEFAULT_CONCURRENCY):
+        self.concurrency = concurrency
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bridge-io")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    async def run(self, func, *args, **kwargs):
+        """Run a blocking call on the client's I/O thread pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def get_access_token(self):
+        from strava_tokens import get_valid_access_token
+        return await self.run(get_valid_access_token)
+
+    async def fetch_activity(self, activity_id, use_cache=True):
+        from strava_webhook_dual_form import fetch_activity
+        access_token = await self.get_access_token()
+        return await self.run(fetch_activity, activity_id, access_token, use_cache=use_cache)
+
+    async def activity_exists(self, activity_id, form_id):
+        from fulcrum_index import activity_exists_in_fulcrum
+        return await self.run(activity_exists_in_fulcrum, activity_id, form_id)
+
+    async def create_record(self, payload, form_id, form_name=""):
+        from strava_webhook_dual_form import create_fulcrum_record
+        return await self.run(create_fulcrum_record, payload, form_id, form_name)
+
+
+async def run_pipeline(items, handler, concurrency=DEFAULT_CONCURRENCY):
+    """Run `await handler(item)` for every item with at most `concurrency` in flight.
+
+    `items` may be any iterable, including a lazy one such as ActivityPager;
+    it is advanced off the event loop so a page fetch never stalls running
+    tasks. Exceptions are returned in place of results rather than raised.
+
+    Returns:
+        list of results (or exceptions) in the same order as `items`
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    iterator = iter(items)
+    tasks = []
+
+    async def guarded(item):
+        try:
+            return await handler(item)
+        except Exception as e:
+            return e
+        finally:
+            semaphore.release()
+
+    while True:
+        await semaphore.acquire()
+        item = await loop.run_in_executor(None, next, iterator, _END)
+        if item is _END:
+            semaphore.release()
+            break
+        tasks.append(asyncio.ensure_future(guarded(item)))
+
+    return await asyncio.gather(*tasks)
@@ -7,35 +7,87 @@ Fetches ALL activities from a date range and creates records in the enhanced v2
 Handles rate limiting, progress tracking, and resumption.
 
 Usage:
-    python3 backfill_date_range.py [start_date] [end_date]
+    python3 backfill_date_range.py [start_date] [end_date] [--trust-cache] [--summary-only] [--concurrency N]
+                                  [--write-concurrency N] [--streams] [--export-gpx DIR]
+                                  [--pipeline] [--stage-workers NAME=N,...]
+                                  [--validate-only] [--resume] [--plan]
 
     start_date: YYYY-MM-DD (default: 2024-06-01)
     end_date: YYYY-MM-DD (default: today)
+    --trust-cache: reuse cached activity details regardless of age, so a
+                   re-run spends no Strava detail calls on activities already seen
+    --summary-only: build records from the list summaries when they have every
+                    required field (roughly halves Strava calls)
+    --concurrency N: keep N activities in flight (rate limits still apply)
+    --write-concurrency N: build records one at a time but keep N Fulcrum
+                           writes in flight (honors Fulcrum 429 Retry-After)
+    --streams: fetch each new activity's full-resolution streams into the local
+               streams store and build the route from them
+    --export-gpx DIR: also write each new activity's track to DIR as GPX
+    --pipeline: run listing, dedup, fetch, build and write as concurrent stages
+                joined by bounded queues, printing each stage's queue depth
+                and throughput (shows whether Strava or Fulcrum is the bottleneck)
+    --stage-workers NAME=N,...: workers per stage for --pipeline
+                                (default: dedup=2,fetch=2,build=1,write=4)
+    --validate-only: build every payload and check it against the v2 form
+                     export (FULCRUM_FORM_SCHEMA_V2) without posting anything
+    --plan: list the range only and report the detail, streams and Fulcrum
+            calls still needed and the projected finish time under the
+            current Strava rate limits (spends only the list-page calls)
+    --resume: continue the last run for the range (or, without dates, the
+              last run) from the backfill journal, retrying only failures
 
 Example:
     python3 backfill_date_range.py 2024-06-01 2026-05-02
 
 Features:
-- Respects Strava API rate limits (100/15min, 1000/day)
+- Respects Strava API rate limits (100/15min, 1000/day) using the
+  X-RateLimit headers, so it runs as fast as the budget allows
 - Shows detailed progress
 - Skips duplicates automatically
 - Handles errors gracefully
-- Can be interrupted and resumed
+- Can be interrupted and resumed (progress is journaled in BACKFILL_JOURNAL_DB)
 """
 
-import sys
 import os
+import argparse
+import asyncio
+import threading
 from datetime import datetime, timedelta
 import time
+from dotenv import load_dotenv
+
+# Load environment variables from .env file (before the project modules read their settings)
+load_dotenv()
+
 from strava_webhook_dual_form import (
     get_valid_access_token,
     fetch_activity,
-    get_geojson_linestring,
+    get_activity_geometry,
     build_fulcrum_payload_v2,
+    PAYLOAD_V2_FIELDS,
     create_fulcrum_record,
-    activity_exists_in_fulcrum
 )
-import requests
+from fulcrum_index import activity_exists_in_fulcrum
+from activity_cache import get_activity_cache, set_trust_cache
+from activity_streams import set_streams_enabled
+from gpx_export import export_activity, gpx_filename
+from activity_fields import resolve_activity, fields_needing_detail
+from backfill_journal import BackfillJournal, JournaledActivities, NO_JOURNAL
+from backfill_plan import run_plan
+from async_client import AsyncBridgeClient, run_pipeline
+from staged_pipeline import Stage, StagedPipeline
+from fulcrum_batch import FulcrumBatchWriter
+from form_router import V2_FORM_SCHEMA
+from geometry import shape_linestring, builtin_spec
+from payload_validation import get_validator
+from strava_activities import ActivityPager
+
+V2_GEOMETRY = builtin_spec("v2")
+
+# Worker threads per stage for --pipeline (override with --stage-workers)
+DEFAULT_STAGE_WORKERS = {'dedup': 2, 'fetch': 2, 'build': 1, 'write': 4}
+PIPELINE_PROGRESS_SECONDS = 15
 
 def parse_date(date_str):
     """Parse YYYY-MM-DD to datetime"""
@@ -48,105 +100,511 @@ def datetime_to_unix(dt):
     """Convert datetime to Unix timestamp"""
     return int(dt.timestamp())
 
-def fetch_all_activities_in_range(access_token, start_date, end_date):
-    """Fetch all activities in date range from Strava.
+def fetch_all_activities_in_range(start_date, end_date, after=None):
+    """List all activities in date range from Strava, streaming page by page.
 
     Args:
-        access_token: Strava access token
         start_date: datetime object for start
         end_date: datetime object for end
+        after: Unix timestamp to continue listing from (a resumed run)
 
     Returns:
-        List of activity summaries
+        ActivityPager yielding activity summaries as pages arrive (the next
+        page is fetched, and its routes batch-decoded, while the current one
+        is being processed)
     """
 
-    after_timestamp = datetime_to_unix(start_date)
+    after_timestamp = after or datetime_to_unix(start_date)
     before_timestamp = datetime_to_unix(end_date)
 
     print(f"📅 Date range: {start_date.strftime('%Y-%m-%d')} to {end_date.strftime('%Y-%m-%d')}")
     print(f"   Unix timestamps: {after_timestamp} to {before_timestamp}")
     print()
 
-    headers = {"Authorization": f"Bearer {access_token}"}
-    all_activities = []
-    page = 1
-    per_page = 200  # Max allowed by Strava API
-    request_count = 0
-
-    print("📡 Fetching activities from Strava...")
-
-    while True:
-        # Check rate limit (leave some headroom)
-        if request_count > 0 and request_count % 90 == 0:
-            print(f"\n⏸️  Rate limit protection: Waiting 15 minutes...")
-            print(f"   (Fetched {len(all_activities)} activities so far)")
-            for remaining in range(900, 0, -60):
-                mins = remaining // 60
-                print(f"   Resuming in {mins} minute(s)...", end="\r")
-                time.sleep(60)
-            print("\n   Resuming...                     ")
+    return ActivityPager(after=after_timestamp, before=before_timestamp, predecode=True)
 
+# Directory to write each processed activity's GPX to (--export-gpx)
+gpx_export_dir = None
+
+def build_v2_payload(activity):
+    """Build the v2 payload (and export the activity's GPX if requested)."""
+    if gpx_export_dir:
         try:
-            params = {
-                "after": after_timestamp,
-                "before": before_timestamp,
-                "page": page,
-                "per_page": per_page
-            }
-
-            resp = requests.get(
-                "https://www.strava.com/api/v3/athlete/activities",
-                headers=headers,
-                params=params,
-                timeout=30
+            export_activity(activity, os.path.join(gpx_export_dir, gpx_filename(activity)))
+        except Exception as e:
+            print(f"  ⚠️  GPX export failed: {e}")
+    geojson = shape_linestring(get_activity_geometry(activity), V2_GEOMETRY)
+    return build_fulcrum_payload_v2(activity, geojson)
+
+def payload_problems(payload, label):
+    """Validate a v2 payload against the form export; print and return any problems."""
+    validator = get_validator(V2_FORM_SCHEMA)
+    problems = validator.validate(payload) if validator else []
+    if problems:
+        print(f"  ❌ {label}: invalid payload, not posted")
+        for problem in problems:
+            print(f"     - {problem}")
+    return problems
+
+def backfill_sequentially(activities, form_id_v2, summary_only=False, journal=NO_JOURNAL):
+    """Process activities one at a time with per-activity progress output.
+
+    Args:
+        activities: ActivityPager or JournaledActivities (count/exhausted
+            drive the progress line)
+        form_id_v2: target Fulcrum form
+        summary_only: skip detail fetches that only add optional fields
+        journal: JournalRun recording each activity's progress
+
+    Returns:
+        tuple: (success_count, skip_count, error_count)
+    """
+    success_count = 0
+    skip_count = 0
+    error_count = 0
+    start_time = time.time()
+
+    for i, activity_summary in enumerate(activities, 1):
+        activity_id = activity_summary['id']
+        activity_name = activity_summary['name']
+        activity_date = activity_summary['start_date_local'][:10]
+        activity_type = activity_summary['type']
+
+        elapsed = time.time() - start_time
+        avg_time = elapsed / i if i > 0 else 0
+
+        if activities.exhausted:
+            # Listing is finished, so the total (and an ETA) is known
+            total = activities.count
+            remaining = avg_time * (total - i)
+            print(f"[{i}/{total}] {activity_name} ({activity_date}) - {activity_type}")
+            print(f"  Progress: {i/total*100:.1f}% | Elapsed: {elapsed/60:.1f}m | ETA: {remaining/60:.1f}m")
+        else:
+            print(f"[{i}/{activities.count}+] {activity_name} ({activity_date}) - {activity_type}")
+            print(f"  Listed so far: {activities.count} | Elapsed: {elapsed/60:.1f}m")
+
+        # Check if already exists
+        if journal.needs_dedup(activity_id) and activity_exists_in_fulcrum(activity_id, form_id_v2):
+            print(f"  ⏭️  Already exists - skipping")
+            journal.mark(activity_id, 'skipped')
+            skip_count += 1
+            print()
+            continue
+
+        # Fetch and create
+        stage = 'fetch'
+        try:
+            activity, source = resolve_activity(
+                activity_summary,
+                [PAYLOAD_V2_FIELDS],
+                fetch=lambda activity_id: fetch_activity(activity_id, get_valid_access_token()),
+                cache=get_activity_cache(),
+                summary_only=summary_only,
             )
+            if source != "detail":
+                print(f"  📄 Using {source} data (no detail fetch)")
 
-            request_count += 1
+            if not activity:
+                print(f"  ❌ Failed to fetch details")
+                journal.failed(activity_id, stage, 'fetch failed')
+                error_count += 1
+                print()
+                continue
+            journal.mark(activity_id, 'fetched')
 
-            if resp.status_code == 429:
-                # Rate limited - wait and retry
-                retry_after = int(resp.headers.get('Retry-After', 900))
-                print(f"\n⚠️  Rate limited by Strava. Waiting {retry_after} seconds...")
-                time.sleep(retry_after)
+            stage = 'build'
+            payload = build_v2_payload(activity)
+            if payload_problems(payload, activity_name):
+                journal.failed(activity_id, stage, 'invalid payload')
+                error_count += 1
+                print()
                 continue
+            journal.mark(activity_id, 'built')
+
+            stage = 'post'
+            resp = create_fulcrum_record(payload, form_id_v2, "v2")
 
-            if resp.status_code != 200:
-                print(f"\n❌ Error fetching page {page}: {resp.status_code}")
-                print(resp.text[:200])
-                break
+            if resp.status_code == 201:
+                record_data = resp.json()
+                record_id = record_data.get('record', {}).get('id')
+                print(f"  ✅ Created: {record_id}")
+                journal.mark(activity_id, 'posted', record_id=record_id)
+                success_count += 1
+            else:
+                print(f"  ❌ Failed (HTTP {resp.status_code})")
+                journal.failed(activity_id, stage, f"HTTP {resp.status_code}")
+                error_count += 1
 
-            activities = resp.json()
+        except Exception as e:
+            print(f"  ❌ Error: {str(e)[:100]}")
+            journal.failed(activity_id, stage, e)
+            error_count += 1
 
-            if not activities:
-                # No more activities
-                break
+        print()
 
-            all_activities.extend(activities)
-            print(f"   Page {page}: {len(activities)} activities (total: {len(all_activities)})", end="\r")
+        # Progress checkpoint every 50 activities
+        if i % 50 == 0:
+            print("="*70)
+            print(f"CHECKPOINT: {i}/{activities.count}{'' if activities.exhausted else '+'} activities processed")
+            print(f"✅ Created: {success_count} | ⏭️ Skipped: {skip_count} | ❌ Errors: {error_count}")
+            print("="*70)
+            print()
 
-            # If we got fewer than per_page, we're done
-            if len(activities) < per_page:
-                break
+    return success_count, skip_count, error_count
 
-            page += 1
+def build_payloads(activities, form_id, summary_only, counts, validate=True, journal=NO_JOURNAL):
+    """Yield v2 payloads for activities not yet in the form.
 
-            # Small delay between requests
-            time.sleep(0.5)
+    Duplicates, fetch failures and (with validate) invalid payloads are
+    tallied in `counts` ('skipped' and 'errors') rather than yielded.
+    """
+    for activity_summary in activities:
+        activity_id = activity_summary['id']
+        label = f"{activity_summary.get('name')} ({activity_summary.get('start_date_local', '')[:10]})"
 
-        except requests.exceptions.RequestException as e:
-            print(f"\n⚠️  Network error on page {page}: {e}")
-            print("   Retrying in 10 seconds...")
-            time.sleep(10)
+        if journal.needs_dedup(activity_id) and activity_exists_in_fulcrum(activity_id, form_id):
+            print(f"  ⏭️  {label}: already exists - skipping")
+            journal.mark(activity_id, 'skipped')
+            counts['skipped'] += 1
             continue
+
+        try:
+            activity, _source = resolve_activity(
+                activity_summary,
+                [PAYLOAD_V2_FIELDS],
+                fetch=lambda activity_id: fetch_activity(activity_id, get_valid_access_token()),
+                cache=get_activity_cache(),
+                summary_only=summary_only,
+            )
         except Exception as e:
-            print(f"\n❌ Unexpected error: {e}")
-            break
+            print(f"  ❌ {label}: {str(e)[:100]}")
+            journal.failed(activity_id, 'fetch', e)
+            counts['errors'] += 1
+            continue
+        if not activity:
+            print(f"  ❌ {label}: failed to fetch details")
+            journal.failed(activity_id, 'fetch', 'fetch failed')
+            counts['errors'] += 1
+            continue
+        journal.mark(activity_id, 'fetched')
+
+        payload = build_v2_payload(activity)
+        if validate and payload_problems(payload, label):
+            journal.failed(activity_id, 'build', 'invalid payload')
+            counts['errors'] += 1
+            continue
+        journal.mark(activity_id, 'built')
+        yield payload
 
-    print(f"\n✓ Fetched {len(all_activities)} activities total")
-    return all_activities
+def backfill_batched(activities, form_id, write_concurrency, summary_only=False, journal=NO_JOURNAL):
+    """Build payloads in order and hand them to a concurrent batch writer.
 
-def backfill_activities_range(start_date_str, end_date_str):
-    """Backfill activities in date range to v2 form."""
+    Reading, fetching and building stay sequential (they share the Strava
+    budget); only the Fulcrum POSTs overlap.
+
+    Returns:
+        tuple: (success_count, skip_count, error_count)
+    """
+    counts = {'skipped': 0, 'errors': 0}
+    success_count = 0
+    writer = FulcrumBatchWriter(form_id, concurrency=write_concurrency)
+
+    payloads = build_payloads(activities, form_id, summary_only, counts, journal=journal)
+    for result in writer.write(payloads):
+        # The payload carries the ID as a string; the journal keys on Strava's integer IDs
+        activity_id = int(result.strava_id)
+        if result.record_id:
+            print(f"  ✅ Strava {result.strava_id}: created {result.record_id}")
+            journal.mark(activity_id, 'posted', record_id=result.record_id)
+            success_count += 1
+        else:
+            print(f"  ❌ Strava {result.strava_id}: {str(result.error)[:100]}")
+            journal.failed(activity_id, 'post', result.error)
+            counts['errors'] += 1
+
+    return success_count, counts['skipped'], counts['errors']
+
+def validate_range(activities, form_id, summary_only=False):
+    """Build every new activity's payload and validate the whole batch without posting.
+
+    Returns:
+        tuple: (valid_count, skip_count, error_count)
+    """
+    validator = get_validator(V2_FORM_SCHEMA)
+    if validator is None:
+        print(f"❌ No form export at {V2_FORM_SCHEMA} - set FULCRUM_FORM_SCHEMA_V2 to validate against")
+        return 0, 0, 1
+
+    counts = {'skipped': 0, 'errors': 0}
+    payloads = list(build_payloads(activities, form_id, summary_only, counts, validate=False))
+    invalid = validator.validate_batch(payloads)
+
+    for _index, strava_id, problems in invalid:
+        print(f"  ❌ Strava {strava_id}:")
+        for problem in problems:
+            print(f"     - {problem}")
+    print(f"🔎 Validated {len(payloads)} payloads: {len(payloads) - len(invalid)} valid, {len(invalid)} invalid")
+    return len(payloads) - len(invalid), counts['skipped'], counts['errors'] + len(invalid)
+
+async def backfill_one_async(client, activity_summary, form_id, summary_only=False, journal=NO_JOURNAL):
+    """Dedup, fetch, build and post one activity through the async client.
+
+    Returns:
+        tuple: ('created', record_id), ('skipped', None) or ('error', message)
+    """
+    activity_id = activity_summary['id']
+    label = f"{activity_summary.get('name')} ({activity_summary.get('start_date_local', '')[:10]})"
+
+    if journal.needs_dedup(activity_id) and await client.activity_exists(activity_id, form_id):
+        print(f"  ⏭️  {label}: already exists - skipping")
+        journal.mark(activity_id, 'skipped')
+        return ('skipped', None)
+
+    activity = activity_summary
+    if fields_needing_detail(activity_summary, [PAYLOAD_V2_FIELDS], summary_only):
+        activity = await client.fetch_activity(activity_id)
+    if not activity:
+        print(f"  ❌ {label}: failed to fetch details")
+        journal.failed(activity_id, 'fetch', 'fetch failed')
+        return ('error', 'fetch failed')
+    journal.mark(activity_id, 'fetched')
+
+    # May fetch streams and write files, so keep it off the event loop
+    payload = await client.run(build_v2_payload, activity)
+    if payload_problems(payload, label):
+        journal.failed(activity_id, 'build', 'invalid payload')
+        return ('error', 'invalid payload')
+    journal.mark(activity_id, 'built')
+
+    try:
+        resp = await client.create_record(payload, form_id, "v2")
+    except Exception as e:
+        journal.failed(activity_id, 'post', e)
+        raise
+
+    if resp.status_code == 201:
+        record_id = resp.json().get('record', {}).get('id')
+        print(f"  ✅ {label}: created {record_id}")
+        journal.mark(activity_id, 'posted', record_id=record_id)
+        return ('created', record_id)
+
+    print(f"  ❌ {label}: failed (HTTP {resp.status_code})")
+    journal.failed(activity_id, 'post', f"HTTP {resp.status_code}")
+    return ('error', f"HTTP {resp.status_code}")
+
+def backfill_concurrently(activities, form_id, concurrency, summary_only=False, journal=NO_JOURNAL):
+    """Process activities with up to `concurrency` in flight.
+
+    Returns:
+        tuple: (success_count, skip_count, error_count)
+    """
+    async def run():
+        async with AsyncBridgeClient(concurrency=concurrency) as client:
+            return await run_pipeline(
+                activities,
+                lambda summary: backfill_one_async(client, summary, form_id, summary_only, journal),
+                concurrency=concurrency,
+            )
+
+    results = asyncio.run(run())
+
+    success_count = skip_count = error_count = 0
+    for result in results:
+        if isinstance(result, Exception):
+            print(f"  ❌ Error: {str(result)[:100]}")
+            error_count += 1
+        elif result[0] == 'created':
+            success_count += 1
+        elif result[0] == 'skipped':
+            skip_count += 1
+        else:
+            error_count += 1
+    return success_count, skip_count, error_count
+
+def open_activities(journal, form_id, start_date, end_date, start_date_str, end_date_str,
+                    resume=False, validate_only=False):
+    """Activities to process for a range, with their journal run as `.run`.
+
+    Activities stream in page by page; processing starts on the first page.
+    Validation posts nothing, so it leaves the journal alone.
+    """
+    if validate_only:
+        activities = fetch_all_activities_in_range(start_date, end_date)
+        activities.run = NO_JOURNAL
+        return activities
+
+    run = journal.start(form_id, start_date_str, end_date_str, resume=resume)
+    if resume:
+        print_resume_state(run)
+    return JournaledActivities(
+        run, lambda after: fetch_all_activities_in_range(start_date, end_date, after=after)
+    )
+
+def process_activities(activities, form_id, summary_only=False, concurrency=1, write_concurrency=0,
+                       validate_only=False, stage_workers=None):
+    """Run the selected processing mode over `activities` (from open_activities).
+
+    Returns:
+        tuple: (success_count, skip_count, error_count)
+    """
+    run = activities.run
+    if validate_only:
+        print("🔎 Validating payloads only - nothing will be posted")
+        print()
+        return validate_range(activities, form_id, summary_only)
+    if stage_workers:
+        print("⚡ Staged pipeline: " + ", ".join(f"{name} x{count}" for name, count in stage_workers.items()))
+        print()
+        return backfill_staged(activities, form_id, stage_workers, summary_only, journal=run)
+    if concurrency > 1:
+        print(f"⚡ Processing with {concurrency} activities in flight")
+        print()
+        return backfill_concurrently(activities, form_id, concurrency, summary_only, journal=run)
+    if write_concurrency > 0:
+        print(f"⚡ Writing to Fulcrum with {write_concurrency} requests in flight")
+        print()
+        return backfill_batched(activities, form_id, write_concurrency, summary_only, journal=run)
+    return backfill_sequentially(activities, form_id, summary_only, journal=run)
+
+def print_resume_state(run):
+    """Summarize what a resumed run has left to do."""
+    counts = run.counts()
+    done = counts.get('posted', 0) + counts.get('skipped', 0)
+    print(f"🔁 Resuming: {done} done ({counts.get('posted', 0)} created, {counts.get('skipped', 0)} duplicates), "
+          f"{counts.get('failed', 0)} failed to retry, {len(run.states) - done - counts.get('failed', 0)} unfinished")
+    print(f"   Listing: {'complete' if run.listing_complete else 'continues after the last activity listed'}")
+    print()
+
+def parse_stage_workers(spec):
+    """Parse "fetch=3,write=6" into a full stage -> worker count mapping."""
+    workers = dict(DEFAULT_STAGE_WORKERS)
+    for part in filter(None, (spec or '').split(',')):
+        name, _, count = part.partition('=')
+        name = name.strip()
+        if name not in workers or not count.strip().isdigit() or int(count) < 1:
+            raise ValueError(f"Bad stage worker setting '{part}' "
+                             f"(use NAME=N with NAME one of {', '.join(DEFAULT_STAGE_WORKERS)})")
+        workers[name] = int(count)
+    return workers
+
+def backfill_staged(activities, form_id, stage_workers, summary_only=False, journal=NO_JOURNAL):
+    """Run the backfill as concurrent stages joined by bounded queues.
+
+    Listing feeds dedup -> fetch -> build -> write, each stage with its own
+    workers; a progress line shows every stage's queue depth and throughput.
+
+    Returns:
+        tuple: (success_count, skip_count, error_count)
+    """
+    counts = {'created': 0, 'skipped': 0, 'errors': 0}
+    counts_lock = threading.Lock()
+    writer = FulcrumBatchWriter(form_id, concurrency=stage_workers['write'])
+
+    def tally(key):
+        with counts_lock:
+            counts[key] += 1
+
+    def label(summary):
+        return f"{summary.get('name')} ({summary.get('start_date_local', '')[:10]})"
+
+    def dedup(summary):
+        if journal.needs_dedup(summary['id']) and activity_exists_in_fulcrum(summary['id'], form_id):
+            print(f"  ⏭️  {label(summary)}: already exists - skipping")
+            journal.mark(summary['id'], 'skipped')
+            tally('skipped')
+            return None
+        return summary
+
+    def fetch(summary):
+        activity, _source = resolve_activity(
+            summary,
+            [PAYLOAD_V2_FIELDS],
+            fetch=lambda activity_id: fetch_activity(activity_id, get_valid_access_token()),
+            cache=get_activity_cache(),
+            summary_only=summary_only,
+        )
+        if not activity:
+            print(f"  ❌ {label(summary)}: failed to fetch details")
+            journal.failed(summary['id'], 'fetch', 'fetch failed')
+            tally('errors')
+            return None
+        journal.mark(summary['id'], 'fetched')
+        return activity
+
+    def build(activity):
+        payload = build_v2_payload(activity)
+        if payload_problems(payload, label(activity)):
+            journal.failed(activity['id'], 'build', 'invalid payload')
+            tally('errors')
+            return None
+        journal.mark(activity['id'], 'built')
+        return (activity, payload)
+
+    def write(item):
+        activity, payload = item
+        result = writer.post(None, payload)
+        if result.record_id:
+            print(f"  ✅ {label(activity)}: created {result.record_id}")
+            journal.mark(activity['id'], 'posted', record_id=result.record_id)
+            tally('created')
+        else:
+            print(f"  ❌ {label(activity)}: {str(result.error)[:100]}")
+            journal.failed(activity['id'], 'post', result.error)
+            tally('errors')
+        return None
+
+    def on_error(stage, item, error):
+        activity = item[0] if isinstance(item, tuple) else item
+        print(f"  ❌ {label(activity)}: {stage.name} failed: {str(error)[:100]}")
+        # The journal calls the Fulcrum write 'post' in every mode
+        journal.failed(activity['id'], 'post' if stage.name == 'write' else stage.name, error)
+        tally('errors')
+
+    pipeline = StagedPipeline(activities, [
+        Stage('dedup', dedup, workers=stage_workers['dedup']),
+        Stage('fetch', fetch, workers=stage_workers['fetch']),
+        Stage('build', build, workers=stage_workers['build']),
+        Stage('write', write, workers=stage_workers['write']),
+    ], on_error=on_error)
+    pipeline.run(progress_every=PIPELINE_PROGRESS_SECONDS)
+    print(pipeline.progress_line())
+
+    return counts['created'], counts['skipped'], counts['errors']
+
+def backfill_activities_range(start_date_str, end_date_str, summary_only=False, concurrency=1,
+                              write_concurrency=0, validate_only=False, resume=False,
+                              stage_workers=None, plan=False):
+    """Backfill activities in date range to v2 form.
+
+    With summary_only, the detail fetch is skipped whenever the list summary
+    has every required field (calories, description and device name are
+    left blank). With concurrency > 1, activities are processed through the
+    async client with that many in flight. With write_concurrency > 0,
+    payloads are built one at a time and posted by a batch writer with that
+    many Fulcrum writes in flight. With validate_only, payloads are built
+    and checked against the form export but nothing is posted. With
+    stage_workers (stage name -> worker count), the staged pipeline runs.
+    With plan, the range is only listed and the expected calls and finish
+    time are printed.
+
+    Progress is recorded in the backfill journal; with resume, the last run
+    for the range continues (see backfill_journal.py). With resume and no
+    start date, the form's most recent run is resumed.
+    """
+
+    form_id_v2 = os.environ.get('FULCRUM_FORM_ID_V2')
+
+    if not form_id_v2:
+        print("❌ Error: FULCRUM_FORM_ID_V2 not set in .env")
+        return 1
+
+    journal = BackfillJournal()
+    if resume and start_date_str is None:
+        last_run = journal.latest_run(form_id_v2)
+        if not last_run:
+            print("❌ Error: No backfill run to resume")
+            return 1
+        start_date_str, end_date_str = last_run
 
     # Parse dates
     start_date = parse_date(start_date_str)
@@ -164,17 +622,15 @@ def backfill_activities_range(start_date_str, end_date_str):
         print(f"❌ Error: Start date must be before end date")
         return 1
 
+    if validate_only and get_validator(V2_FORM_SCHEMA) is None:
+        print(f"❌ Error: No form export at {V2_FORM_SCHEMA} - set FULCRUM_FORM_SCHEMA_V2 to validate against")
+        return 1
+
     print("="*70)
     print("BACKFILLING ACTIVITIES BY DATE RANGE")
     print("="*70)
     print()
 
-    form_id_v2 = os.environ.get('FULCRUM_FORM_ID_V2')
-
-    if not form_id_v2:
-        print("❌ Error: FULCRUM_FORM_ID_V2 not set in .env")
-        return 1
-
     print(f"Target Form: {form_id_v2}")
     print(f"Date Range: {start_date_str} to {end_date_str}")
 
@@ -182,92 +638,44 @@ def backfill_activities_range(start_date_str, end_date_str):
     print(f"Duration: {duration} days ({duration/30:.1f} months)")
     print()
 
-    # Get access token
+    # Check the access token up front (the pager and fetches refresh it as needed)
     try:
-        access_token = get_valid_access_token()
+        get_valid_access_token()
     except Exception as e:
         print(f"❌ Error getting access token: {e}")
         return 1
 
-    # Fetch all activities in range
-    activities = fetch_all_activities_in_range(access_token, start_date, end_date)
+    if plan:
+        activities = fetch_all_activities_in_range(start_date, end_date)
+        in_flight = max(concurrency, stage_workers['fetch'] if stage_workers else 1)
+        run_plan(activities, form_id_v2, [PAYLOAD_V2_FIELDS], summary_only, concurrency=in_flight)
+        if activities.error:
+            print(f"⚠️  Listing stopped early, so the plan is partial: {activities.error}")
+            return 1
+        return 0
 
-    if not activities:
-        print("❌ No activities found in date range")
-        return 1
+    activities = open_activities(journal, form_id_v2, start_date, end_date, start_date_str, end_date_str,
+                                 resume=resume, validate_only=validate_only)
 
-    print()
     print("="*70)
-    print(f"PROCESSING {len(activities)} ACTIVITIES")
+    print("PROCESSING ACTIVITIES (listing continues in the background)")
     print("="*70)
     print()
 
     # Process each activity
-    success_count = 0
-    skip_count = 0
-    error_count = 0
     start_time = time.time()
 
-    for i, activity_summary in enumerate(activities, 1):
-        activity_id = activity_summary['id']
-        activity_name = activity_summary['name']
-        activity_date = activity_summary['start_date_local'][:10]
-        activity_type = activity_summary['type']
-
-        elapsed = time.time() - start_time
-        avg_time = elapsed / i if i > 0 else 0
-        remaining = avg_time * (len(activities) - i)
-
-        print(f"[{i}/{len(activities)}] {activity_name} ({activity_date}) - {activity_type}")
-        print(f"  Progress: {i/len(activities)*100:.1f}% | Elapsed: {elapsed/60:.1f}m | ETA: {remaining/60:.1f}m")
+    success_count, skip_count, error_count = process_activities(
+        activities, form_id_v2, summary_only=summary_only, concurrency=concurrency,
+        write_concurrency=write_concurrency, validate_only=validate_only, stage_workers=stage_workers,
+    )
 
-        # Check if already exists
-        if activity_exists_in_fulcrum(activity_id, form_id_v2):
-            print(f"  ⏭️  Already exists - skipping")
-            skip_count += 1
-            print()
-            continue
-
-        # Fetch and create
-        try:
-            activity = fetch_activity(activity_id, access_token)
-
-            if not activity:
-                print(f"  ❌ Failed to fetch details")
-                error_count += 1
-                print()
-                continue
-
-            geojson = get_geojson_linestring(activity)
-            payload = build_fulcrum_payload_v2(activity, geojson)
-
-            resp = create_fulcrum_record(payload, form_id_v2, "v2")
-
-            if resp.status_code == 201:
-                record_data = resp.json()
-                record_id = record_data.get('record', {}).get('id')
-                print(f"  ✅ Created: {record_id}")
-                success_count += 1
-            else:
-                print(f"  ❌ Failed (HTTP {resp.status_code})")
-                error_count += 1
-
-        except Exception as e:
-            print(f"  ❌ Error: {str(e)[:100]}")
-            error_count += 1
-
-        print()
-
-        # Small delay between activities
-        time.sleep(0.3)
-
-        # Progress checkpoint every 50 activities
-        if i % 50 == 0:
-            print("="*70)
-            print(f"CHECKPOINT: {i}/{len(activities)} activities processed")
-            print(f"✅ Created: {success_count} | ⏭️ Skipped: {skip_count} | ❌ Errors: {error_count}")
-            print("="*70)
-            print()
+    if activities.count == 0 and resume and not activities.error:
+        print("✅ Nothing left to resume - every activity in the range is done")
+        return 0
+    if activities.count == 0:
+        print("❌ No activities found in date range")
+        return 1
 
     # Final summary
     total_time = time.time() - start_time
@@ -276,17 +684,28 @@ def backfill_activities_range(start_date_str, end_date_str):
     print("="*70)
     print("BACKFILL COMPLETE")
     print("="*70)
-    print(f"Total activities: {len(activities)}")
-    print(f"✅ Successfully created: {success_count}")
+    print(f"Total activities: {activities.count}")
+    if activities.error:
+        print(f"⚠️  Listing stopped early: {activities.error}")
+    if validate_only:
+        print(f"✅ Valid (not posted): {success_count}")
+    else:
+        print(f"✅ Successfully created: {success_count}")
     print(f"⏭️  Skipped (duplicates): {skip_count}")
     print(f"❌ Errors: {error_count}")
     print()
     print(f"⏱️  Total time: {total_time/60:.1f} minutes ({total_time/3600:.2f} hours)")
     if success_count > 0:
         print(f"   Average: {total_time/success_count:.1f} seconds per activity")
+    cache = get_activity_cache()
+    print(f"🗄️  Activity cache: {cache.hits} hits, {cache.misses} misses")
     print()
 
-    if success_count > 0:
+    if error_count > 0 and not validate_only:
+        print(f"🔁 Retry the failures with: python3 backfill_date_range.py {start_date_str} {end_date_str} --resume")
+        print()
+
+    if success_count > 0 and not validate_only:
         print(f"🎉 View your activities:")
         print(f"   https://web.fulcrumapp.com/apps/{form_id_v2}")
 
@@ -297,16 +716,73 @@ def main():
     default_start = "2024-06-01"
     default_end = datetime.now().strftime("%Y-%m-%d")
 
-    start_date = default_start
-    end_date = default_end
-
-    if len(sys.argv) > 1:
-        start_date = sys.argv[1]
-
-    if len(sys.argv) > 2:
-        end_date = sys.argv[2]
-
-    return backfill_activities_range(start_date, end_date)
+    parser = argparse.ArgumentParser(description='Backfill Strava activities in a date range to the v2 form')
+    parser.add_argument('start_date', nargs='?',
+                        help=f'YYYY-MM-DD (default: {default_start}, or the last run\'s with --resume)')
+    parser.add_argument('end_date', nargs='?',
+                        help='YYYY-MM-DD (default: today)')
+    parser.add_argument('--trust-cache', action='store_true',
+                        help='Reuse cached activity details regardless of age (for re-runs)')
+    parser.add_argument('--summary-only', action='store_true',
+                        help='Build records from list summaries; skip detail fetches that '
+                             'would only add calories, description and device name')
+    parser.add_argument('--concurrency', type=int, default=1,
+                        help='Activities to process at once (default: 1, sequential)')
+    parser.add_argument('--write-concurrency', type=int, default=0,
+                        help='Fulcrum record creations in flight while payloads are built '
+                             'sequentially (default: 0, write inline)')
+    parser.add_argument('--streams', action='store_true',
+                        help='Fetch full-resolution streams for each new activity, store them '
+                             'locally and build the route from them (one extra Strava call each)')
+    parser.add_argument('--export-gpx', metavar='DIR',
+                        help='Also write a GPX file for each new activity to DIR')
+    parser.add_argument('--validate-only', action='store_true',
+                        help='Build and validate every payload against the form export without posting')
+    parser.add_argument('--pipeline', action='store_true',
+                        help='Run listing, dedup, fetch, build and write as concurrent stages '
+                             'with bounded queues and per-stage progress')
+    parser.add_argument('--stage-workers', metavar='NAME=N,...',
+                        help='Workers per pipeline stage (default: ' +
+                             ','.join(f'{k}={v}' for k, v in DEFAULT_STAGE_WORKERS.items()) + ')')
+    parser.add_argument('--plan', action='store_true',
+                        help='List the range and estimate Strava/Fulcrum calls and finish time '
+                             'without fetching details or posting anything')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue the last run for this range from its journal, retrying '
+                             'only failed activities (no relisting or duplicate rescans)')
+    args = parser.parse_args()
+
+    stage_workers = None
+    if args.pipeline or args.stage_workers:
+        try:
+            stage_workers = parse_stage_workers(args.stage_workers)
+        except ValueError as e:
+            parser.error(str(e))
+
+    start_date, end_date = args.start_date, args.end_date
+    if start_date is None and not args.resume:
+        start_date = default_start
+    if start_date is not None and end_date is None:
+        end_date = default_end
+
+    if args.trust_cache:
+        set_trust_cache(True)
+    if args.streams:
+        set_streams_enabled(True)
+    if args.export_gpx and args.validate_only:
+        print("⚠️  --export-gpx is ignored with --validate-only (nothing is written)")
+    elif args.export_gpx:
+        global gpx_export_dir
+        gpx_export_dir = args.export_gpx
+
+    return backfill_activities_range(start_date, end_date,
+                                     summary_only=args.summary_only,
+                                     concurrency=args.concurrency,
+                                     write_concurrency=args.write_concurrency,
+                                     validate_only=args.validate_only,
+                                     resume=args.resume,
+                                     stage_workers=stage_workers,
+                                     plan=args.plan)
 
 if __name__ == "__main__":
     exit(main())
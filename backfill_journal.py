@@ -0,0 +1,307 @@
+"""
+Backfill Checkpoint Journal
+===========================
+
+SQLite journal that lets `backfill_date_range.py` stop at any point (Ctrl-C,
+crash, reboot) and pick up where it left off.
+
+For each run (form + date range) it records every listed activity, in
+listing order, with its summary and how far it got:
+
+    listed -> fetched -> built -> posted (with the Fulcrum record id)
+                                  skipped (already in the form)
+                                  failed (with the stage and reason)
+
+A resumed run works from the journal instead of Strava: activities already
+posted or skipped are never touched again, unfinished and failed ones are
+retried, and listing continues after the last activity listed. Activities
+that were already checked against Fulcrum aren't scanned for again, except
+where a POST may have gone through before the interruption.
+
+Like the job queue, the database runs in WAL mode with synchronous=FULL.
+"""
+
+import calendar
+import json
+import os
+import sqlite3
+import time
+
+from polyline_batch import predecode
+
+# Unfinished activities are handed out (and their routes batch-decoded) in chunks this size
+PENDING_CHUNK = 200
+
+JOURNAL_DB_PATH = os.environ.get("BACKFILL_JOURNAL_DB", ".backfill-journal.db")
+
+DONE_STATUSES = ("posted", "skipped")
+
+
+class BackfillJournal:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or JOURNAL_DB_PATH
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    run_key TEXT PRIMARY KEY,
+                    form_id TEXT NOT NULL,
+                    start_date TEXT NOT NULL,
+                    end_date TEXT NOT NULL,
+                    listed_through INTEGER,
+                    listing_complete INTEGER NOT NULL DEFAULT 0,
+                    started_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS items (
+                    run_key TEXT NOT NULL,
+                    activity_id INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    summary TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'listed',
+                    stage TEXT,
+                    record_id TEXT,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (run_key, activity_id)
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_items_position ON items (run_key, position)"
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def latest_run(self, form_id):
+        """(start_date, end_date) of the most recent run for a form, or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT start_date, end_date FROM runs WHERE form_id = ? ORDER BY updated_at DESC LIMIT 1",
+                (form_id,),
+            ).fetchone()
+        finally:
+            conn.close()
+        return (row["start_date"], row["end_date"]) if row else None
+
+    def start(self, form_id, start_date, end_date, resume=False):
+        """Open the run for a form and date range (YYYY-MM-DD strings).
+
+        Without resume, any earlier journal for the same range is discarded.
+
+        Returns:
+            JournalRun
+        """
+        run_key = f"{form_id}:{start_date}:{end_date}"
+        now = time.time()
+        conn = self._connect()
+        try:
+            if not resume:
+                conn.execute("DELETE FROM items WHERE run_key = ?", (run_key,))
+                conn.execute("DELETE FROM runs WHERE run_key = ?", (run_key,))
+            conn.execute(
+                """
+                INSERT OR IGNORE INTO runs (run_key, form_id, start_date, end_date, started_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                (run_key, form_id, start_date, end_date, now, now),
+            )
+            conn.commit()
+            run = conn.execute("SELECT * FROM runs WHERE run_key = ?", (run_key,)).fetchone()
+            items = conn.execute(
+                "SELECT activity_id, status, stage FROM items WHERE run_key = ?", (run_key,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return JournalRun(
+            self, run_key,
+            listed_through=run["listed_through"],
+            listing_complete=bool(run["listing_complete"]),
+            states={row["activity_id"]: (row["status"], row["stage"]) for row in items},
+        )
+
+
+def _start_timestamp(summary):
+    try:
+        return calendar.timegm(time.strptime(summary["start_date"], "%Y-%m-%dT%H:%M:%SZ"))
+    except (KeyError, ValueError):
+        return None
+
+
+class JournalRun:
+    """One backfill run's journal.
+
+    Attributes:
+        states: activity id -> (status, failed stage) as last recorded
+        listed_through: start time (Unix) of the last activity listed
+        listing_complete: True once the whole range has been listed
+    """
+
+    def __init__(self, journal, run_key, listed_through=None, listing_complete=False, states=None):
+        self.journal = journal
+        self.run_key = run_key
+        self.listed_through = listed_through
+        self.listing_complete = listing_complete
+        self.states = states or {}
+
+    def counts(self):
+        """Recorded activities per status."""
+        counts = {}
+        for status, _stage in self.states.values():
+            counts[status] = counts.get(status, 0) + 1
+        return counts
+
+    def pending(self):
+        """Summaries of activities listed but not yet posted or skipped, in listing order."""
+        conn = self.journal._connect()
+        try:
+            rows = conn.execute(
+                f"""
+                SELECT summary FROM items
+                WHERE run_key = ? AND status NOT IN ({', '.join('?' * len(DONE_STATUSES))})
+                ORDER BY position
+                """,
+                (self.run_key, *DONE_STATUSES),
+            ).fetchall()
+        finally:
+            conn.close()
+        return [json.loads(row["summary"]) for row in rows]
+
+    def record_listed(self, summary):
+        """Add a newly listed activity; returns False if the run already has it."""
+        activity_id = summary["id"]
+        if activity_id in self.states:
+            return False
+        listed_through = _start_timestamp(summary)
+        now = time.time()
+        conn = self.journal._connect()
+        try:
+            conn.execute(
+                """
+                INSERT OR IGNORE INTO items (run_key, activity_id, position, summary, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                (self.run_key, activity_id, len(self.states), json.dumps(summary), now),
+            )
+            if listed_through is not None:
+                conn.execute(
+                    "UPDATE runs SET listed_through = MAX(COALESCE(listed_through, 0), ?), updated_at = ? WHERE run_key = ?",
+                    (listed_through, now, self.run_key),
+                )
+            conn.commit()
+        finally:
+            conn.close()
+        self.states[activity_id] = ("listed", None)
+        if listed_through is not None:
+            self.listed_through = max(self.listed_through or 0, listed_through)
+        return True
+
+    def finish_listing(self):
+        conn = self.journal._connect()
+        try:
+            conn.execute(
+                "UPDATE runs SET listing_complete = 1, updated_at = ? WHERE run_key = ?",
+                (time.time(), self.run_key),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        self.listing_complete = True
+
+    def mark(self, activity_id, status, record_id=None, error=None, stage=None):
+        """Record an activity's progress ('fetched', 'built', 'posted', 'skipped' or 'failed')."""
+        conn = self.journal._connect()
+        try:
+            conn.execute(
+                """
+                UPDATE items SET status = ?, stage = ?, record_id = COALESCE(?, record_id),
+                                 error = ?, updated_at = ?
+                WHERE run_key = ? AND activity_id = ?
+                """,
+                (status, stage, record_id, error, time.time(), self.run_key, activity_id),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        self.states[activity_id] = (status, stage)
+
+    def failed(self, activity_id, stage, reason):
+        self.mark(activity_id, "failed", error=str(reason)[:500], stage=stage)
+
+    def needs_dedup(self, activity_id):
+        """Whether the activity still has to be checked against Fulcrum.
+
+        Only activities never checked (including those whose check itself
+        failed), and those whose POST may have gone through before the run
+        stopped, need the scan.
+        """
+        status, stage = self.states.get(activity_id, ("listed", None))
+        return status in ("listed", "built") or (status == "failed" and stage in ("dedup", "post"))
+
+
+class NoJournal:
+    """Stand-in for a JournalRun when nothing should be recorded (e.g. --validate-only)."""
+
+    def mark(self, activity_id, status, record_id=None, error=None, stage=None):
+        pass
+
+    def failed(self, activity_id, stage, reason):
+        pass
+
+    def needs_dedup(self, activity_id):
+        return True
+
+
+NO_JOURNAL = NoJournal()
+
+
+class JournaledActivities:
+    """Activities for a run: the journal's unfinished ones first, then new listings.
+
+    Mirrors ActivityPager's count/exhausted/error attributes, so the backfill
+    modes can use either. `make_pager(after)` builds the pager that continues
+    listing from a Unix timestamp (None = the start of the range).
+    """
+
+    def __init__(self, run, make_pager):
+        self.run = run
+        self.make_pager = make_pager
+        self.count = 0
+        self.exhausted = run.listing_complete
+        self.error = None
+
+    def __iter__(self):
+        pending = self.run.pending()
+        self.count = len(pending)
+        for start in range(0, len(pending), PENDING_CHUNK):
+            chunk = pending[start:start + PENDING_CHUNK]
+            predecode([(summary.get("map") or {}).get("summary_polyline") for summary in chunk])
+            yield from chunk
+
+        if self.run.listing_complete:
+            return
+        # Strava lists ascending with `after`, so listing picks up at the last
+        # activity listed (one second back, in case of a tie; repeats are dropped)
+        after = self.run.listed_through - 1 if self.run.listed_through else None
+        pager = self.make_pager(after)
+        for summary in pager:
+            if self.run.record_listed(summary):
+                self.count += 1
+                yield summary
+        self.error = pager.error
+        if pager.exhausted:
+            self.run.finish_listing()
+            self.exhausted = True
@@ -0,0 +1,177 @@
+"""
+Backfill Planning
+=================
+
+Dry run for `backfill_date_range.py --plan`: estimates what a backfill will
+cost before it starts.
+
+- Lists the range (the only Strava calls spent) and checks each activity
+  against the local Fulcrum index, refreshed first, to find the ones not
+  yet synced.
+- Counts the Strava calls the rest will need: one detail fetch per activity
+  unless the activity cache or the summary covers it, plus a streams fetch
+  when the streams stage is on and the activity isn't stored yet.
+- Projects the finish time by replaying those calls against the current
+  15 minute and daily budgets (from the rate-limit headers of the listing
+  calls), waiting for window resets the same way the limiter does.
+
+Per-call latencies are rough estimates; set BACKFILL_PLAN_STRAVA_SECONDS and
+BACKFILL_PLAN_FULCRUM_SECONDS to what you see on your connection.
+"""
+
+import os
+import time
+from collections import namedtuple
+from datetime import datetime
+
+from activity_fields import fields_needing_detail
+from rate_limit import get_strava_limiter, RATE_HEADROOM
+
+STRAVA_SECONDS_PER_CALL = float(os.environ.get("BACKFILL_PLAN_STRAVA_SECONDS", "0.6"))
+FULCRUM_SECONDS_PER_CALL = float(os.environ.get("BACKFILL_PLAN_FULCRUM_SECONDS", "0.8"))
+
+BackfillPlan = namedtuple("BackfillPlan", [
+    "listed", "list_calls", "existing", "new", "detail_calls", "covered", "streams_calls", "fulcrum_calls",
+])
+
+Projection = namedtuple("Projection", ["finish", "window_waits", "daily_waits", "daily_left"])
+
+
+def plan_backfill(activities, form_id, specs, index, cache=None, stream_store=None, summary_only=False):
+    """Count the work a backfill of `activities` would do.
+
+    Args:
+        activities: ActivityPager over the range (consumed here)
+        form_id: target Fulcrum form (checked in `index`)
+        specs: FieldSpec for each builder that will run
+        index: FulcrumIndex to check for existing records
+        cache: activity cache (hits need no detail fetch)
+        stream_store: StreamStore when the streams stage is on, else None
+
+    Returns:
+        BackfillPlan
+    """
+    existing_ids = index.strava_ids(form_id)
+    listed = existing = detail_calls = covered = streams_calls = 0
+    for summary in activities:
+        listed += 1
+        if str(summary["id"]) in existing_ids:
+            existing += 1
+            continue
+        if (cache is None or cache.get(summary["id"]) is None) and fields_needing_detail(summary, specs, summary_only):
+            detail_calls += 1
+        else:
+            covered += 1
+        if stream_store is not None and not stream_store.has(summary["id"]):
+            streams_calls += 1
+
+    new = listed - existing
+    return BackfillPlan(listed, getattr(activities, "pages_fetched", 0), existing, new,
+                        detail_calls, covered, streams_calls, new)
+
+
+def project_finish(plan, buckets, now=None, headroom=RATE_HEADROOM, concurrency=1,
+                   strava_seconds=STRAVA_SECONDS_PER_CALL, fulcrum_seconds=FULCRUM_SECONDS_PER_CALL):
+    """Replay the plan's calls against the rate-limit buckets.
+
+    Args:
+        buckets: RateBucket copies (see StravaRateLimiter.snapshot); they
+            are spent as the replay goes
+        concurrency: activities in flight (divides latency, not the budget)
+
+    Returns:
+        Projection: finish (Unix time), window_waits (15 minute resets
+        waited for), daily_waits (daily resets waited for), daily_left
+        (daily calls left at the end)
+    """
+    t = time.time() if now is None else now
+    strava_calls = plan.detail_calls + plan.streams_calls
+    window_waits = daily_waits = 0
+
+    for _ in range(strava_calls):
+        wait = max(bucket.wait_time(t, headroom) for bucket in buckets)
+        if wait > 0:
+            before = [bucket.usage[1] for bucket in buckets]
+            t += wait
+            for bucket in buckets:
+                bucket.roll(t)
+            if any(bucket.usage[1] < used for bucket, used in zip(buckets, before)):
+                daily_waits += 1
+            else:
+                window_waits += 1
+        for bucket in buckets:
+            bucket.spend()
+        t += strava_seconds / concurrency
+
+    t += plan.fulcrum_calls * fulcrum_seconds / concurrency
+    daily_left = min(bucket.limits[1] - headroom - bucket.usage[1] for bucket in buckets)
+    return Projection(t, window_waits, daily_waits, daily_left)
+
+
+def _duration(seconds):
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} min"
+    return f"{seconds / 3600:.1f} h"
+
+
+def print_plan(plan, projection, buckets_before, now=None, headroom=RATE_HEADROOM):
+    now = time.time() if now is None else now
+    overall, read = buckets_before
+    print("="*70)
+    print("BACKFILL PLAN (nothing fetched or posted)")
+    print("="*70)
+    print(f"Listed: {plan.listed} activities ({plan.list_calls} list calls, already spent)")
+    print(f"Already in the form: {plan.existing} | To create: {plan.new}")
+    print()
+    print(f"Strava calls needed: {plan.detail_calls + plan.streams_calls}")
+    print(f"   Detail fetches: {plan.detail_calls} ({plan.covered} covered by the summary or cache)")
+    if plan.streams_calls:
+        print(f"   Streams fetches: {plan.streams_calls}")
+    print(f"Fulcrum calls needed: {plan.fulcrum_calls} record creations")
+    print()
+    print(f"Strava budget now: 15-min {overall.usage[0]}/{overall.limits[0]} used, "
+          f"daily {overall.usage[1]}/{overall.limits[1]} used (read: {read.usage[0]}/{read.limits[0]}, "
+          f"{read.usage[1]}/{read.limits[1]}; headroom {headroom})")
+    finish = datetime.fromtimestamp(projection.finish)
+    print(f"⏱️  Projected finish: {finish.strftime('%Y-%m-%d %H:%M')} (about {_duration(projection.finish - now)})")
+    if projection.window_waits or projection.daily_waits:
+        print(f"   Includes {projection.window_waits} waits for the 15-minute window"
+              + (f" and {projection.daily_waits} for the daily limit" if projection.daily_waits else ""))
+    if projection.daily_waits:
+        print("   ⚠️  Won't finish within today's Strava budget")
+    else:
+        print(f"   ✓ Fits today's Strava budget ({projection.daily_left} daily calls left afterwards)")
+    print()
+
+
+def run_plan(activities, form_id, specs, summary_only=False, concurrency=1):
+    """List the range, then print the plan and projection.
+
+    Returns:
+        tuple: (BackfillPlan, Projection)
+    """
+    from activity_cache import get_activity_cache
+    from activity_streams import get_stream_store, streams_enabled
+    from fulcrum_index import get_index, rebuild_form_index, refresh_form_index
+
+    # Fulcrum reads only - the Strava budget is untouched
+    index = get_index()
+    if index.is_indexed(form_id):
+        # Pick up records created or deleted since the last refresh, so the
+        # plan doesn't count them wrongly
+        refresh_form_index(form_id, index)
+    else:
+        print("📇 Form not indexed yet - scanning Fulcrum once to find existing records")
+        rebuild_form_index(form_id, index)
+
+    plan = plan_backfill(
+        activities, form_id, specs, index,
+        cache=get_activity_cache(),
+        stream_store=get_stream_store() if streams_enabled() else None,
+        summary_only=summary_only,
+    )
+    limiter = get_strava_limiter()
+    buckets_before = limiter.snapshot()
+    projection = project_finish(plan, limiter.snapshot(), concurrency=concurrency, headroom=limiter.headroom)
+    print_plan(plan, projection, buckets_before, headroom=limiter.headroom)
+    return plan, projection
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Sharded Backfill
+================
+
+Splits a date range into shards and backfills them in parallel processes.
+Every process draws from one shared Strava and Fulcrum budget
+(shared_budget.py), so together they run as fast as the API quota allows
+without overrunning it - rate-limit waits are shared rather than each
+process assuming it has the whole budget.
+
+Each shard is an ordinary backfill_date_range.py run over its own dates,
+with its own journal, so a sharded run can be resumed with the same
+arguments plus --resume. Output lines are prefixed with the shard number,
+and the results are merged into one summary at the end.
+
+Usage:
+    python3 backfill_shards.py START END [--shards N] [--processes N] [--resume]
+                               [--summary-only] [--trust-cache] [--streams]
+                               [--write-concurrency N | --pipeline [--stage-workers NAME=N,...]]
+
+Fulcrum writes go through the batch writer in every mode, which is what
+shares 429 pauses between the shards; backfill_date_range.py's
+--concurrency mode writes directly, so it isn't offered here.
+
+Example:
+    python3 backfill_shards.py 2022-01-01 2026-05-02 --shards 8 --processes 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+from dotenv import load_dotenv
+
+# Load environment variables from .env file (before the project modules read their settings)
+load_dotenv()
+
+from shared_budget import init_budget_db, install_shared_budget, RATE_DB_PATH
+
+ShardResult = namedtuple("ShardResult", [
+    "shard", "start_date", "end_date", "listed", "created", "skipped", "errors", "listing_error", "seconds",
+])
+
+
+def split_range(start_date, end_date, shards):
+    """Split [start_date, end_date] into up to `shards` contiguous day ranges.
+
+    Returns:
+        list of (start, end) datetimes; each shard ends where the next starts
+    """
+    days = max((end_date - start_date).days, 1)
+    shards = max(min(shards, days), 1)
+    bounds = [start_date + timedelta(days=days * i // shards) for i in range(shards)] + [end_date]
+    return list(zip(bounds, bounds[1:]))
+
+
+class _PrefixedOutput:
+    """Text stream that prefixes each complete line (shard output shares the terminal)."""
+
+    def __init__(self, stream, prefix):
+        self.stream = stream
+        self.prefix = prefix
+        self._buffer = ""
+        self._lock = threading.Lock()
+
+    def write(self, text):
+        with self._lock:
+            self._buffer += text
+            while "\n" in self._buffer:
+                line, self._buffer = self._buffer.split("\n", 1)
+                self.stream.write(f"{self.prefix}{line}\n")
+            self.stream.flush()
+        return len(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def run_shard(shard, start_date_str, end_date_str, options):
+    """Backfill one shard (runs in a worker process).
+
+    Returns:
+        ShardResult
+    """
+    sys.stdout = _PrefixedOutput(sys.stdout, f"[shard {shard}] ")
+
+    from activity_cache import set_trust_cache
+    from activity_streams import set_streams_enabled
+    from backfill_journal import BackfillJournal
+    from backfill_date_range import open_activities, process_activities, parse_date
+
+    if options["trust_cache"]:
+        set_trust_cache(True)
+    if options["streams"]:
+        set_streams_enabled(True)
+
+    form_id = os.environ.get("FULCRUM_FORM_ID_V2")
+    started = time.time()
+    activities = open_activities(
+        BackfillJournal(), form_id, parse_date(start_date_str), parse_date(end_date_str),
+        start_date_str, end_date_str, resume=options["resume"],
+    )
+    created, skipped, errors = process_activities(
+        activities, form_id,
+        summary_only=options["summary_only"],
+        concurrency=options["concurrency"],
+        write_concurrency=options["write_concurrency"],
+        stage_workers=options["stage_workers"],
+    )
+    return ShardResult(shard, start_date_str, end_date_str, activities.count, created, skipped, errors,
+                       activities.error, time.time() - started)
+
+
+def run_shards(start_date, end_date, shards, processes, options, budget_db=None):
+    """Backfill every shard through a process pool sharing one rate budget.
+
+    Returns:
+        list of ShardResult (one per shard, in shard order); a shard whose
+        process crashed has listed=0 and its exception as listing_error
+    """
+    budget_db = os.path.abspath(budget_db or RATE_DB_PATH)
+    init_budget_db(budget_db)
+
+    ranges = [(start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"))
+              for start, end in split_range(start_date, end_date, shards)]
+    results = {}
+    # spawn, so no worker inherits the coordinator's session or limiter
+    with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=install_shared_budget, initargs=(budget_db,)) as pool:
+        futures = {
+            pool.submit(run_shard, shard, shard_start, shard_end, options): (shard, shard_start, shard_end)
+            for shard, (shard_start, shard_end) in enumerate(ranges, 1)
+        }
+        for future in as_completed(futures):
+            shard, shard_start, shard_end = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                result = ShardResult(shard, shard_start, shard_end, 0, 0, 0, 1, f"shard crashed: {e}", 0.0)
+            results[shard] = result
+            print(f"✓ Shard {shard} ({shard_start} to {shard_end}) finished: {result.created} created, "
+                  f"{result.skipped} skipped, {result.errors} errors")
+    return [results[shard] for shard in sorted(results)]
+
+
+def print_summary(results, total_time, form_id):
+    created = sum(r.created for r in results)
+    skipped = sum(r.skipped for r in results)
+    errors = sum(r.errors for r in results)
+
+    print()
+    print("="*70)
+    print("SHARDED BACKFILL COMPLETE")
+    print("="*70)
+    print(f"Shards: {len(results)}")
+    print(f"Total activities: {sum(r.listed for r in results)}")
+    for r in results:
+        if r.listing_error:
+            print(f"⚠️  Shard {r.shard} ({r.start_date} to {r.end_date}): {r.listing_error}")
+    print(f"✅ Successfully created: {created}")
+    print(f"⏭️  Skipped (duplicates): {skipped}")
+    print(f"❌ Errors: {errors}")
+    print()
+    print(f"⏱️  Total time: {total_time/60:.1f} minutes ({total_time/3600:.2f} hours)")
+    if created > 0:
+        print(f"   Average: {total_time/created:.1f} seconds per activity")
+    print()
+    if created > 0:
+        print(f"🎉 View your activities:")
+        print(f"   https://web.fulcrumapp.com/apps/{form_id}")
+
+
+def main():
+    from backfill_date_range import parse_date, parse_stage_workers
+    from fulcrum_index import get_index, rebuild_form_index, refresh_form_index
+    from strava_tokens import get_valid_access_token
+
+    parser = argparse.ArgumentParser(description="Backfill a date range as parallel shards sharing one rate budget")
+    parser.add_argument("start_date", help="YYYY-MM-DD")
+    parser.add_argument("end_date", help="YYYY-MM-DD")
+    parser.add_argument("--shards", type=int, default=4, help="Date ranges to split into (default: 4)")
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes (default: one per shard)")
+    parser.add_argument("--resume", action="store_true", help="Resume each shard from its journal")
+    parser.add_argument("--summary-only", action="store_true")
+    parser.add_argument("--trust-cache", action="store_true")
+    parser.add_argument("--streams", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=1, help=argparse.SUPPRESS)
+    parser.add_argument("--write-concurrency", type=int, default=0)
+    parser.add_argument("--pipeline", action="store_true")
+    parser.add_argument("--stage-workers", metavar="NAME=N,...")
+    args = parser.parse_args()
+
+    start_date, end_date = parse_date(args.start_date), parse_date(args.end_date)
+    if not start_date or not end_date or start_date > end_date:
+        parser.error("Dates must be YYYY-MM-DD with the start before the end")
+    if args.concurrency > 1:
+        parser.error("--concurrency posts to Fulcrum directly, so the shards couldn't share 429 pauses; "
+                     "use --write-concurrency N or --pipeline")
+
+    form_id = os.environ.get("FULCRUM_FORM_ID_V2")
+    if not form_id:
+        print("❌ Error: FULCRUM_FORM_ID_V2 not set in .env")
+        return 1
+
+    stage_workers = None
+    if args.pipeline or args.stage_workers:
+        try:
+            stage_workers = parse_stage_workers(args.stage_workers)
+        except ValueError as e:
+            parser.error(str(e))
+
+    # Refresh the token once here rather than racing to do it in every shard
+    try:
+        get_valid_access_token()
+    except Exception as e:
+        print(f"❌ Error getting access token: {e}")
+        return 1
+
+    # Likewise bring the duplicate index up to date once, so the shards don't
+    # each start a full scan of a form they find unindexed
+    index = get_index()
+    try:
+        if index.is_indexed(form_id):
+            refresh_form_index(form_id, index)
+        else:
+            rebuild_form_index(form_id, index)
+    except Exception as e:
+        print(f"❌ Error updating the Fulcrum index: {e}")
+        return 1
+
+    options = {
+        "resume": args.resume,
+        "summary_only": args.summary_only,
+        "trust_cache": args.trust_cache,
+        "streams": args.streams,
+        "concurrency": 1,
+        # Without the pipeline, write through the batch writer so Fulcrum
+        # 429 pauses are shared between the shards
+        "write_concurrency": args.write_concurrency or (0 if stage_workers else 1),
+        "stage_workers": stage_workers,
+    }
+    shards = len(split_range(start_date, end_date, args.shards))
+    processes = args.processes or shards
+
+    print("="*70)
+    print(f"SHARDED BACKFILL: {args.start_date} to {args.end_date} ({shards} shards, {processes} processes)")
+    print("="*70)
+    print()
+
+    started = time.time()
+    results = run_shards(start_date, end_date, args.shards, processes, options)
+    print_summary(results, time.time() - started, form_id)
+
+    if any(r.errors for r in results):
+        print(f"🔁 Retry the failures with: python3 backfill_shards.py {args.start_date} {args.end_date} "
+              f"--shards {args.shards} --resume")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
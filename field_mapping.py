@@ -0,0 +1,140 @@
+"""
+Declarative Fulcrum Field Mapping
+=================================
+
+Describes a payload builder's form values as data - (Fulcrum key, Strava
+path, converters) - and compiles it once into a flat list of accessors, so
+building a record is a single loop with no per-record dict literal.
+
+Compiling against a form definition (.fulcrumapp export) checks every key
+up front: a typo, a Section, or a field the form calculates itself raises
+MappingError at import time instead of silently dropping data.
+
+Example:
+    MAPPING = compile_mapping([
+        ("7980", "name"),
+        ("9000", "distance", meters_to_miles),
+        ("1acf", None, seconds_per_mile),                # converter gets the whole activity
+        ("4840", "total_elevation_gain", (meters_to_feet, round_or_none)),
+    ], schema=load_form_schema("run_fulcrum_app_builder.fulcrumapp"))
+
+    form_values = MAPPING.form_values(activity)
+"""
+
+import json
+
+# Element types that hold no value of their own or are computed by Fulcrum
+NON_WRITABLE_TYPES = frozenset(["Section", "Repeatable", "Label", "CalculatedField"])
+
+
+class MappingError(ValueError):
+    pass
+
+
+def load_form_schema(path):
+    """Flatten a .fulcrumapp export into {key: element}, including nested sections."""
+    with open(path) as f:
+        data = json.load(f)
+    form = data.get("form", data)
+
+    elements = {}
+
+    def walk(items):
+        for element in items:
+            elements[element["key"]] = element
+            walk(element.get("elements") or [])
+
+    walk(form.get("elements", []))
+    if form.get("status_field"):
+        elements["@status"] = form["status_field"]
+    return elements
+
+
+def _getter(path):
+    """Return a function reading `path` ("a.b", or None for the whole activity)."""
+    if path is None:
+        return lambda activity: activity
+    parts = path.split(".")
+    if len(parts) == 1:
+        key = parts[0]
+        return lambda activity: activity.get(key)
+
+    def get_nested(activity):
+        value = activity
+        for part in parts:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(part)
+        return value
+    return get_nested
+
+
+def _converter(convert):
+    if convert is None:
+        return None
+    if callable(convert):
+        return convert
+    steps = tuple(convert)
+
+    def chained(value):
+        for step in steps:
+            value = step(value)
+        return value
+    return chained
+
+
+class CompiledMapping:
+    """A field mapping ready to run: list of (key, getter, converter)."""
+
+    def __init__(self, accessors):
+        self._accessors = accessors
+        self.keys = [key for key, _get, _convert in accessors]
+
+    def form_values(self, activity):
+        """Build Fulcrum form_values: converted, non-None values as strings."""
+        values = {}
+        for key, get, convert in self._accessors:
+            value = get(activity)
+            if convert is not None:
+                value = convert(value)
+            if value is not None:
+                values[key] = str(value)
+        return values
+
+
+def compile_mapping(spec, schema=None, extra_keys=()):
+    """Compile a mapping spec, validating it against a form schema if given.
+
+    Args:
+        spec: list of (key, path) or (key, path, converter) where converter
+            is a function or a sequence of functions applied in order;
+            converters are called even when the value is missing (None)
+        schema: {key: element} from load_form_schema, or None to skip checks
+        extra_keys: keys known to exist on the live form but missing from
+            the exported schema
+
+    Raises:
+        MappingError: duplicate key, or a key the form can't accept
+    """
+    accessors = []
+    seen = set()
+    problems = []
+    for entry in spec:
+        key, path = entry[0], entry[1]
+        convert = entry[2] if len(entry) > 2 else None
+        if key in seen:
+            problems.append(f"'{key}' is mapped twice")
+        seen.add(key)
+
+        if schema is not None and key not in extra_keys:
+            element = schema.get(key)
+            if element is None:
+                problems.append(f"'{key}' ({path}) is not a field on the form")
+            elif element.get("type") in NON_WRITABLE_TYPES:
+                problems.append(f"'{key}' ({path}) is a {element['type']} and can't be written")
+
+        accessors.append((key, _getter(path), _converter(convert)))
+
+    if problems:
+        raise MappingError("Invalid field mapping: " + "; ".join(problems))
+    return CompiledMapping(accessors)
@@ -0,0 +1,279 @@
+"""
+Fulcrum Form Router
+===================
+
+Routing table mapping new Strava activities to any number of Fulcrum forms.
+
+Each route names a target form, the payload builder that fills it in, and
+optional filters. For each activity the router:
+
+1. checks every route's form for an existing record (concurrently),
+2. fetches the activity and decodes its geometry once (then simplifies it
+   once per distinct per-form resolution),
+3. drops routes whose filters don't match,
+4. builds, validates and posts each remaining form's record (concurrently),
+
+and reports an outcome per route.
+
+Routes come from a JSON file (FULCRUM_FORMS_CONFIG, default forms.json):
+
+    [
+      {"name": "Original Form", "form_id_env": "FULCRUM_FORM_ID", "builder": "v1"},
+      {"name": "Enhanced v2 Form", "form_id_env": "FULCRUM_FORM_ID_V2", "builder": "v2"},
+      {"name": "Runs 2025+", "form_id": "abcd-1234", "builder": "v2",
+       "types": ["Run", "TrailRun"], "after": "2025-01-01",
+       "geometry": {"method": "dp", "tolerance_m": 10, "precision": 5}}
+    ]
+
+`builder` is a registered name ("v1", "v2") or "module:function" for a
+builder defined elsewhere, so adding a form needs no change here. An
+optional "schema" names the form's .fulcrumapp export; payloads are
+validated against it before posting (v1/v2 default to the bundled exports).
+An optional "geometry" sets the form's line simplification (geometry.py).
+Without a config file the routes come from FULCRUM_FORM_ID, plus
+FULCRUM_FORM_ID_V2 when ENABLE_DUAL_FORM=true.
+"""
+
+import importlib
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from activity_fields import FieldSpec
+from fulcrum_index import activity_exists_in_fulcrum
+from payload_validation import get_validator
+from geometry import shape_linestring, spec_from_config, builtin_spec
+
+FORMS_CONFIG_PATH = os.environ.get("FULCRUM_FORMS_CONFIG", "forms.json")
+ROUTER_WORKERS = 4
+
+# Form definitions for the built-in builders, used to validate payloads
+V1_FORM_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "run_fulcrum_app_builder.fulcrumapp")
+V2_FORM_SCHEMA = os.environ.get("FULCRUM_FORM_SCHEMA_V2", "activities-enhanced-v2.fulcrumapp")
+_builtin_schemas = {"v1": V1_FORM_SCHEMA, "v2": V2_FORM_SCHEMA}
+
+# name -> (build(activity, geojson) -> payload, FieldSpec)
+_builders = {}
+
+# Where the built-in builders live, for processes that haven't imported them
+_builtin_builders = {
+    "v1": ("strava_webhook_dual_form", "build_fulcrum_payload_v1", "PAYLOAD_V1_FIELDS"),
+    "v2": ("strava_webhook_dual_form", "build_fulcrum_payload_v2", "PAYLOAD_V2_FIELDS"),
+}
+
+Route = namedtuple("Route", ["name", "form_id", "builder", "types", "after", "before", "schema", "geometry"],
+                   defaults=((), None, None, None, None))
+
+
+def register_builder(name, build, fields=None):
+    """Make a payload builder available to routes under `name`."""
+    _builders[name] = (build, fields or FieldSpec(required=(), optional=()))
+
+
+def get_builder(name):
+    """Return (build, FieldSpec) for a registered name or "module:function".
+
+    Raises:
+        ValueError: if the builder can't be found
+    """
+    if name in _builders:
+        return _builders[name]
+
+    if name in _builtin_builders:
+        module_name, func_name, fields_name = _builtin_builders[name]
+    elif ":" in name:
+        module_name, func_name = name.split(":", 1)
+        fields_name = None
+    else:
+        raise ValueError(f"Unknown payload builder '{name}'")
+
+    try:
+        module = importlib.import_module(module_name)
+        build = getattr(module, func_name)
+    except (ImportError, AttributeError) as e:
+        raise ValueError(f"Cannot load payload builder '{name}': {e}")
+    fields = getattr(module, fields_name, None) if fields_name else getattr(build, "fields", None)
+    register_builder(name, build, fields)
+    return _builders[name]
+
+
+def route_matches(route, activity):
+    """Apply a route's filters to an activity."""
+    if route.types and not ({activity.get("type"), activity.get("sport_type")} & set(route.types)):
+        return False
+    day = (activity.get("start_date_local") or "")[:10]
+    if route.after and day < route.after:
+        return False
+    if route.before and day > route.before:
+        return False
+    return True
+
+
+def routes_from_env(dual=None):
+    """The routes implied by the FULCRUM_FORM_ID / ENABLE_DUAL_FORM settings.
+
+    dual=False leaves out the v2 form whatever ENABLE_DUAL_FORM says (for the
+    single-form app).
+    """
+    routes = []
+    if os.environ.get("FULCRUM_FORM_ID"):
+        routes.append(Route("Original Form", os.environ["FULCRUM_FORM_ID"], "v1",
+                            schema=V1_FORM_SCHEMA, geometry=builtin_spec("v1")))
+
+    if dual is None:
+        dual = os.environ.get("ENABLE_DUAL_FORM", "false").lower() == "true"
+    if dual and os.environ.get("FULCRUM_FORM_ID_V2"):
+        routes.append(Route("Enhanced v2 Form", os.environ["FULCRUM_FORM_ID_V2"], "v2",
+                            schema=V2_FORM_SCHEMA, geometry=builtin_spec("v2")))
+    elif dual:
+        print("\n⚠️  ENABLE_DUAL_FORM is true but FULCRUM_FORM_ID_V2 is not set!")
+        print("   Skipping v2 form submission.")
+    return routes
+
+
+def load_routes(path=None, dual=None):
+    """Read the routing table, falling back to the environment settings.
+
+    `dual` is passed to routes_from_env when there is no config file.
+
+    Raises:
+        ValueError: if the config file is malformed
+    """
+    path = path or FORMS_CONFIG_PATH
+    if not os.path.exists(path):
+        return routes_from_env(dual)
+
+    try:
+        with open(path) as f:
+            entries = json.load(f)
+    except ValueError as e:
+        raise ValueError(f"Invalid forms config {path}: {e}")
+    if not isinstance(entries, list):
+        raise ValueError(f"Forms config {path} must be a list of routes")
+
+    routes = []
+    for i, entry in enumerate(entries):
+        if not entry.get("enabled", True):
+            continue
+        name = entry.get("name") or f"route {i + 1}"
+        form_id = entry.get("form_id") or os.environ.get(entry.get("form_id_env", ""))
+        if not form_id:
+            print(f"⚠️  Forms config: no form ID for '{name}' - skipping")
+            continue
+        if "builder" not in entry:
+            raise ValueError(f"Forms config: route '{name}' has no builder")
+        get_builder(entry["builder"])  # fail fast on typos
+        schema = entry.get("schema") or _builtin_schemas.get(entry["builder"])
+        default_geometry = builtin_spec(entry["builder"]) if entry["builder"] in _builtin_schemas else None
+        geometry = spec_from_config(entry.get("geometry"), default_geometry)
+        routes.append(Route(name, form_id, entry["builder"], tuple(entry.get("types", ())),
+                            entry.get("after"), entry.get("before"), schema, geometry))
+    return routes
+
+
+class FormRouter:
+    """Fan one activity out to every matching route.
+
+    Args:
+        routes: list of Route
+        fetch: fetch(activity_id) -> activity dict or None
+        geometry: geometry(activity) -> GeoJSON for the record
+        create: create(payload, form_id, form_name) -> requests.Response
+        exists: exists(activity_id, form_id) -> bool
+    """
+
+    def __init__(self, routes, fetch, geometry, create, exists=activity_exists_in_fulcrum,
+                 workers=ROUTER_WORKERS):
+        self.routes = list(routes)
+        self.fetch = fetch
+        self.geometry = geometry
+        self.create = create
+        self.exists = exists
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="form-router")
+
+    def field_specs(self, routes=None):
+        """FieldSpecs of the builders these routes use (for resolve_activity)."""
+        return [get_builder(route.builder)[1] for route in (self.routes if routes is None else routes)]
+
+    def _submit(self, route, activity, geojson):
+        build, _fields = get_builder(route.builder)
+        payload = build(activity, geojson)
+
+        validator = get_validator(route.schema)
+        problems = validator.validate(payload) if validator else []
+        if problems:
+            print(f"✗ {route.name}: payload rejected locally, not posted:")
+            for problem in problems:
+                print(f"  - {problem}")
+            return f"invalid ({len(problems)} problem{'s' if len(problems) > 1 else ''})"
+
+        resp = self.create(payload, route.form_id, route.name)
+        if resp.status_code == 201:
+            return "created"
+        return f"failed (HTTP {resp.status_code})"
+
+    def dispatch(self, activity_id, activity=None):
+        """Create the activity's record in every matching form that lacks one.
+
+        Args:
+            activity_id: Strava activity ID
+            activity: already-fetched activity data (skips the fetch)
+
+        Returns:
+            dict: route name -> 'created', 'duplicate', 'filtered' or a
+            failure description
+
+        Raises:
+            RuntimeError: if the activity can't be fetched
+        """
+        outcomes = {}
+        exists = list(self._executor.map(lambda route: self.exists(activity_id, route.form_id), self.routes))
+        pending = []
+        for route, already_there in zip(self.routes, exists):
+            if already_there:
+                print(f"Activity {activity_id} already exists in {route.name} - skipping")
+                outcomes[route.name] = "duplicate"
+            else:
+                pending.append(route)
+        if not pending:
+            return outcomes
+
+        if activity is None:
+            print(f"Fetching details for activity ID: {activity_id}")
+            activity = self.fetch(activity_id)
+        if not activity:
+            raise RuntimeError(f"Failed to fetch details for activity {activity_id}")
+
+        matched = []
+        for route in pending:
+            if route_matches(route, activity):
+                matched.append(route)
+            else:
+                outcomes[route.name] = "filtered"
+        if not matched:
+            return outcomes
+
+        # Decode once; each distinct resolution is simplified once
+        geojson = self.geometry(activity)
+        shaped = {}
+        futures = []
+        for route in matched:
+            if route.geometry not in shaped:
+                shaped[route.geometry] = shape_linestring(geojson, route.geometry, route.name)
+            futures.append((route, self._executor.submit(self._submit, route, activity, shaped[route.geometry])))
+        for route, future in futures:
+            try:
+                outcomes[route.name] = future.result()
+            except Exception as e:
+                outcomes[route.name] = f"failed ({e})"
+        return outcomes
+
+
+def failed_routes(outcomes):
+    """Names of the routes whose outcome is a failure worth retrying.
+
+    An 'invalid' payload would fail the same way again, so it isn't one.
+    """
+    return [name for name, outcome in outcomes.items()
+            if outcome not in ("created", "duplicate", "filtered") and not outcome.startswith("invalid")]
@@ -0,0 +1,130 @@
+"""
+Batched Fulcrum Record Writer
+=============================
+
+Submits a stream of built payloads to Fulcrum with bounded concurrency.
+
+- Up to `concurrency` POSTs are in flight at once; payloads are pulled from
+  the input lazily, so building and writing overlap.
+- A 429 from Fulcrum pauses every writer thread until its Retry-After has
+  passed, then the same payload is retried.
+- Results come back in input order, one per payload: the Fulcrum record ID
+  on success, or the error.
+- Created records are added to the local duplicate index.
+
+Example:
+    writer = FulcrumBatchWriter(form_id, concurrency=4)
+    for result in writer.write(payloads):
+        print(result.index, result.record_id or result.error)
+"""
+
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from http_client import get_session
+from fulcrum_index import record_created, STRAVA_ID_FIELD
+
+FULCRUM_RECORDS_URL = "https://api.fulcrumapp.com/api/v2/records.json"
+DEFAULT_RETRY_AFTER = 30   # seconds to wait on a 429 without a Retry-After header
+MAX_429_RETRIES = 5
+
+# Set by shared_budget.install_shared_budget() so a 429 pauses writers in
+# every backfill process, not just this one
+_shared_pause = None
+
+WriteResult = namedtuple("WriteResult", ["index", "strava_id", "record_id", "status_code", "error"])
+
+
+def set_shared_pause(pause):
+    global _shared_pause
+    _shared_pause = pause
+
+
+def parse_retry_after(value, default=DEFAULT_RETRY_AFTER):
+    try:
+        return max(float(value), 0)
+    except (TypeError, ValueError):
+        return default
+
+
+class FulcrumBatchWriter:
+    def __init__(self, form_id, concurrency=4, api_token=None, max_retries=MAX_429_RETRIES):
+        self.form_id = form_id
+        self.concurrency = max(concurrency, 1)
+        self.api_token = api_token or os.environ.get("FULCRUM_API_TOKEN")
+        self.max_retries = max_retries
+        self._pause_until = 0.0
+        self._pause_lock = threading.Lock()
+
+    def _wait_for_pause(self):
+        while True:
+            with self._pause_lock:
+                wait = self._pause_until - time.time()
+            if _shared_pause is not None:
+                wait = max(wait, _shared_pause.remaining())
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def _pause(self, seconds):
+        with self._pause_lock:
+            self._pause_until = max(self._pause_until, time.time() + seconds)
+        if _shared_pause is not None:
+            _shared_pause.pause(seconds)
+
+    def post(self, index, payload):
+        """Create one record, retrying after 429s.
+
+        Returns:
+            WriteResult
+        """
+        payload['record']['form_id'] = self.form_id
+        strava_id = payload['record'].get('form_values', {}).get(STRAVA_ID_FIELD)
+        headers = {
+            "Accept": "application/json",
+            "Content-Type": "application/json",
+            "X-ApiToken": self.api_token
+        }
+
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_pause()
+            try:
+                resp = get_session().post(FULCRUM_RECORDS_URL, headers=headers, json=payload)
+            except requests.exceptions.RequestException as e:
+                return WriteResult(index, strava_id, None, None, f"Network error: {e}")
+
+            if resp.status_code == 429 and attempt < self.max_retries:
+                retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+                print(f"⚠️  Fulcrum rate limit hit - pausing writes for {retry_after:.0f}s")
+                self._pause(retry_after)
+                continue
+
+            if resp.status_code == 201:
+                record_created(self.form_id, payload, resp)
+                record_id = resp.json().get('record', {}).get('id')
+                return WriteResult(index, strava_id, record_id, 201, None)
+
+            try:
+                errors = resp.json().get('record', {}).get('errors') or resp.text[:200]
+            except ValueError:
+                errors = resp.text[:200]
+            return WriteResult(index, strava_id, None, resp.status_code, f"HTTP {resp.status_code}: {errors}")
+
+        return WriteResult(index, strava_id, None, 429, "Gave up after repeated 429 responses")
+
+    def write(self, payloads):
+        """Post every payload, yielding a WriteResult per payload in input order."""
+        window = deque()
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="fulcrum-write") as pool:
+            for index, payload in enumerate(payloads):
+                window.append(pool.submit(self.post, index, payload))
+                # Keep the pool busy without reading the whole input ahead
+                while len(window) >= self.concurrency * 2 or (window and window[0].done()):
+                    yield window.popleft().result()
+            while window:
+                yield window.popleft().result()
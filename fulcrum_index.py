@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+"""
+Local Fulcrum Record Index
+==========================
+
+Persistent SQLite mapping of (form_id, strava_activity_id) -> Fulcrum record ID.
+
+Duplicate checks used to page through every record in the form on every
+webhook event and every backfill item. Now they are a single local lookup:
+the index is updated whenever we create a record, and the full form scan only
+runs on an explicit rebuild (or the first time a form is seen).
+
+Records created or deleted by hand in the Fulcrum UI are picked up by a
+refresh, which only asks Fulcrum for changes since the last cursor.
+
+Usage:
+    python3 fulcrum_index.py rebuild [form_id ...]   # Full scan (default: configured forms)
+    python3 fulcrum_index.py refresh [form_id ...]   # Apply changes since last refresh
+    python3 fulcrum_index.py status                  # Show indexed forms and counts
+    python3 fulcrum_index.py lookup <activity_id> [form_id]
+"""
+
+import os
+import sys
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from http_client import get_session
+
+INDEX_DB_PATH = os.environ.get("FULCRUM_INDEX_DB", ".fulcrum-index.db")
+FULCRUM_RECORDS_URL = "https://api.fulcrumapp.com/api/v2/records.json"
+FULCRUM_HISTORY_URL = "https://api.fulcrumapp.com/api/v2/records/history.json"
+STRAVA_ID_FIELD = "25a0"  # strava_activity_id field key
+SCAN_PAGE_SIZE = 100
+
+# Concurrent page requests during a full form scan
+SCAN_WORKERS = int(os.environ.get("FULCRUM_SCAN_WORKERS", "4"))
+
+# Refresh cursors are moved back this far to cover clock skew between us and
+# Fulcrum. Re-applying a change is harmless.
+CURSOR_OVERLAP_SECONDS = 120
+
+# One first-time rebuild at a time: concurrent duplicate checks for a new
+# form would otherwise each start their own full scan
+_rebuild_lock = threading.Lock()
+
+
+class FulcrumIndex:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or INDEX_DB_PATH
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            # Rows used to be keyed on the activity, which kept only one of
+            # several records for it; they are keyed on the record now
+            primary_key = [row[1] for row in sorted(conn.execute("PRAGMA table_info(records)"), key=lambda row: row[5])
+                           if row[5]]
+            migrating = primary_key == ["form_id", "strava_id"]
+            if migrating:
+                conn.execute("DROP INDEX IF EXISTS idx_records_record_id")
+                conn.execute("ALTER TABLE records RENAME TO records_by_activity")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS records (
+                    form_id TEXT NOT NULL,
+                    strava_id TEXT NOT NULL,
+                    record_id TEXT,
+                    indexed_at REAL NOT NULL,
+                    PRIMARY KEY (form_id, record_id)
+                )
+            """)
+            if migrating:
+                conn.execute("""
+                    INSERT OR REPLACE INTO records (form_id, strava_id, record_id, indexed_at)
+                    SELECT form_id, strava_id, record_id, indexed_at FROM records_by_activity
+                """)
+                conn.execute("DROP TABLE records_by_activity")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS forms (
+                    form_id TEXT PRIMARY KEY,
+                    rebuilt_at REAL,
+                    refresh_cursor REAL
+                )
+            """)
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(forms)")]
+            if "refresh_cursor" not in columns:
+                conn.execute("ALTER TABLE forms ADD COLUMN refresh_cursor REAL")
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_records_strava_id ON records (form_id, strava_id)"
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def lookup(self, form_id, strava_id):
+        """Return the Fulcrum record ID for an activity, or None if not indexed."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT record_id FROM records WHERE form_id = ? AND strava_id = ? ORDER BY indexed_at LIMIT 1",
+                (form_id, str(strava_id)),
+            ).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def contains(self, form_id, strava_id):
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT 1 FROM records WHERE form_id = ? AND strava_id = ?",
+                (form_id, str(strava_id)),
+            ).fetchone()
+            return row is not None
+        finally:
+            conn.close()
+
+    def add(self, form_id, strava_id, record_id):
+        """Record that an activity now exists in a form."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                """
+                INSERT OR REPLACE INTO records (form_id, strava_id, record_id, indexed_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                (form_id, str(strava_id), record_id, time.time()),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def is_indexed(self, form_id):
+        """True once a form has had at least one full rebuild."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT rebuilt_at FROM forms WHERE form_id = ?", (form_id,)
+            ).fetchone()
+            return bool(row and row[0])
+        finally:
+            conn.close()
+
+    def refresh_cursor(self, form_id):
+        """Return the epoch time of the last refresh/rebuild, or None."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT refresh_cursor FROM forms WHERE form_id = ?", (form_id,)
+            ).fetchone()
+            return row[0] if row else None
+        finally:
+            conn.close()
+
+    def apply_changes(self, form_id, upserts, deleted_record_ids, cursor):
+        """Apply incremental changes for a form in one transaction.
+
+        Args:
+            form_id: Fulcrum form ID
+            upserts: iterable of (strava_id, record_id) for created/updated
+                records; strava_id is None for a record whose Strava ID was
+                cleared, which just drops it from the index
+            deleted_record_ids: iterable of Fulcrum record IDs that were deleted
+            cursor: epoch time to resume from on the next refresh
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            for strava_id, record_id in upserts:
+                # The record may have been re-pointed at a different activity
+                conn.execute(
+                    "DELETE FROM records WHERE form_id = ? AND record_id = ?",
+                    (form_id, record_id),
+                )
+                if strava_id:
+                    conn.execute(
+                        """
+                        INSERT OR REPLACE INTO records (form_id, strava_id, record_id, indexed_at)
+                        VALUES (?, ?, ?, ?)
+                        """,
+                        (form_id, str(strava_id), record_id, now),
+                    )
+            conn.executemany(
+                "DELETE FROM records WHERE form_id = ? AND record_id = ?",
+                ((form_id, record_id) for record_id in deleted_record_ids),
+            )
+            conn.execute(
+                "UPDATE forms SET refresh_cursor = ? WHERE form_id = ?", (cursor, form_id)
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def replace_form(self, form_id, entries, cursor=None):
+        """Replace every entry for a form in one transaction.
+
+        Args:
+            form_id: Fulcrum form ID
+            entries: iterable of (strava_id, record_id) pairs
+            cursor: epoch time the scan started, for the next refresh
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM records WHERE form_id = ?", (form_id,))
+            conn.executemany(
+                """
+                INSERT OR REPLACE INTO records (form_id, strava_id, record_id, indexed_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                ((form_id, str(strava_id), record_id, now) for strava_id, record_id in entries),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO forms (form_id, rebuilt_at, refresh_cursor) VALUES (?, ?, ?)",
+                (form_id, now, cursor if cursor is not None else now),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+
+    def strava_ids(self, form_id):
+        """Return the set of Strava activity IDs indexed for a form."""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT strava_id FROM records WHERE form_id = ?", (form_id,)
+            ).fetchall()
+            return {row[0] for row in rows}
+        finally:
+            conn.close()
+
+    def stats(self):
+        """Return {form_id: (activity_count, rebuilt_at)} for every known form."""
+        conn = self._connect()
+        try:
+            rows = conn.execute("""
+                SELECT f.form_id, COUNT(DISTINCT r.strava_id), f.rebuilt_at
+                FROM forms f LEFT JOIN records r ON r.form_id = f.form_id
+                GROUP BY f.form_id
+            """).fetchall()
+            return {form_id: (count, rebuilt_at) for form_id, count, rebuilt_at in rows}
+        finally:
+            conn.close()
+
+
+_default_index = None
+
+def get_index():
+    """Return the process-wide index instance."""
+    global _default_index
+    if _default_index is None:
+        _default_index = FulcrumIndex()
+    return _default_index
+
+
+def fetch_form_records(form_id, api_token=None, updated_since=None, url=FULCRUM_RECORDS_URL, page=1):
+    """Yield every record in a form, paging through records.json.
+
+    Args:
+        form_id: Fulcrum form ID
+        api_token: Fulcrum API token (default: FULCRUM_API_TOKEN)
+        updated_since: only return records changed after this epoch time
+        url: records endpoint (records.json or records/history.json)
+        page: page to start from
+
+    Raises:
+        RuntimeError: if Fulcrum returns an error for any page
+    """
+    api_token = api_token or os.environ.get("FULCRUM_API_TOKEN")
+    headers = {
+        "Accept": "application/json",
+        "X-ApiToken": api_token
+    }
+
+    while True:
+        params = {
+            "form_id": form_id,
+            "page": page,
+            "per_page": SCAN_PAGE_SIZE
+        }
+        if updated_since is not None:
+            params["updated_since"] = int(updated_since)
+        response = get_session().get(url, headers=headers, params=params)
+
+        if response.status_code != 200:
+            raise RuntimeError(f"Error reading Fulcrum page {page}: {response.status_code}")
+
+        records = response.json().get("records", [])
+        yield from records
+
+        # If we got fewer records than per_page, we've reached the end
+        if len(records) < SCAN_PAGE_SIZE:
+            break
+
+        page += 1
+
+
+def scan_form_records(form_id, api_token=None, workers=None):
+    """Yield every record in a form, fetching pages concurrently.
+
+    Page 1 is fetched first to learn total_pages from the response; the
+    remaining pages are then requested on a bounded thread pool sharing the
+    pooled session, and records are yielded as each page arrives (not in page order).
+    Falls back to sequential paging if Fulcrum doesn't report total_pages.
+
+    Raises:
+        RuntimeError: if Fulcrum returns an error for any page
+    """
+    api_token = api_token or os.environ.get("FULCRUM_API_TOKEN")
+    workers = workers or SCAN_WORKERS
+    session = get_session()
+    headers = {
+        "Accept": "application/json",
+        "X-ApiToken": api_token
+    }
+
+    def fetch_page(page):
+        params = {
+            "form_id": form_id,
+            "page": page,
+            "per_page": SCAN_PAGE_SIZE
+        }
+        response = session.get(FULCRUM_RECORDS_URL, headers=headers, params=params)
+        if response.status_code != 200:
+            raise RuntimeError(f"Error reading Fulcrum page {page}: {response.status_code}")
+        return response.json()
+
+    first = fetch_page(1)
+    yield from first.get("records", [])
+
+    total_pages = first.get("total_pages")
+    if total_pages is None:
+        if len(first.get("records", [])) == SCAN_PAGE_SIZE:
+            yield from fetch_form_records(form_id, api_token, page=2)
+        return
+
+    if total_pages <= 1:
+        return
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(fetch_page, page) for page in range(2, total_pages + 1)]
+        try:
+            for future in as_completed(futures):
+                yield from future.result().get("records", [])
+        finally:
+            # Don't start the remaining pages if the caller stopped early or a page failed
+            for future in futures:
+                future.cancel()
+
+
+def index_form_scan(form_id, index=None, on_record=None):
+    """Scan every record in a form and replace its index entries.
+
+    The refresh cursor is set to the scan's start, less the overlap, so
+    records changed during the scan are picked up by the next refresh.
+
+    Args:
+        on_record: called with each record as it is scanned, for callers
+            that need more of the record than its Strava ID
+
+    Returns:
+        int: number of activities indexed
+    """
+    index = index or get_index()
+    scan_started = time.time()
+    entries = []
+    for record in scan_form_records(form_id):
+        if on_record:
+            on_record(record)
+        strava_id = (record.get("form_values") or {}).get(STRAVA_ID_FIELD)
+        if strava_id:
+            entries.append((strava_id, record.get("id")))
+
+    index.replace_form(form_id, entries, cursor=scan_started - CURSOR_OVERLAP_SECONDS)
+    return len(entries)
+
+
+def rebuild_form_index(form_id, index=None):
+    """Full scan of a form, replacing its index entries.
+
+    Returns:
+        int: number of activities indexed
+    """
+    print(f"Rebuilding Fulcrum index for form {form_id} (full scan)...")
+    count = index_form_scan(form_id, index)
+    print(f"✓ Indexed {count} activities for form {form_id}")
+    return count
+
+
+def refresh_form_index(form_id, index=None):
+    """Apply records created, edited or deleted since the last refresh.
+
+    Costs one records.json request for creates/updates and one
+    records/history.json request for deletes (more only if over 100 changed).
+    Falls back to a full rebuild for a form that has never been indexed.
+
+    Returns:
+        tuple: (upserted_count, deleted_count)
+    """
+    index = index or get_index()
+    cursor = index.refresh_cursor(form_id)
+    if not index.is_indexed(form_id) or cursor is None:
+        return (rebuild_form_index(form_id, index), 0)
+
+    refresh_started = time.time()
+
+    # Records whose Strava ID was cleared are passed on as None, so their
+    # old entries are removed
+    upserts = []
+    for record in fetch_form_records(form_id, updated_since=cursor):
+        strava_id = (record.get("form_values") or {}).get(STRAVA_ID_FIELD)
+        upserts.append((strava_id or None, record.get("id")))
+
+    deleted = []
+    for version in fetch_form_records(form_id, updated_since=cursor, url=FULCRUM_HISTORY_URL):
+        if version.get("history_change_type") == "d":
+            deleted.append(version.get("id"))
+
+    index.apply_changes(form_id, upserts, deleted, refresh_started - CURSOR_OVERLAP_SECONDS)
+    print(f"✓ Refreshed form {form_id}: {len(upserts)} changed, {len(deleted)} deleted")
+    return (len(upserts), len(deleted))
+
+
+def activity_exists_in_fulcrum(activity_id, form_id=None):
+    """Check if an activity already exists in a Fulcrum form.
+
+    Answers from the local index. A form that has never been indexed gets
+    one full rebuild first.
+
+    Args:
+        activity_id: Strava activity ID to check
+        form_id: Fulcrum form ID (default: FULCRUM_FORM_ID)
+
+    Returns:
+        bool: True if activity exists, False otherwise
+    """
+    try:
+        api_token = os.environ.get("FULCRUM_API_TOKEN")
+        if not form_id:
+            form_id = os.environ.get("FULCRUM_FORM_ID")
+
+        if not api_token or not form_id:
+            print("Warning: Missing Fulcrum credentials, skipping duplicate check")
+            return False
+
+        index = get_index()
+        if not index.is_indexed(form_id):
+            with _rebuild_lock:
+                # Another thread may have finished the rebuild while we waited
+                if not index.is_indexed(form_id):
+                    rebuild_form_index(form_id, index)
+
+        return index.contains(form_id, activity_id)
+
+    except Exception as e:
+        print(f"Warning: Error checking for duplicates in Fulcrum: {str(e)}")
+        return False
+
+
+def record_created(form_id, payload, resp):
+    """Add a freshly created Fulcrum record to the index.
+
+    Args:
+        form_id: form the record was created in
+        payload: the payload that was posted (holds the Strava ID)
+        resp: the Fulcrum response (status 201 on success)
+    """
+    if resp is None or resp.status_code != 201:
+        return
+    try:
+        strava_id = payload['record']['form_values'].get(STRAVA_ID_FIELD)
+        record_id = resp.json().get('record', {}).get('id')
+        if strava_id:
+            get_index().add(form_id, strava_id, record_id)
+    except Exception as e:
+        print(f"Warning: Could not update Fulcrum index: {e}")
+
+
+def configured_form_ids():
+    """Return the form IDs configured in the environment."""
+    return [form_id for form_id in (
+        os.environ.get("FULCRUM_FORM_ID"),
+        os.environ.get("FULCRUM_FORM_ID_V2"),
+    ) if form_id]
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    index = get_index()
+
+    if command == "rebuild":
+        form_ids = sys.argv[2:] or configured_form_ids()
+        if not form_ids:
+            print("❌ No form IDs given and none configured in .env")
+            return 1
+        for form_id in form_ids:
+            rebuild_form_index(form_id, index)
+        return 0
+
+    if command == "refresh":
+        form_ids = sys.argv[2:] or configured_form_ids()
+        if not form_ids:
+            print("❌ No form IDs given and none configured in .env")
+            return 1
+        for form_id in form_ids:
+            refresh_form_index(form_id, index)
+        return 0
+
+    if command == "status":
+        stats = index.stats()
+        if not stats:
+            print("Index is empty. Run: python3 fulcrum_index.py rebuild")
+        for form_id, (count, rebuilt_at) in stats.items():
+            rebuilt = time.strftime('%Y-%m-%d %H:%M', time.localtime(rebuilt_at)) if rebuilt_at else 'never'
+            print(f"{form_id}: {count} activities (last rebuild: {rebuilt})")
+        return 0
+
+    if command == "lookup" and len(sys.argv) > 2:
+        activity_id = sys.argv[2]
+        form_ids = sys.argv[3:] or configured_form_ids()
+        for form_id in form_ids:
+            record_id = index.lookup(form_id, activity_id)
+            print(f"{form_id}: {record_id or 'not found'}")
+        return 0
+
+    print(__doc__)
+    return 1
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,176 @@
+"""
+Activity Geometry Processing
+============================
+
+Shrinks the GeoJSON LineString decoded from an activity's polyline before it
+is sent to Fulcrum. Each form can take its own resolution of the same
+decoded line:
+
+- Douglas-Peucker ("dp"): drops vertices closer than `tolerance` meters to
+  the simplified line.
+- Visvalingam-Whyatt ("vw"): repeatedly drops the vertex whose triangle with
+  its neighbours has the smallest area, until every remaining triangle is
+  at least `tolerance` square meters.
+- Coordinate rounding to `precision` decimal places (5 ~ 1 m).
+
+Distances use a local equirectangular projection, which is accurate to well
+under a percent over the extent of a single activity.
+
+Configuration (environment variables):
+    FULCRUM_GEOMETRY_TOLERANCE_M      Default tolerance for every form (default: 2)
+    FULCRUM_GEOMETRY_TOLERANCE_M_V1   Override for the original form
+    FULCRUM_GEOMETRY_TOLERANCE_M_V2   Override for the v2 form
+    FULCRUM_GEOMETRY_PRECISION        Decimal places kept (default: 5, the polyline precision)
+    FULCRUM_GEOMETRY_METHOD           dp or vw (default: dp)
+"""
+
+import heapq
+import math
+import os
+from collections import namedtuple
+
+METERS_PER_DEGREE_LAT = 110540.0
+METERS_PER_DEGREE_LON = 111320.0
+
+DEFAULT_TOLERANCE = float(os.environ.get("FULCRUM_GEOMETRY_TOLERANCE_M", "2"))
+DEFAULT_PRECISION = int(os.environ.get("FULCRUM_GEOMETRY_PRECISION", "5"))
+DEFAULT_METHOD = os.environ.get("FULCRUM_GEOMETRY_METHOD", "dp")
+
+# method: "dp" or "vw"; tolerance: meters (dp) or square meters (vw), 0 = keep
+# every vertex; precision: decimal places, None = no rounding
+GeometrySpec = namedtuple("GeometrySpec", ["method", "tolerance", "precision"],
+                          defaults=("dp", 0.0, None))
+
+
+def _project(coords):
+    """[[lon, lat], ...] -> [(x, y), ...] in meters around the line's first point."""
+    lat0 = math.radians(coords[0][1])
+    kx = METERS_PER_DEGREE_LON * math.cos(lat0)
+    return [(lon * kx, lat * METERS_PER_DEGREE_LAT) for lon, lat in coords]
+
+
+def _segment_distance(p, a, b):
+    """Distance from p to the segment a-b."""
+    dx, dy = b[0] - a[0], b[1] - a[1]
+    if dx == 0 and dy == 0:
+        return math.hypot(p[0] - a[0], p[1] - a[1])
+    t = ((p[0] - a[0]) * dx + (p[1] - a[1]) * dy) / (dx * dx + dy * dy)
+    t = max(0.0, min(1.0, t))
+    return math.hypot(p[0] - (a[0] + t * dx), p[1] - (a[1] + t * dy))
+
+
+def douglas_peucker(coords, tolerance):
+    """Simplify a line, keeping vertices more than `tolerance` meters off it."""
+    if len(coords) < 3 or tolerance <= 0:
+        return list(coords)
+
+    points = _project(coords)
+    keep = [False] * len(points)
+    keep[0] = keep[-1] = True
+    stack = [(0, len(points) - 1)]  # iterative, so long lines can't hit the recursion limit
+    while stack:
+        first, last = stack.pop()
+        max_distance, index = 0.0, None
+        for i in range(first + 1, last):
+            distance = _segment_distance(points[i], points[first], points[last])
+            if distance > max_distance:
+                max_distance, index = distance, i
+        if index is not None and max_distance > tolerance:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return [coord for coord, kept in zip(coords, keep) if kept]
+
+
+def _triangle_area(a, b, c):
+    return abs((b[0] - a[0]) * (c[1] - a[1]) - (c[0] - a[0]) * (b[1] - a[1])) / 2.0
+
+
+def visvalingam(coords, min_area):
+    """Simplify a line, dropping vertices whose effective area is below `min_area` m²."""
+    if len(coords) < 3 or min_area <= 0:
+        return list(coords)
+
+    points = _project(coords)
+    count = len(points)
+    prev = list(range(-1, count - 1))
+    next_ = list(range(1, count + 1))
+    removed = [False] * count
+    areas = [math.inf] * count
+    heap = []
+    for i in range(1, count - 1):
+        areas[i] = _triangle_area(points[i - 1], points[i], points[i + 1])
+        heap.append((areas[i], i))
+    heapq.heapify(heap)
+
+    while heap:
+        area, i = heapq.heappop(heap)
+        if removed[i] or area != areas[i]:
+            continue  # stale entry
+        if area >= min_area:
+            break
+        removed[i] = True
+        p, n = prev[i], next_[i]
+        next_[p], prev[n] = n, p
+        for j in (p, n):
+            if 0 < j < count - 1:
+                # Never let a neighbour's area drop below the one just removed,
+                # so removal order stays monotonic
+                areas[j] = max(_triangle_area(points[prev[j]], points[j], points[next_[j]]), area)
+                heapq.heappush(heap, (areas[j], j))
+    return [coord for coord, gone in zip(coords, removed) if not gone]
+
+
+def round_coords(coords, precision):
+    """Round coordinates, dropping consecutive vertices that become identical."""
+    if precision is None:
+        return list(coords)
+    rounded = []
+    for lon, lat in coords:
+        point = [round(lon, precision), round(lat, precision)]
+        if not rounded or point != rounded[-1]:
+            rounded.append(point)
+    return rounded
+
+
+def simplify_line(coords, spec):
+    """Apply a GeometrySpec to a list of [lon, lat] coordinates."""
+    if spec.method == "vw":
+        simplified = visvalingam(coords, spec.tolerance)
+    elif spec.method == "dp":
+        simplified = douglas_peucker(coords, spec.tolerance)
+    else:
+        raise ValueError(f"Unknown simplification method '{spec.method}' (use dp or vw)")
+    return round_coords(simplified, spec.precision)
+
+
+def shape_linestring(geojson, spec, label=""):
+    """Return a simplified copy of a GeoJSON LineString (None passes through)."""
+    if not geojson or spec is None or geojson.get("type") != "LineString":
+        return geojson
+    coords = geojson["coordinates"]
+    shaped = simplify_line(coords, spec)
+    if len(shaped) < 2 and len(coords) >= 2:
+        shaped = round_coords([coords[0], coords[-1]], spec.precision)
+    print(f"   Geometry{' (' + label + ')' if label else ''}: {len(coords)} → {len(shaped)} vertices "
+          f"({spec.method}, tolerance {spec.tolerance:g})")
+    return {"type": "LineString", "coordinates": shaped}
+
+
+def spec_from_config(config, default=None):
+    """Build a GeometrySpec from a forms.json "geometry" object."""
+    default = default or GeometrySpec(DEFAULT_METHOD, DEFAULT_TOLERANCE, DEFAULT_PRECISION)
+    if not config:
+        return default
+    return GeometrySpec(
+        config.get("method", default.method),
+        float(config.get("tolerance_m", default.tolerance)),
+        config.get("precision", default.precision),
+    )
+
+
+def builtin_spec(name):
+    """GeometrySpec for the built-in forms ("v1", "v2"), from the environment."""
+    override = os.environ.get(f"FULCRUM_GEOMETRY_TOLERANCE_M_{name.upper()}")
+    tolerance = float(override) if override is not None else DEFAULT_TOLERANCE
+    return GeometrySpec(DEFAULT_METHOD, tolerance, DEFAULT_PRECISION)
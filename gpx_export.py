@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Streaming GPX Export
+====================
+
+Writes activities as GPX 1.1 tracks, one point at a time, to a file or an
+HTTP response. The document is never built in memory: the header and footer
+are written directly and each <trkpt> is serialized with gpxpy as it's
+reached.
+
+Points come from the streams store when the activity's streams are there
+(full resolution, with time, elevation, heart rate and cadence), otherwise
+from the summary polyline (position only). Both are decoded point by point
+as the document is written; a stored activity only keeps its compact delta
+arrays (4 bytes a sample) in memory, not a list per stream.
+
+Usage:
+    python3 gpx_export.py <activity_id> [-o track.gpx]
+    python3 gpx_export.py --range 2024-06-01 2024-07-01 --out-dir gpx/ [--streams]
+"""
+
+import argparse
+import itertools
+import os
+import sys
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta, timezone
+from xml.sax.saxutils import escape, quoteattr
+
+import gpxpy.gpx
+import gpxpy.gpxfield
+
+from activity_streams import get_stream_store, streams_enabled, set_streams_enabled, stream_rows
+from polyline_batch import iter_lonlat
+
+GPXTPX_NS = "http://www.garmin.com/xmlschemas/TrackPointExtension/v1"
+CREATOR = "strava-fulcrum-bridge"
+
+GPX_TYPES = {
+    "Run": "running",
+    "TrailRun": "trail_running",
+    "Walk": "walking",
+    "Hike": "hiking",
+    "Ride": "cycling",
+}
+
+
+def _start_time(activity):
+    try:
+        return datetime.strptime(activity.get("start_date", ""), "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc)
+    except ValueError:
+        return None
+
+
+def _header(activity):
+    name = escape(activity.get("name") or f"Activity {activity.get('id')}")
+    start = _start_time(activity)
+    metadata_time = f"\n    <time>{start.strftime('%Y-%m-%dT%H:%M:%SZ')}</time>" if start else ""
+    gpx_type = GPX_TYPES.get(activity.get("type"), (activity.get("type") or "").lower())
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<gpx xmlns="http://www.topografix.com/GPX/1/1" xmlns:gpxtpx={quoteattr(GPXTPX_NS)} '
+        'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+        'xsi:schemaLocation="http://www.topografix.com/GPX/1/1 http://www.topografix.com/GPX/1/1/gpx.xsd" '
+        f'version="1.1" creator="{CREATOR}">\n'
+        f"  <metadata>\n    <name>{name}</name>{metadata_time}\n  </metadata>\n"
+        f"  <trk>\n    <name>{name}</name>\n    <type>{escape(gpx_type)}</type>\n    <trkseg>\n"
+    )
+
+
+FOOTER = "    </trkseg>\n  </trk>\n</gpx>\n"
+
+
+def _extension(heartrate, cadence):
+    element = ET.Element("gpxtpx:TrackPointExtension")
+    if heartrate is not None:
+        ET.SubElement(element, "gpxtpx:hr").text = str(int(heartrate))
+    if cadence is not None:
+        ET.SubElement(element, "gpxtpx:cad").text = str(int(cadence))
+    return element
+
+
+def iter_points(activity, streams=None):
+    """Yield gpxpy track points for an activity, lazily.
+
+    `streams` is a dict of stream lists, or per-sample rows from
+    StreamStore.iter_rows / activity_streams_for_export.
+    """
+    rows = stream_rows(streams) if isinstance(streams, dict) else iter(streams or ())
+    first = next(rows, None)
+    if first is not None and "latlng" in first:
+        start = _start_time(activity)
+        for row in itertools.chain([first], rows):
+            position = row["latlng"]
+            if not position:
+                continue  # GPS dropout
+            seconds = row.get("time")
+            point = gpxpy.gpx.GPXTrackPoint(
+                position[0], position[1],
+                elevation=row.get("altitude"),
+                time=start + timedelta(seconds=seconds) if start and seconds is not None else None,
+            )
+            if "heartrate" in row or "cadence" in row:
+                point.extensions.append(_extension(row.get("heartrate"), row.get("cadence")))
+            yield point
+        return
+
+    encoded = (activity.get("map") or {}).get("summary_polyline")
+    for lon, lat in iter_lonlat(encoded) if encoded else ():
+        yield gpxpy.gpx.GPXTrackPoint(lat, lon)
+
+
+def iter_gpx(activity, streams=None):
+    """Yield the GPX document for an activity as text chunks."""
+    yield _header(activity)
+    nsmap = {"gpxtpx": GPXTPX_NS}
+    for point in iter_points(activity, streams):
+        yield gpxpy.gpxfield.gpx_fields_to_xml(point, "trkpt", "1.1", nsmap=nsmap, indent="      ") + "\n"
+    yield FOOTER
+
+
+def activity_streams_for_export(activity_id):
+    """Stored streams for an activity as lazily decoded rows, or None.
+
+    Streams not stored yet are fetched and stored first if the streams
+    stage is on.
+    """
+    store = get_stream_store()
+    if streams_enabled() and not store.has(activity_id):
+        store.get(activity_id)
+    return store.iter_rows(activity_id)
+
+
+def write_gpx(activity, out, streams=None):
+    """Stream an activity's GPX into a writable text file object."""
+    for chunk in iter_gpx(activity, streams):
+        out.write(chunk)
+
+
+def export_activity(activity, path, streams=None):
+    """Write an activity's GPX to `path` (atomically).
+
+    Returns:
+        str: the path written
+    """
+    if streams is None:
+        streams = activity_streams_for_export(activity["id"])
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            write_gpx(activity, f, streams)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    return path
+
+
+def gpx_filename(activity):
+    return f"{(activity.get('start_date_local') or '')[:10] or 'activity'}_{activity['id']}.gpx"
+
+
+def export_range(start_date, end_date, out_dir):
+    """Export every activity in a date range, one file each.
+
+    Returns:
+        tuple: (exported, failed)
+    """
+    from strava_activities import ActivityPager
+
+    # Summaries carry the polyline, so no detail fetches are needed
+    pager = ActivityPager(after=int(start_date.timestamp()), before=int(end_date.timestamp()), predecode=True)
+    exported = failed = 0
+    for activity in pager:
+        try:
+            path = export_activity(activity, os.path.join(out_dir, gpx_filename(activity)))
+            print(f"  ✓ {activity.get('name')} -> {path}")
+            exported += 1
+        except Exception as e:
+            print(f"  ✗ {activity.get('name')}: {e}")
+            failed += 1
+    if pager.error:
+        print(f"⚠️  Listing stopped early: {pager.error}")
+    return exported, failed
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Export Strava activities as GPX")
+    parser.add_argument("activity_id", nargs="?", help="Activity to export")
+    parser.add_argument("-o", "--output", help="Output file (default: <date>_<id>.gpx)")
+    parser.add_argument("--range", nargs=2, metavar=("START", "END"), help="Export a YYYY-MM-DD date range")
+    parser.add_argument("--out-dir", default="gpx", help="Directory for --range exports (default: gpx)")
+    parser.add_argument("--streams", action="store_true",
+                        help="Fetch full-resolution streams for activities not in the streams store")
+    args = parser.parse_args()
+
+    if args.streams:
+        set_streams_enabled(True)
+
+    if args.range:
+        start, end = (datetime.strptime(d, "%Y-%m-%d") for d in args.range)
+        exported, failed = export_range(start, end, args.out_dir)
+        print(f"📁 Exported {exported} activities to {args.out_dir}" + (f" ({failed} failed)" if failed else ""))
+        return 0 if failed == 0 else 1
+
+    if not args.activity_id:
+        parser.print_help()
+        return 1
+
+    from strava_webhook_dual_form import fetch_activity, get_valid_access_token
+    activity = fetch_activity(args.activity_id, get_valid_access_token())
+    if not activity:
+        print(f"❌ Could not fetch activity {args.activity_id}")
+        return 1
+    path = export_activity(activity, args.output or gpx_filename(activity))
+    print(f"✓ Wrote {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
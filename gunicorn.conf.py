@@ -0,0 +1,14 @@
+"""
+Gunicorn settings for the bridge (loaded automatically from this directory).
+"""
+
+import sys
+
+
+def post_worker_init(worker):
+    # Apps with a queue worker (strava_webhook_dual_form) start it as soon as
+    # the gunicorn worker is up, instead of on the first webhook after a restart
+    module = sys.modules.get(getattr(worker.wsgi, "import_name", ""))
+    start_inline_worker = getattr(module, "start_inline_worker", None)
+    if start_inline_worker:
+        start_inline_worker()
@@ -0,0 +1,109 @@
+"""
+Shared HTTP Client
+==================
+
+One pooled `requests` session used for every Strava and Fulcrum call.
+
+Reusing the session keeps TLS connections alive between calls, which matters
+on a Raspberry Pi where the handshake is a large share of per-activity
+latency. The session also applies a default timeout to every request and a
+retry/backoff policy for connection errors and transient server errors.
+
+Calls to the Strava API go through the shared rate limiter (rate_limit.py),
+which waits only when Strava's 15 minute or daily budget is used up.
+
+Configuration (environment variables):
+    HTTP_TIMEOUT         Default request timeout in seconds (default: 30)
+    HTTP_MAX_RETRIES     Retries for connection errors / 5xx (default: 3)
+    HTTP_BACKOFF_FACTOR  Backoff between retries: factor * 2^n seconds (default: 1.0)
+    HTTP_POOL_SIZE       Keep-alive connections per host (default: 10)
+"""
+
+import os
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from rate_limit import get_strava_limiter
+
+DEFAULT_TIMEOUT = float(os.environ.get("HTTP_TIMEOUT", "30"))
+MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", "3"))
+BACKOFF_FACTOR = float(os.environ.get("HTTP_BACKOFF_FACTOR", "1.0"))
+POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", "10"))
+
+# Status codes worth retrying. Only idempotent methods are retried on a
+# status code, so a POST that reached Fulcrum is never sent twice.
+RETRY_STATUSES = (500, 502, 503, 504)
+RETRY_METHODS = frozenset(["GET", "HEAD", "OPTIONS"])
+
+STRAVA_API_HOST = "www.strava.com"
+STRAVA_API_PATH = "/api/"
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def is_strava_api_url(url):
+    parsed = urlparse(url)
+    return parsed.hostname == STRAVA_API_HOST and parsed.path.startswith(STRAVA_API_PATH)
+
+
+class BridgeSession(requests.Session):
+    """requests.Session with a default timeout and Strava rate limiting."""
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, rate_limiter=None):
+        super().__init__()
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        if self.rate_limiter is None or not is_strava_api_url(url):
+            return super().request(method, url, **kwargs)
+
+        self.rate_limiter.acquire(method)
+        resp = super().request(method, url, **kwargs)
+        self.rate_limiter.update(resp)
+        return resp
+
+
+def build_retry(max_retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR):
+    """Build the retry policy shared by all mounted adapters."""
+    return Retry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES,
+        allowed_methods=RETRY_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+
+
+def create_session(timeout=DEFAULT_TIMEOUT, max_retries=MAX_RETRIES,
+                   backoff_factor=BACKOFF_FACTOR, pool_size=POOL_SIZE, rate_limiter=None):
+    """Create a new pooled session with the bridge's timeout and retry policy."""
+    session = BridgeSession(timeout=timeout, rate_limiter=rate_limiter)
+    adapter = HTTPAdapter(
+        pool_connections=4,  # one pool per host: Strava API, Strava OAuth, Fulcrum
+        pool_maxsize=pool_size,
+        max_retries=build_retry(max_retries, backoff_factor),
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_session():
+    """Return the process-wide shared session, creating it on first use."""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = create_session(rate_limiter=get_strava_limiter())
+    return _session
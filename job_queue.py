@@ -0,0 +1,205 @@
+"""
+Durable Webhook Job Queue
+=========================
+
+SQLite-backed queue that sits between the Strava webhook endpoint and the
+worker that talks to Strava and Fulcrum.
+
+The webhook handler only calls `JobQueue.enqueue()` and returns 200, so Strava
+gets its acknowledgement well inside the 2 second window. The worker
+(`webhook_worker.py`) claims jobs one at a time and runs the slow
+fetch/build/post pipeline.
+
+The database runs in WAL mode with synchronous=FULL, so an acknowledged event
+survives a crash or power loss on the Pi. Jobs claimed by a worker that died
+are handed out again once their claim goes stale.
+"""
+
+import os
+import json
+import sqlite3
+import time
+
+QUEUE_DB_PATH = os.environ.get("WEBHOOK_QUEUE_DB", ".webhook-queue.db")
+
+# A claimed job that hasn't completed after this long is assumed to belong
+# to a dead worker and becomes claimable again.
+STALE_CLAIM_SECONDS = 600
+
+# Give up on a job after this many attempts (it stays in the table as 'failed')
+MAX_ATTEMPTS = 5
+
+
+def event_dedup_key(event):
+    """Build the key used to drop Strava's redelivered copies of an event."""
+    return "{}:{}:{}:{}".format(
+        event.get("object_type"),
+        event.get("aspect_type"),
+        event.get("object_id"),
+        event.get("event_time"),
+    )
+
+
+class JobQueue:
+    def __init__(self, db_path=None):
+        self.db_path = db_path or QUEUE_DB_PATH
+        self._init_db()
+
+    def _connect(self):
+        # isolation_level=None lets us issue BEGIN IMMEDIATE ourselves
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    def _init_db(self):
+        conn = self._connect()
+        try:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    dedup_key TEXT UNIQUE,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    created_at REAL NOT NULL,
+                    available_at REAL NOT NULL,
+                    claimed_at REAL,
+                    finished_at REAL
+                )
+            """)
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, available_at)"
+            )
+        finally:
+            conn.close()
+
+    def enqueue(self, event):
+        """Append a webhook event to the queue.
+
+        Returns:
+            bool: True if queued, False if this event was already queued
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                """
+                INSERT OR IGNORE INTO jobs (dedup_key, payload, created_at, available_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                (event_dedup_key(event), json.dumps(event), now, now),
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def claim(self):
+        """Claim the oldest runnable job.
+
+        Returns:
+            dict with 'id', 'attempts' and 'event', or None if nothing is runnable
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                """
+                SELECT id, payload, attempts FROM jobs
+                WHERE (status = 'pending' AND available_at <= ?)
+                   OR (status = 'processing' AND claimed_at <= ?)
+                ORDER BY id
+                LIMIT 1
+                """,
+                (now, now - STALE_CLAIM_SECONDS),
+            ).fetchone()
+
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'processing', claimed_at = ?, attempts = attempts + 1
+                WHERE id = ?
+                """,
+                (now, row["id"]),
+            )
+            conn.execute("COMMIT")
+            return {
+                "id": row["id"],
+                "attempts": row["attempts"] + 1,
+                "event": json.loads(row["payload"]),
+            }
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def complete(self, job_id):
+        """Mark a job as done."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "UPDATE jobs SET status = 'done', finished_at = ?, last_error = NULL WHERE id = ?",
+                (time.time(), job_id),
+            )
+        finally:
+            conn.close()
+
+    def fail(self, job_id, error):
+        """Record a failed attempt and schedule a retry with exponential backoff.
+
+        Returns:
+            bool: True if the job will be retried, False if it was given up on
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            attempts = row["attempts"] if row else MAX_ATTEMPTS
+
+            if attempts >= MAX_ATTEMPTS:
+                conn.execute(
+                    "UPDATE jobs SET status = 'failed', last_error = ?, finished_at = ? WHERE id = ?",
+                    (str(error)[:1000], now, job_id),
+                )
+                return False
+
+            # 30s, 60s, 120s, ... between attempts
+            backoff = 30 * (2 ** (attempts - 1))
+            conn.execute(
+                """
+                UPDATE jobs SET status = 'pending', last_error = ?, available_at = ?, claimed_at = NULL
+                WHERE id = ?
+                """,
+                (str(error)[:1000], now + backoff, job_id),
+            )
+            return True
+        finally:
+            conn.close()
+
+    def counts(self):
+        """Return the number of jobs in each status."""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+            return {status: count for status, count in rows}
+        finally:
+            conn.close()
+
+    def purge_finished(self, older_than_days=30):
+        """Delete completed jobs older than the given age."""
+        cutoff = time.time() - older_than_days * 86400
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE status = 'done' AND finished_at < ?", (cutoff,)
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
@@ -0,0 +1,137 @@
+"""
+Fulcrum Payload Validation
+==========================
+
+Checks built record payloads against a form definition (.fulcrumapp export)
+before they are posted, so a bad choice value or a non-numeric number is
+caught locally - with every problem listed at once - instead of after a
+round trip as a 422 from Fulcrum.
+
+Checks:
+- form_values keys exist on the form and are writable
+- ChoiceField values are among the field's choices (unless "other" is allowed)
+- numeric fields parse as numbers (whole numbers for the integer format)
+  and respect min/max
+- required fields are present
+- record status is one of the status field's choices
+
+Example:
+    validator = get_validator("run_fulcrum_app_builder.fulcrumapp")
+    problems = validator.validate(payload)
+    if problems:
+        print("\\n".join(problems))
+"""
+
+import os
+
+from field_mapping import load_form_schema, NON_WRITABLE_TYPES
+from fulcrum_index import STRAVA_ID_FIELD
+
+# Fields added to the live forms after the exports in this repo were taken
+KNOWN_EXTRA_KEYS = (STRAVA_ID_FIELD,)
+
+
+class PayloadValidator:
+    def __init__(self, schema, extra_keys=KNOWN_EXTRA_KEYS):
+        self.schema = schema
+        self.extra_keys = frozenset(extra_keys)
+
+    def _check_choice(self, key, element, value, problems):
+        if isinstance(value, dict):
+            chosen = value.get("choice_values") or []
+            others = value.get("other_values") or []
+        else:
+            chosen, others = [value], []
+        allowed = {choice["value"] for choice in element.get("choices") or []}
+        label = element.get("label", key)
+
+        unknown = [v for v in chosen if v not in allowed]
+        if unknown and element.get("allow_other"):
+            unknown = []
+        for v in unknown:
+            problems.append(f"{key} ({label}): '{v}' is not one of {sorted(allowed)}")
+        if others and not element.get("allow_other"):
+            problems.append(f"{key} ({label}): other values are not allowed")
+        if len(chosen) + len(others) > 1 and not element.get("multiple"):
+            problems.append(f"{key} ({label}): only one choice is allowed")
+
+    def _check_number(self, key, element, value, problems):
+        label = element.get("label", key)
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            problems.append(f"{key} ({label}): '{value}' is not a number")
+            return
+        if element.get("format") == "integer" and not number.is_integer():
+            problems.append(f"{key} ({label}): '{value}' is not a whole number")
+        if element.get("min") is not None and number < float(element["min"]):
+            problems.append(f"{key} ({label}): {value} is below the minimum {element['min']}")
+        if element.get("max") is not None and number > float(element["max"]):
+            problems.append(f"{key} ({label}): {value} is above the maximum {element['max']}")
+
+    def validate(self, payload):
+        """Return a list of problems with a payload (empty if it's valid)."""
+        record = payload.get("record", {})
+        form_values = record.get("form_values", {})
+        problems = []
+
+        for key, value in form_values.items():
+            element = self.schema.get(key)
+            if element is None:
+                if key not in self.extra_keys:
+                    problems.append(f"{key}: not a field on the form")
+                continue
+            if element.get("type") in NON_WRITABLE_TYPES:
+                problems.append(f"{key} ({element.get('label', key)}): {element['type']} can't be written")
+            elif element.get("type") == "ChoiceField":
+                self._check_choice(key, element, value, problems)
+            elif element.get("numeric"):
+                self._check_number(key, element, value, problems)
+
+        for key, element in self.schema.items():
+            if element.get("required") and key != "@status" and form_values.get(key) in (None, ""):
+                problems.append(f"{key} ({element.get('label', key)}): required but missing")
+
+        status_field = self.schema.get("@status")
+        status = record.get("status")
+        if status is not None and status_field and status_field.get("enabled", True):
+            allowed = {choice["value"] for choice in status_field.get("choices") or []}
+            if status not in allowed:
+                problems.append(f"status: '{status}' is not one of {sorted(allowed)}")
+
+        return problems
+
+    def validate_batch(self, payloads):
+        """Validate many payloads.
+
+        Returns:
+            list of (index, strava_id, problems) for the invalid payloads only
+        """
+        invalid = []
+        for index, payload in enumerate(payloads):
+            problems = self.validate(payload)
+            if problems:
+                strava_id = payload.get("record", {}).get("form_values", {}).get(STRAVA_ID_FIELD)
+                invalid.append((index, strava_id, problems))
+        return invalid
+
+
+_validators = {}
+_missing_reported = set()
+
+def get_validator(schema_path):
+    """Return a validator for a .fulcrumapp export, or None if the file doesn't exist.
+
+    A configured export that is missing is reported once per process, since
+    payloads for that form then go out unvalidated.
+    """
+    if not schema_path:
+        return None
+    if not os.path.exists(schema_path):
+        if schema_path not in _missing_reported:
+            _missing_reported.add(schema_path)
+            print(f"⚠️  Form export not found: {schema_path} - payloads for this form are posted unvalidated")
+        return None
+    if schema_path not in _validators:
+        _validators[schema_path] = PayloadValidator(load_form_schema(schema_path))
+    return _validators[schema_path]
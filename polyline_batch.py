@@ -0,0 +1,228 @@
+"""
+Batch Polyline Decoding
+=======================
+
+Decodes many encoded polylines at once into one contiguous coordinate
+buffer plus offsets, already in GeoJSON [lon, lat] order, and computes
+per-line bounding boxes and lengths over that buffer.
+
+With NumPy installed the whole batch is decoded with array operations (no
+per-character Python loop); without it the same API falls back to the
+`polyline` package and a flat `array('d')`, so NumPy stays optional.
+
+A page of activities can be decoded ahead of time with predecode(); single
+lookups through decode_lonlat() (used by get_geojson_linestring) are then
+served from that batch. iter_lonlat() decodes one line point by point for
+consumers that stream (the GPX export).
+
+Example:
+    batch = decode_batch([a["map"]["summary_polyline"] for a in page])
+    batch.line(0)        # [[lon, lat], ...]
+    batch.lengths_m()    # meters per line
+"""
+
+import math
+import threading
+from array import array
+from collections import OrderedDict
+
+import polyline
+
+try:
+    import numpy as np
+    HAVE_NUMPY = True
+except ImportError:
+    np = None
+    HAVE_NUMPY = False
+
+EARTH_RADIUS_M = 6371008.8
+
+# Lines decoded by predecode() waiting for their decode_lonlat() call
+PREDECODE_LIMIT = 400
+_predecoded = OrderedDict()
+_predecoded_lock = threading.Lock()
+
+
+def _decode_numpy(encoded, precision):
+    """Decode all lines; returns (coords (N, 2) float64 lon/lat, point offsets)."""
+    count = len(encoded)
+    byte_bounds = np.zeros(count + 1, dtype=np.int64)
+    np.cumsum([len(e) for e in encoded], out=byte_bounds[1:])
+    if byte_bounds[-1] == 0:
+        return np.empty((0, 2)), np.zeros(count + 1, dtype=np.int64)
+
+    data = np.frombuffer("".join(encoded).encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+
+    # Each value is a run of 5-bit chunks; a chunk without the 0x20 bit ends it
+    ends = np.flatnonzero((data & 0x20) == 0)
+    if len(ends) == 0:
+        return np.empty((0, 2)), np.zeros(count + 1, dtype=np.int64)
+    data = data[:ends[-1] + 1]  # ignore a truncated trailing value
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    value_of_byte = np.repeat(np.arange(len(ends)), ends - starts + 1)
+    shifts = 5 * (np.arange(len(data)) - starts[value_of_byte])
+    values = np.add.reduceat((data & 0x1f) << shifts, starts)
+    deltas = np.where(values & 1, ~(values >> 1), values >> 1)
+
+    # Values per line -> points per line (each point is a lat, lon pair)
+    point_offsets = np.searchsorted(ends, byte_bounds) // 2
+    deltas = deltas[:2 * point_offsets[-1]].reshape(-1, 2)
+
+    # Running sum within each line: global cumsum minus the sum before the line
+    totals = np.vstack([np.zeros((1, 2), dtype=np.int64), np.cumsum(deltas, axis=0)])
+    line_of_point = np.repeat(np.arange(count), np.diff(point_offsets))
+    absolute = totals[1:] - totals[point_offsets[:-1]][line_of_point]
+
+    coords = np.ascontiguousarray(absolute[:, ::-1]) / float(10 ** precision)
+    return coords, point_offsets
+
+
+class DecodedBatch:
+    """Coordinates of many lines in one buffer.
+
+    Attributes:
+        coords: (N, 2) NumPy array, or flat array('d') of lon, lat pairs
+        offsets: point offsets; line i is points offsets[i]:offsets[i + 1]
+    """
+
+    def __init__(self, coords, offsets):
+        self.coords = coords
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def _vectorized(self):
+        return not isinstance(self.coords, array)
+
+    @property
+    def point_count(self):
+        return int(self.offsets[-1])
+
+    def line(self, i):
+        """Line i as a list of [lon, lat] (GeoJSON order)."""
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        if self._vectorized:
+            return self.coords[start:end].tolist()
+        flat = self.coords
+        return [[flat[2 * j], flat[2 * j + 1]] for j in range(start, end)]
+
+    def rounded(self, precision):
+        """A copy with every coordinate rounded to `precision` decimals."""
+        if self._vectorized:
+            return DecodedBatch(np.round(self.coords, precision), self.offsets)
+        return DecodedBatch(array('d', (round(v, precision) for v in self.coords)), self.offsets)
+
+    def bboxes(self):
+        """Per-line (min_lon, min_lat, max_lon, max_lat), or None for an empty line."""
+        result = [None] * len(self)
+        if self._vectorized:
+            starts = np.asarray(self.offsets[:-1])
+            nonempty = np.flatnonzero(np.diff(self.offsets) > 0)
+            if len(nonempty):
+                mins = np.minimum.reduceat(self.coords, starts[nonempty])
+                maxs = np.maximum.reduceat(self.coords, starts[nonempty])
+                for k, i in enumerate(nonempty):
+                    result[i] = (float(mins[k, 0]), float(mins[k, 1]), float(maxs[k, 0]), float(maxs[k, 1]))
+            return result
+
+        for i in range(len(self)):
+            points = self.line(i)
+            if points:
+                lons = [p[0] for p in points]
+                lats = [p[1] for p in points]
+                result[i] = (min(lons), min(lats), max(lons), max(lats))
+        return result
+
+    def lengths_m(self):
+        """Per-line great-circle length in meters."""
+        if self._vectorized:
+            if self.point_count == 0:
+                return [0.0] * len(self)
+            lon, lat = np.radians(self.coords[:, 0]), np.radians(self.coords[:, 1])
+            a = (np.sin(np.diff(lat) / 2) ** 2
+                 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lon) / 2) ** 2)
+            segments = np.zeros(len(lat))
+            segments[1:] = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+            segments[np.asarray(self.offsets[:-1])[np.diff(self.offsets) > 0]] = 0.0  # no segment across lines
+            running = np.cumsum(segments)
+            lengths = []
+            for i in range(len(self)):
+                start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+                lengths.append(float(running[end - 1] - running[start]) if end > start else 0.0)
+            return lengths
+
+        lengths = []
+        for i in range(len(self)):
+            points = self.line(i)
+            total = 0.0
+            for (lon1, lat1), (lon2, lat2) in zip(points, points[1:]):
+                p1, p2 = math.radians(lat1), math.radians(lat2)
+                a = (math.sin((p2 - p1) / 2) ** 2
+                     + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2)
+                total += 2 * EARTH_RADIUS_M * math.asin(math.sqrt(min(a, 1.0)))
+            lengths.append(total)
+        return lengths
+
+
+def decode_batch(encoded, precision=5):
+    """Decode a list of encoded polylines (None/"" become empty lines)."""
+    encoded = [e or "" for e in encoded]
+    if HAVE_NUMPY:
+        coords, offsets = _decode_numpy(encoded, precision)
+        return DecodedBatch(coords, offsets)
+
+    flat = array('d')
+    offsets = [0]
+    for e in encoded:
+        for lon, lat in polyline.decode(e, precision, geojson=True) if e else ():
+            flat.append(lon)
+            flat.append(lat)
+        offsets.append(len(flat) // 2)
+    return DecodedBatch(flat, offsets)
+
+
+def predecode(encoded):
+    """Decode a batch now so later decode_lonlat() calls for these lines are lookups."""
+    encoded = [e for e in encoded if e]
+    if not encoded:
+        return
+    batch = decode_batch(encoded)
+    with _predecoded_lock:
+        for i, e in enumerate(encoded):
+            _predecoded[e] = batch.line(i)
+        while len(_predecoded) > PREDECODE_LIMIT:
+            _predecoded.popitem(last=False)
+
+
+def iter_lonlat(encoded, precision=5):
+    """Yield one polyline's [lon, lat] points as they're decoded (no point list is built)."""
+    factor = float(10 ** precision)
+    index = lat = lon = 0
+    while index < len(encoded):
+        deltas = []
+        for _ in range(2):
+            shift = result = 0
+            while True:
+                byte = ord(encoded[index]) - 63
+                index += 1
+                result |= (byte & 0x1f) << shift
+                shift += 5
+                if byte < 0x20:
+                    break
+            deltas.append(~(result >> 1) if result & 1 else result >> 1)
+        lat += deltas[0]
+        lon += deltas[1]
+        yield [lon / factor, lat / factor]
+
+
+def decode_lonlat(encoded):
+    """Decode one polyline to [[lon, lat], ...], using a predecoded batch if available."""
+    with _predecoded_lock:
+        coords = _predecoded.pop(encoded, None)
+    if coords is not None:
+        return coords
+    return decode_batch([encoded]).line(0)
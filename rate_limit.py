@@ -0,0 +1,201 @@
+"""
+Strava Rate Limiter
+===================
+
+Token-bucket limiter driven by the rate-limit headers Strava returns on every
+API response, shared by every Strava call made through http_client.
+
+Strava enforces two windows:
+    - 15 minutes, resetting at :00, :15, :30 and :45 (UTC)
+    - daily, resetting at midnight UTC
+
+Each response carries `X-RateLimit-Limit: <15min>,<daily>` and
+`X-RateLimit-Usage: <15min>,<daily>` (plus `X-ReadRateLimit-*` for the
+read-only budget). The limiter keeps the remaining tokens for each window,
+spends one per call, and only sleeps when a window is exhausted - exactly
+until that window resets, never longer.
+
+Configuration (environment variables):
+    STRAVA_RATE_HEADROOM  Calls to leave unused in each window (default: 2)
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+SHORT_WINDOW_SECONDS = 15 * 60
+DAILY_WINDOW_SECONDS = 24 * 60 * 60
+
+# Strava's published defaults, used until the first response tells us otherwise
+DEFAULT_LIMITS = (100, 1000)
+
+RATE_HEADROOM = int(os.environ.get("STRAVA_RATE_HEADROOM", "2"))
+
+
+def parse_rate_header(value):
+    """Parse a "short,daily" header value into a tuple of ints, or None."""
+    if not value:
+        return None
+    try:
+        short, daily = value.split(",")[:2]
+        return (int(short), int(daily))
+    except ValueError:
+        return None
+
+
+def window_start(now, length):
+    """Start of the fixed (UTC-aligned) window containing `now`."""
+    return now - (now % length)
+
+
+class RateBucket:
+    """Usage against one (15 minute, daily) limit pair."""
+
+    def __init__(self, limits=DEFAULT_LIMITS):
+        self.limits = list(limits)
+        self.usage = [0, 0]
+        self.window_starts = [0.0, 0.0]
+
+    def roll(self, now):
+        """Reset usage for any window that has ended."""
+        for i, length in enumerate((SHORT_WINDOW_SECONDS, DAILY_WINDOW_SECONDS)):
+            start = window_start(now, length)
+            if start > self.window_starts[i]:
+                self.window_starts[i] = start
+                self.usage[i] = 0
+
+    def wait_time(self, now, headroom):
+        """Seconds until a call is allowed (0 if a token is available now)."""
+        self.roll(now)
+        wait = 0.0
+        for i, length in enumerate((SHORT_WINDOW_SECONDS, DAILY_WINDOW_SECONDS)):
+            allowed = max(self.limits[i] - headroom, 1)
+            if self.usage[i] >= allowed:
+                wait = max(wait, window_start(now, length) + length - now)
+        return wait
+
+    def spend(self):
+        self.usage[0] += 1
+        self.usage[1] += 1
+
+    def update(self, limits, usage, now):
+        self.roll(now)
+        if limits:
+            self.limits = list(limits)
+        if usage:
+            # Strava's count is authoritative; it also includes calls made by
+            # other processes sharing the same application
+            self.usage = list(usage)
+
+    def exhaust(self, now):
+        """Mark the current 15 minute window as used up (after a 429)."""
+        self.roll(now)
+        self.usage[0] = max(self.usage[0], self.limits[0])
+
+    def remaining(self):
+        return (self.limits[0] - self.usage[0], self.limits[1] - self.usage[1])
+
+
+class StravaRateLimiter:
+    """Process-wide limiter for Strava API calls (thread-safe)."""
+
+    def __init__(self, headroom=RATE_HEADROOM, clock=time.time, sleep=time.sleep):
+        self.headroom = headroom
+        self.clock = clock
+        self.sleep = sleep
+        self.overall = RateBucket()
+        self.read = RateBucket()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _state(self):
+        """Hold the buckets for a read-modify-write (see shared_budget.py for
+        a version shared between processes)."""
+        with self._lock:
+            yield
+
+    def _buckets(self, method):
+        if method.upper() == "GET":
+            return (self.overall, self.read)
+        return (self.overall,)
+
+    def acquire(self, method="GET"):
+        """Block until a call is allowed, then spend a token for it.
+
+        Returns:
+            float: seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self._state():
+                now = self.clock()
+                wait = max(bucket.wait_time(now, self.headroom) for bucket in self._buckets(method))
+                if wait <= 0:
+                    for bucket in self._buckets(method):
+                        bucket.spend()
+                    return waited
+
+            print(f"⏸️  Strava rate limit reached - waiting {wait:.0f}s for the window to reset...")
+            self.sleep(wait)
+            waited += wait
+
+    def update(self, response):
+        """Sync usage from a Strava response's rate-limit headers."""
+        headers = response.headers
+        with self._state():
+            now = self.clock()
+            self.overall.update(
+                parse_rate_header(headers.get("X-RateLimit-Limit")),
+                parse_rate_header(headers.get("X-RateLimit-Usage")),
+                now,
+            )
+            read_limits = parse_rate_header(headers.get("X-ReadRateLimit-Limit"))
+            read_usage = parse_rate_header(headers.get("X-ReadRateLimit-Usage"))
+            if read_limits or read_usage:
+                self.read.update(read_limits, read_usage, now)
+
+            if response.status_code == 429:
+                self.overall.exhaust(now)
+                self.read.exhaust(now)
+
+    def snapshot(self):
+        """Copies of the (overall, read) buckets as of now, for planning."""
+        with self._state():
+            now = self.clock()
+            copies = []
+            for bucket in (self.overall, self.read):
+                bucket.roll(now)
+                copy = RateBucket(bucket.limits)
+                copy.usage = list(bucket.usage)
+                copy.window_starts = list(bucket.window_starts)
+                copies.append(copy)
+            return tuple(copies)
+
+    def remaining(self):
+        """Return ((short, daily) overall, (short, daily) read) calls left."""
+        with self._state():
+            now = self.clock()
+            self.overall.roll(now)
+            self.read.roll(now)
+            return (self.overall.remaining(), self.read.remaining())
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def set_strava_limiter(limiter):
+    """Replace the process-wide limiter (before the shared session is created)."""
+    global _limiter
+    with _limiter_lock:
+        _limiter = limiter
+
+
+def get_strava_limiter():
+    """Return the process-wide Strava rate limiter."""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = StravaRateLimiter()
+    return _limiter
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Strava / Fulcrum / Calendar Reconciliation
+==========================================
+
+Finds the gaps between Strava, the Fulcrum forms and the training calendar
+for a date range, without running a backfill to see what isn't skipped.
+
+Each source is read once:
+    - Strava: the activity list for the range (list pages only)
+    - each Fulcrum form (v1, v2): one scan of its records, keyed on the
+      Strava ID field (25a0); the scan also refreshes the local index
+    - training_plan.db: the range's `completed_activities` rows
+
+The sets are compared in memory and the result is a repair plan:
+    - missing: Strava activities with no record in a form
+    - orphaned: records in the range whose Strava activity no longer exists
+    - duplicates: activities with more than one record in a form
+    - unlinked: records in the range with no Strava ID at all
+    - calendar_without_fulcrum: calendar rows with no record in any form
+
+With --repair, only the activities missing from the v2 form are fetched,
+built and posted - O(missing) work instead of a full backfill. Orphans and
+duplicates are reported for review, never deleted.
+
+Usage:
+    python3 reconcile.py START END [--output plan.json] [--repair]
+                         [--calendar-db PATH] [--write-concurrency N]
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from datetime import datetime
+
+from fulcrum_index import STRAVA_ID_FIELD, index_form_scan
+
+DATE_FIELD = "2d48"  # Date, on both forms
+CALENDAR_DB_PATH = "training_calendar/training_plan.db"
+
+
+class Reconciliation:
+    """Set differences between the sources for one date range.
+
+    Attributes:
+        strava: Strava activity ID -> summary
+        missing: form name -> sorted Strava IDs with no record in that form
+        orphaned: form name -> [(strava_id, record_id)] for records whose
+            activity isn't on Strava
+        duplicates: form name -> {strava_id: [record_id, ...]}
+        unlinked: form name -> [record_id] for records without a Strava ID
+        calendar_without_fulcrum: sorted calendar activity IDs with no record
+    """
+
+    def __init__(self, start_date, end_date):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.strava = {}
+        self.missing = {}
+        self.orphaned = {}
+        self.duplicates = {}
+        self.unlinked = {}
+        self.calendar_without_fulcrum = []
+
+    def repair_plan(self):
+        return {
+            "range": [self.start_date, self.end_date],
+            "strava_activities": len(self.strava),
+            "missing": self.missing,
+            "orphaned": {name: [{"strava_id": s, "record_id": r} for s, r in records]
+                         for name, records in self.orphaned.items()},
+            "duplicates": self.duplicates,
+            "unlinked": self.unlinked,
+            "calendar_without_fulcrum": self.calendar_without_fulcrum,
+        }
+
+
+def _in_range(date, start_date, end_date):
+    return date is not None and start_date <= date[:10] < end_date
+
+
+def reconcile(start_date, end_date, strava, form_records, calendar_ids):
+    """Compare the sources.
+
+    Args:
+        start_date, end_date: YYYY-MM-DD (end exclusive, like the Strava listing)
+        strava: {strava_id (str): summary} for the range
+        form_records: {form name: [(strava_id or None, record_id, date or None)]}
+            for every record in each form
+        calendar_ids: set of Strava IDs in the range's calendar rows
+
+    Returns:
+        Reconciliation
+    """
+    result = Reconciliation(start_date, end_date)
+    result.strava = strava
+    strava_ids = set(strava)
+    in_any_form = set()
+
+    for name, records in form_records.items():
+        by_strava_id = {}
+        unlinked = []
+        for strava_id, record_id, date in records:
+            if strava_id:
+                by_strava_id.setdefault(strava_id, []).append(record_id)
+            elif _in_range(date, start_date, end_date):
+                unlinked.append(record_id)
+        in_any_form |= by_strava_id.keys()
+
+        dates = {strava_id: date for strava_id, _record_id, date in records if strava_id}
+        result.missing[name] = sorted(strava_ids - by_strava_id.keys())
+        result.orphaned[name] = sorted(
+            (strava_id, record_id)
+            for strava_id in by_strava_id.keys() - strava_ids
+            if _in_range(dates[strava_id], start_date, end_date)
+            for record_id in by_strava_id[strava_id]
+        )
+        result.duplicates[name] = {
+            strava_id: record_ids for strava_id, record_ids in sorted(by_strava_id.items())
+            if len(record_ids) > 1 and strava_id in strava_ids
+        }
+        result.unlinked[name] = unlinked
+
+    result.calendar_without_fulcrum = sorted(set(calendar_ids) - in_any_form)
+    return result
+
+
+def strava_activities(start_date, end_date):
+    """{strava_id: summary} for a YYYY-MM-DD range (one pass over the list pages)."""
+    from strava_activities import ActivityPager
+
+    after = int(datetime.strptime(start_date, "%Y-%m-%d").timestamp())
+    before = int(datetime.strptime(end_date, "%Y-%m-%d").timestamp())
+    pager = ActivityPager(after=after, before=before)
+    activities = {str(summary["id"]): summary for summary in pager}
+    if pager.error:
+        raise RuntimeError(f"Strava listing stopped early: {pager.error}")
+    return activities
+
+
+def form_records(form_id):
+    """[(strava_id, record_id, date)] for every record in a form (one scan).
+
+    The scan also replaces the form's entries in the local duplicate index.
+    """
+    records = []
+
+    def collect(record):
+        values = record.get("form_values") or {}
+        strava_id = values.get(STRAVA_ID_FIELD)
+        records.append((str(strava_id) if strava_id else None, record.get("id"), values.get(DATE_FIELD)))
+
+    index_form_scan(form_id, on_record=collect)
+    return records
+
+
+def calendar_activity_ids(db_path, start_date, end_date):
+    """Strava IDs of the calendar's completed activities in the range (empty without a database)."""
+    if not os.path.exists(db_path):
+        print(f"⚠️  Calendar database not found: {db_path} - skipping the calendar")
+        return set()
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(
+            "SELECT id FROM completed_activities WHERE date >= ? AND date < ?", (start_date, end_date)
+        ).fetchall()
+    finally:
+        conn.close()
+    return {str(row[0]) for row in rows}
+
+
+def print_report(result):
+    print("="*70)
+    print(f"RECONCILIATION {result.start_date} to {result.end_date}")
+    print("="*70)
+    print(f"Strava activities: {len(result.strava)}")
+    for name in result.missing:
+        print(f"  {name}: {len(result.missing[name])} missing, {len(result.orphaned[name])} orphaned, "
+              f"{len(result.duplicates[name])} duplicated, {len(result.unlinked[name])} without a Strava ID")
+    print(f"  Calendar rows without a Fulcrum record: {len(result.calendar_without_fulcrum)}")
+    print()
+
+    for name, ids in result.missing.items():
+        for strava_id in ids[:20]:
+            summary = result.strava[strava_id]
+            print(f"  ➕ {name} missing {strava_id}: {summary.get('name')} ({summary.get('start_date_local', '')[:10]})")
+        if len(ids) > 20:
+            print(f"     ... and {len(ids) - 20} more")
+    for name, records in result.orphaned.items():
+        for strava_id, record_id in records:
+            print(f"  ❓ {name} record {record_id} points at Strava {strava_id}, which isn't on Strava")
+    for name, duplicates in result.duplicates.items():
+        for strava_id, record_ids in duplicates.items():
+            print(f"  ⚠️  {name} has {len(record_ids)} records for Strava {strava_id}: {', '.join(record_ids)}")
+    for strava_id in result.calendar_without_fulcrum:
+        print(f"  📅 Calendar activity {strava_id} has no Fulcrum record")
+    print()
+
+
+def repair_missing_v2(result, form_id, write_concurrency=4, summary_only=False):
+    """Fetch, build and post only the activities missing from the v2 form.
+
+    Returns:
+        tuple: (success_count, skip_count, error_count)
+    """
+    from backfill_date_range import backfill_batched
+
+    summaries = [result.strava[strava_id] for strava_id in result.missing.get("v2", [])]
+    if not summaries:
+        print("✅ Nothing missing from the v2 form")
+        return 0, 0, 0
+    print(f"🔧 Repairing {len(summaries)} activities missing from the v2 form")
+    return backfill_batched(summaries, form_id, write_concurrency, summary_only)
+
+
+def main():
+    from dotenv import load_dotenv
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="Reconcile Strava, the Fulcrum forms and the training calendar")
+    parser.add_argument("start_date", help="YYYY-MM-DD")
+    parser.add_argument("end_date", help="YYYY-MM-DD (exclusive)")
+    parser.add_argument("--output", help="Write the repair plan as JSON to this file")
+    parser.add_argument("--repair", action="store_true", help="Create the records missing from the v2 form")
+    parser.add_argument("--calendar-db", default=CALENDAR_DB_PATH,
+                        help=f"Training calendar database (default: {CALENDAR_DB_PATH})")
+    parser.add_argument("--write-concurrency", type=int, default=4,
+                        help="Fulcrum writes in flight during --repair (default: 4)")
+    parser.add_argument("--summary-only", action="store_true",
+                        help="During --repair, skip detail fetches that only add optional fields")
+    args = parser.parse_args()
+
+    forms = {name: form_id for name, form_id in (
+        ("v1", os.environ.get("FULCRUM_FORM_ID")),
+        ("v2", os.environ.get("FULCRUM_FORM_ID_V2")),
+    ) if form_id}
+    if not forms:
+        print("❌ Error: Neither FULCRUM_FORM_ID nor FULCRUM_FORM_ID_V2 is set in .env")
+        return 1
+
+    try:
+        print("📋 Listing Strava activities...")
+        strava = strava_activities(args.start_date, args.end_date)
+        records = {}
+        for name, form_id in forms.items():
+            print(f"📋 Scanning the {name} form ({form_id})...")
+            records[name] = form_records(form_id)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+    calendar_ids = calendar_activity_ids(args.calendar_db, args.start_date, args.end_date)
+    print()
+
+    result = reconcile(args.start_date, args.end_date, strava, records, calendar_ids)
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result.repair_plan(), f, indent=2)
+        print(f"📝 Repair plan written to {args.output}")
+
+    if args.repair:
+        if "v2" not in forms:
+            print("❌ Error: FULCRUM_FORM_ID_V2 not set in .env")
+            return 1
+        _created, _skipped, errors = repair_missing_v2(result, forms["v2"], args.write_concurrency,
+                                                       args.summary_only)
+        return 0 if errors == 0 else 1
+
+    gaps = any(result.missing.values()) or any(result.orphaned.values()) or result.calendar_without_fulcrum
+    return 1 if gaps else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
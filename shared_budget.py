@@ -0,0 +1,137 @@
+"""
+Cross-Process Rate Budget
+=========================
+
+SQLite-backed versions of the bridge's rate-limit state, so several backfill
+processes (backfill_shards.py) draw from one Strava and Fulcrum budget
+instead of each assuming it has the whole quota.
+
+- SharedStravaRateLimiter keeps the 15 minute and daily buckets in the
+  database. Every spend and every header update is one BEGIN IMMEDIATE
+  transaction, so two processes can never take the same token.
+- SharedPause is a "no writes until" time: a Fulcrum 429 seen by any
+  process pauses the batch writers in all of them.
+
+install_shared_budget() switches the current process over to both; call
+it before the first request is made.
+
+Configuration (environment variables):
+    BRIDGE_RATE_DB  Database file (default: .rate-budget.db)
+"""
+
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from rate_limit import StravaRateLimiter, RATE_HEADROOM, set_strava_limiter
+
+RATE_DB_PATH = os.environ.get("BRIDGE_RATE_DB", ".rate-budget.db")
+
+
+def _connect(db_path):
+    # isolation_level=None lets us issue BEGIN IMMEDIATE ourselves
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+def init_budget_db(db_path=None):
+    conn = _connect(db_path or RATE_DB_PATH)
+    try:
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS buckets (
+                name TEXT PRIMARY KEY,
+                limit_short INTEGER NOT NULL,
+                limit_daily INTEGER NOT NULL,
+                usage_short INTEGER NOT NULL,
+                usage_daily INTEGER NOT NULL,
+                start_short REAL NOT NULL,
+                start_daily REAL NOT NULL
+            )
+        """)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS pauses (
+                name TEXT PRIMARY KEY,
+                until REAL NOT NULL
+            )
+        """)
+    finally:
+        conn.close()
+
+
+class SharedStravaRateLimiter(StravaRateLimiter):
+    """StravaRateLimiter whose buckets live in a database shared by processes."""
+
+    def __init__(self, db_path=None, headroom=RATE_HEADROOM, clock=time.time, sleep=time.sleep):
+        super().__init__(headroom=headroom, clock=clock, sleep=sleep)
+        self.db_path = db_path or RATE_DB_PATH
+        init_budget_db(self.db_path)
+
+    @contextmanager
+    def _state(self):
+        with self._lock:
+            conn = _connect(self.db_path)
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                for name, bucket in (("overall", self.overall), ("read", self.read)):
+                    row = conn.execute(
+                        "SELECT limit_short, limit_daily, usage_short, usage_daily, start_short, start_daily "
+                        "FROM buckets WHERE name = ?", (name,)
+                    ).fetchone()
+                    if row:
+                        bucket.limits = [row[0], row[1]]
+                        bucket.usage = [row[2], row[3]]
+                        bucket.window_starts = [row[4], row[5]]
+                yield
+                for name, bucket in (("overall", self.overall), ("read", self.read)):
+                    conn.execute(
+                        "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (name, *bucket.limits, *bucket.usage, *bucket.window_starts),
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            finally:
+                conn.close()
+
+
+class SharedPause:
+    """A named "wait until" time shared by processes."""
+
+    def __init__(self, name, db_path=None, clock=time.time):
+        self.name = name
+        self.db_path = db_path or RATE_DB_PATH
+        self.clock = clock
+        init_budget_db(self.db_path)
+
+    def pause(self, seconds):
+        conn = _connect(self.db_path)
+        try:
+            conn.execute(
+                """
+                INSERT INTO pauses (name, until) VALUES (?, ?)
+                ON CONFLICT(name) DO UPDATE SET until = MAX(until, excluded.until)
+                """,
+                (self.name, self.clock() + seconds),
+            )
+        finally:
+            conn.close()
+
+    def remaining(self):
+        """Seconds left in the current pause (0 if not paused)."""
+        conn = _connect(self.db_path)
+        try:
+            row = conn.execute("SELECT until FROM pauses WHERE name = ?", (self.name,)).fetchone()
+        finally:
+            conn.close()
+        return max(row[0] - self.clock(), 0.0) if row else 0.0
+
+
+def install_shared_budget(db_path=None):
+    """Use the shared Strava limiter and Fulcrum pause in this process."""
+    from fulcrum_batch import set_shared_pause
+
+    set_strava_limiter(SharedStravaRateLimiter(db_path))
+    set_shared_pause(SharedPause("fulcrum", db_path))
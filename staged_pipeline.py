@@ -0,0 +1,170 @@
+"""
+Staged Thread Pipeline
+======================
+
+Runs a stream of items through a chain of stages, each with its own worker
+threads, connected by bounded queues:
+
+    source -> [queue] -> stage 1 (N workers) -> [queue] -> stage 2 (M workers) -> ...
+
+- A stage function returns the item to pass on, or None to drop it (a
+  duplicate, a failure it has already recorded, or the end of the line).
+- Queues are bounded, so a slow stage makes the stages before it wait
+  instead of piling work up in memory (backpressure).
+- Each stage counts items done, passed on and failed, and how long its
+  workers spent on them, so a progress line can show where time goes: a
+  stage with a full input queue and busy workers is the bottleneck.
+
+Example:
+    pipeline = StagedPipeline(summaries, [
+        Stage("fetch", fetch_one, workers=2),
+        Stage("write", write_one, workers=4),
+    ])
+    pipeline.run(progress_every=15)
+"""
+
+import queue
+import threading
+import time
+
+DEFAULT_QUEUE_SIZE = 50
+
+_END = object()
+
+
+class Stage:
+    """One step of a pipeline and its counters.
+
+    Attributes:
+        done: items the stage function finished (including failures)
+        passed: items handed on to the next stage
+        errors: items whose stage function raised
+        busy_seconds: total time workers spent inside the stage function
+    """
+
+    def __init__(self, name, func, workers=1, queue_size=DEFAULT_QUEUE_SIZE):
+        self.name = name
+        self.func = func
+        self.workers = max(workers, 1)
+        self.inbox = queue.Queue(maxsize=max(queue_size, 1))
+        self.done = 0
+        self.passed = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+        self._running = self.workers
+
+    def _count(self, seconds, passed, failed):
+        with self._lock:
+            self.done += 1
+            self.busy_seconds += seconds
+            self.passed += passed
+            self.errors += failed
+
+    def _worker_finished(self):
+        """Returns True for the stage's last worker to finish."""
+        with self._lock:
+            self._running -= 1
+            return self._running == 0
+
+    def progress(self, elapsed):
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        utilization = self.busy_seconds / (elapsed * self.workers) if elapsed > 0 else 0.0
+        return (f"{self.name} q={self.inbox.qsize()} {self.done} done "
+                f"({rate:.2f}/s, {utilization:.0%} busy)")
+
+
+class StagedPipeline:
+    def __init__(self, source, stages, on_error=None):
+        """
+        Args:
+            source: iterable of items for the first stage (read on its own thread)
+            stages: list of Stage
+            on_error: called as on_error(stage, item, exception) when a
+                stage function raises; the item is dropped
+        """
+        self.source = source
+        self.stages = stages
+        self.on_error = on_error
+        self.listed = 0
+        self.started_at = None
+        self.source_error = None
+
+    def _feed(self):
+        first = self.stages[0]
+        try:
+            for item in self.source:
+                self.listed += 1
+                first.inbox.put(item)  # blocks while the first stage is behind
+        except Exception as e:
+            self.source_error = e
+            print(f"❌ Listing failed: {e}")
+        finally:
+            for _ in range(first.workers):
+                first.inbox.put(_END)
+
+    def _work(self, index):
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        try:
+            while True:
+                item = stage.inbox.get()
+                if item is _END:
+                    break
+                started = time.monotonic()
+                try:
+                    result = stage.func(item)
+                except Exception as e:
+                    stage._count(time.monotonic() - started, 0, 1)
+                    self._report_error(stage, item, e)
+                    continue
+                forward = result is not None and next_stage is not None
+                stage._count(time.monotonic() - started, int(forward), 0)
+                if forward:
+                    next_stage.inbox.put(result)  # blocks while the next stage is behind
+        finally:
+            # Even if this worker dies, the stages after it must still end
+            if stage._worker_finished() and next_stage is not None:
+                for _ in range(next_stage.workers):
+                    next_stage.inbox.put(_END)
+
+    def _report_error(self, stage, item, error):
+        if not self.on_error:
+            return
+        try:
+            self.on_error(stage, item, error)
+        except Exception as e:
+            # A failing handler (e.g. the journal write) mustn't stop the
+            # worker: the stages before it would block on its full queue
+            print(f"❌ {stage.name}: error handler failed: {e}")
+
+    def progress_line(self):
+        elapsed = time.monotonic() - self.started_at if self.started_at else 0.0
+        return f"⏱️  {elapsed / 60:.1f}m | listed {self.listed} | " + " | ".join(
+            stage.progress(elapsed) for stage in self.stages
+        )
+
+    def run(self, progress_every=None):
+        """Process every item from the source; blocks until the last stage is done.
+
+        With progress_every (seconds), a progress line is printed at that interval.
+        """
+        self.started_at = time.monotonic()
+        threads = [threading.Thread(target=self._feed, name="pipeline-source", daemon=True)]
+        for index, stage in enumerate(self.stages):
+            threads += [
+                threading.Thread(target=self._work, args=(index,), name=f"pipeline-{stage.name}", daemon=True)
+                for _ in range(stage.workers)
+            ]
+        for thread in threads:
+            thread.start()
+
+        next_report = time.monotonic() + progress_every if progress_every else None
+        for thread in threads:
+            # Join in short slices so Ctrl-C still reaches the main thread
+            while thread.is_alive():
+                thread.join(timeout=0.5)
+                if next_report and time.monotonic() >= next_report:
+                    print(self.progress_line())
+                    next_report += progress_every
+        return self
@@ -0,0 +1,155 @@
+"""
+Streaming Strava Activity Paginator
+===================================
+
+Iterator over `GET /athlete/activities` that yields activity summaries as
+pages arrive instead of collecting the whole range first.
+
+- Stops as soon as `limit` activities have been yielded, without requesting
+  a page it won't use.
+- While the caller works on one page, the next one is already being fetched
+  on a background thread, so downstream stages overlap with listing.
+- Memory stays bounded to two pages regardless of the date range.
+- With predecode=True each page's summary polylines are decoded as one batch
+  as soon as the page arrives (see polyline_batch.py).
+
+Example:
+    pager = ActivityPager(after=start_ts, before=end_ts)
+    for summary in pager:
+        ...  # starts on page 1 while page 2 is in flight
+    print(pager.count, pager.pages_fetched)
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from http_client import get_session
+from strava_tokens import get_valid_access_token
+from polyline_batch import predecode
+
+STRAVA_ACTIVITIES_URL = "https://www.strava.com/api/v3/athlete/activities"
+MAX_PER_PAGE = 200  # Strava's maximum page size
+NETWORK_RETRY_SECONDS = 10
+NETWORK_RETRIES = 3
+
+
+class ActivityPager:
+    """Iterable of activity summaries, fetched a page ahead of the consumer.
+
+    Attributes (updated as iteration proceeds):
+        count: activities yielded so far
+        pages_fetched: pages requested from Strava so far
+        exhausted: True once the last page has been seen
+        error: message if listing stopped early on an API error
+    """
+
+    def __init__(self, after=None, before=None, per_page=MAX_PER_PAGE, limit=None,
+                 prefetch=True, access_token=None, predecode=False):
+        self.after = after
+        self.before = before
+        self.per_page = min(per_page, MAX_PER_PAGE)
+        self.limit = limit
+        self.prefetch = prefetch
+        self.access_token = access_token
+        self.predecode = predecode
+        self.count = 0
+        self.pages_fetched = 0
+        self.exhausted = False
+        self.error = None
+
+    def fetch_page(self, page):
+        """Fetch one page of summaries.
+
+        Returns:
+            list of activities, or None if Strava returned an error
+        """
+        params = {
+            'per_page': self.per_page,
+            'page': page
+        }
+        if self.before:
+            params['before'] = self.before
+        if self.after:
+            params['after'] = self.after
+
+        for attempt in range(NETWORK_RETRIES + 1):
+            headers = {'Authorization': f'Bearer {self.access_token or get_valid_access_token()}'}
+            try:
+                resp = get_session().get(STRAVA_ACTIVITIES_URL, headers=headers, params=params)
+            except requests.exceptions.RequestException as e:
+                if attempt == NETWORK_RETRIES:
+                    self.error = f"Network error on page {page}: {e}"
+                    return None
+                print(f"⚠️  Network error on page {page}: {e} - retrying in {NETWORK_RETRY_SECONDS}s")
+                time.sleep(NETWORK_RETRY_SECONDS)
+                continue
+
+            self.pages_fetched += 1
+
+            if resp.status_code == 429:
+                # The shared rate limiter has marked the window as used up,
+                # so the retry waits exactly until it resets
+                print("⚠️  Rate limited by Strava. Retrying when the window resets...")
+                continue
+
+            if resp.status_code != 200:
+                self.error = f"Error fetching page {page}: {resp.status_code} {resp.text[:200]}"
+                return None
+
+            activities = resp.json()
+            if self.predecode:
+                # Decode the page's routes in one batch (on the prefetch
+                # thread), so get_geojson_linestring finds them ready
+                predecode([a.get('map', {}).get('summary_polyline') for a in activities])
+            return activities
+
+        self.error = f"Gave up on page {page}"
+        return None
+
+    def _wanted(self):
+        """How many more activities the caller wants (None = unlimited)."""
+        if self.limit is None:
+            return None
+        return self.limit - self.count
+
+    def __iter__(self):
+        executor = ThreadPoolExecutor(max_workers=1) if self.prefetch else None
+        try:
+            page = 1
+            pending = executor.submit(self.fetch_page, page) if executor else None
+            while True:
+                activities = pending.result() if executor else self.fetch_page(page)
+                if activities is None:
+                    print(f"❌ {self.error}")
+                    return
+
+                # A full page means there may be more; start on it now unless
+                # this page already covers everything the caller asked for
+                wanted = self._wanted()
+                more = len(activities) == self.per_page
+                if more and (wanted is None or len(activities) < wanted):
+                    page += 1
+                    if executor:
+                        pending = executor.submit(self.fetch_page, page)
+                else:
+                    more = False
+
+                for activity in activities:
+                    if self.limit is not None and self.count >= self.limit:
+                        return
+                    self.count += 1
+                    yield activity
+
+                if not more:
+                    self.exhausted = True
+                    return
+        finally:
+            if executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+
+def iter_athlete_activities(after=None, before=None, per_page=MAX_PER_PAGE, limit=None):
+    """Yield activity summaries page by page (see ActivityPager)."""
+    return iter(ActivityPager(after=after, before=before, per_page=per_page, limit=limit))
@@ -0,0 +1,192 @@
+"""
+Strava OAuth Token Storage
+==========================
+
+Reads, caches and refreshes the tokens in `.strava-tokens.json`.
+
+- The parsed token file is cached in memory and only re-read when the file
+  changes (inode, size or mtime), so hot loops don't hit the disk per call.
+- Refreshes happen under an exclusive lock on `.strava-tokens.json.lock`.
+  After taking the lock the file is re-read, so when several gunicorn
+  workers notice expiry at once only the first one calls Strava; the others
+  pick up the token it wrote.
+- The token file is written atomically (temp file + fsync + rename), so a
+  crash mid-write can never leave a truncated file behind.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import requests
+
+from http_client import get_session
+
+try:
+    import fcntl
+except ImportError:  # Not available on Windows; fall back to in-process locking only
+    fcntl = None
+
+TOKEN_FILE = '.strava-tokens.json'
+TOKEN_LOCK_FILE = TOKEN_FILE + '.lock'
+STRAVA_TOKEN_URL = "https://www.strava.com/oauth/token"
+
+# Refresh when the token has less than this many seconds left
+REFRESH_MARGIN_SECONDS = 300
+
+_cache = {"key": None, "tokens": None}
+_cache_lock = threading.Lock()
+_refresh_lock = threading.Lock()
+
+
+def _file_key(st):
+    return (st.st_ino, st.st_size, st.st_mtime_ns)
+
+
+def read_strava_tokens():
+    if not os.path.isfile(TOKEN_FILE):
+        raise Exception("Token file .strava-tokens.json not found!")
+
+    key = _file_key(os.stat(TOKEN_FILE))
+    with _cache_lock:
+        if _cache["key"] == key:
+            return dict(_cache["tokens"])
+
+    with open(TOKEN_FILE) as f:
+        content = f.read().strip()
+        if not content:
+            raise Exception(".strava-tokens.json is empty!")
+        tokens = json.loads(content)
+
+    with _cache_lock:
+        _cache["key"] = key
+        _cache["tokens"] = tokens
+    return dict(tokens)
+
+
+def write_strava_tokens(tokens):
+    """Atomically replace the token file and update the in-memory cache."""
+    directory = os.path.dirname(os.path.abspath(TOKEN_FILE))
+    fd, tmp_path = tempfile.mkstemp(prefix='.strava-tokens.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(tokens, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, TOKEN_FILE)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+    with _cache_lock:
+        _cache["key"] = _file_key(os.stat(TOKEN_FILE))
+        _cache["tokens"] = dict(tokens)
+
+
+@contextmanager
+def token_refresh_lock():
+    """Exclusive lock across threads in this process and across processes."""
+    with _refresh_lock:
+        if fcntl is None:
+            yield
+            return
+        with open(TOKEN_LOCK_FILE, 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _token_is_fresh(tokens):
+    return time.time() < tokens.get('expires_at', 0) - REFRESH_MARGIN_SECONDS
+
+
+def get_valid_access_token(max_retries=3):
+    """Get a valid access token, refreshing if necessary.
+
+    Args:
+        max_retries: Maximum number of refresh attempts before giving up
+
+    Returns:
+        str: A valid access token
+
+    Raises:
+        Exception: If token refresh fails after max_retries
+    """
+    # Fast path: cached token that is still valid for at least 5 minutes
+    tokens = read_strava_tokens()
+    if _token_is_fresh(tokens):
+        return tokens['access_token']
+
+    with token_refresh_lock():
+        for attempt in range(max_retries):
+            try:
+                # Re-read under the lock: another worker may have just refreshed
+                tokens = read_strava_tokens()
+                if _token_is_fresh(tokens):
+                    return tokens['access_token']
+
+                print(f"Access token expired or expiring soon. Refreshing (attempt {attempt + 1}/{max_retries})...")
+
+                # Prepare refresh request
+                refresh_data = {
+                    'client_id': os.environ.get("STRAVA_CLIENT_ID"),
+                    'client_secret': os.environ.get("STRAVA_CLIENT_SECRET"),
+                    'grant_type': 'refresh_token',
+                    'refresh_token': tokens.get('refresh_token')
+                }
+
+                # Make the refresh request with timeout
+                resp = get_session().post(
+                    STRAVA_TOKEN_URL,
+                    data=refresh_data,
+                    timeout=10
+                )
+
+                # Check for successful response
+                if resp.status_code == 200:
+                    new_tokens = resp.json()
+                    tokens.update({
+                        'access_token': new_tokens['access_token'],
+                        'refresh_token': new_tokens.get('refresh_token', tokens['refresh_token']),  # Keep old refresh token if not provided
+                        'expires_at': new_tokens['expires_at'],
+                        'expires_in': new_tokens['expires_in']
+                    })
+                    write_strava_tokens(tokens)
+                    print("Successfully refreshed access token")
+                    return tokens['access_token']
+
+                # Handle specific error cases
+                elif resp.status_code in [400, 401]:
+                    error_msg = resp.json().get('message', 'Unknown error')
+                    if 'Invalid refresh token' in error_msg or 'Authorization Error' in error_msg:
+                        print("Refresh token is invalid. Manual re-authentication required.")
+                        break
+                    print(f"Token refresh failed (attempt {attempt + 1}): {error_msg}")
+                else:
+                    print(f"Unexpected status code {resp.status_code} during token refresh")
+
+            except requests.exceptions.RequestException as e:
+                print(f"Network error during token refresh (attempt {attempt + 1}): {str(e)}")
+            except json.JSONDecodeError:
+                print(f"Invalid JSON response during token refresh (attempt {attempt + 1})")
+            except KeyError as e:
+                print(f"Missing expected key in token response (attempt {attempt + 1}): {str(e)}")
+                break  # No point retrying if response is malformed
+
+            # Exponential backoff before retry (1s, 2s, 4s, etc.)
+            if attempt < max_retries - 1:
+                backoff = 2 ** attempt
+                print(f"Retrying in {backoff} seconds...")
+                time.sleep(backoff)
+
+    # If we get here, all retries failed
+    error_msg = "Failed to refresh access token after maximum retries. Manual intervention required."
+    print(error_msg)
+    raise Exception(error_msg)
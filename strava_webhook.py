@@ -1,9 +1,12 @@
 from flask import Flask, request, jsonify
-import requests
-import polyline
 import os
 import json
-import time
+from http_client import get_session
+from polyline_batch import decode_lonlat
+from activity_cache import get_activity_cache
+from strava_tokens import write_strava_tokens, get_valid_access_token
+from fulcrum_index import record_created
+from form_router import FormRouter, load_routes
 
 app = Flask(__name__)
 
@@ -20,7 +23,7 @@ def exchange_token():
     if not token_exchange_redirect_uri:
         return "CALLBACK_URL not set in environment", 500 # Or handle error appropriately
 
-    resp = requests.post(
+    resp = get_session().post(
         "https://www.strava.com/oauth/token",
         data={
             'client_id': client_id,
@@ -34,114 +37,28 @@ def exchange_token():
         return f"Token exchange failed: {resp.text}", 400
     token_data = resp.json()
     # Save to .strava-tokens.json
-    with open('.strava-tokens.json', 'w') as f:
-        json.dump(token_data, f)
+    write_strava_tokens(token_data)
     return jsonify({"success": True, "token_data": token_data})
 
-# --- Utility functions to read secrets/config ---
-
-def read_strava_tokens():
-    if not os.path.isfile('.strava-tokens.json'):
-        raise Exception("Token file .strava-tokens.json not found!")
-    with open('.strava-tokens.json') as f:
-        content = f.read().strip()
-        if not content:
-            raise Exception(".strava-tokens.json is empty!")
-        return json.loads(content)
-
-def write_strava_tokens(tokens):
-    with open('.strava-tokens.json', 'w') as f:
-        json.dump(tokens, f)
-
-def get_valid_access_token(max_retries=3):
-    """Get a valid access token, refreshing if necessary.
-    
-    Args:
-        max_retries: Maximum number of refresh attempts before giving up
-        
-    Returns:
-        str: A valid access token
-        
-    Raises:
-        Exception: If token refresh fails after max_retries
-    """
-    for attempt in range(max_retries):
-        try:
-            tokens = read_strava_tokens()
-            current_time = time.time()
-            
-            # If token is still valid for at least 5 minutes, return it
-            if current_time < tokens.get('expires_at', 0) - 300:  # 5 minute buffer
-                return tokens['access_token']
-                
-            print(f"Access token expired or expiring soon. Refreshing (attempt {attempt + 1}/{max_retries})...")
-            
-            # Prepare refresh request
-            refresh_data = {
-                'client_id': os.environ.get("STRAVA_CLIENT_ID"),
-                'client_secret': os.environ.get("STRAVA_CLIENT_SECRET"),
-                'grant_type': 'refresh_token',
-                'refresh_token': tokens.get('refresh_token')
-            }
-            
-            # Make the refresh request with timeout
-            resp = requests.post(
-                "https://www.strava.com/oauth/token",
-                data=refresh_data,
-                timeout=10  # 10 second timeout
-            )
-            
-            # Check for successful response
-            if resp.status_code == 200:
-                new_tokens = resp.json()
-                # Update tokens with new values
-                tokens.update({
-                    'access_token': new_tokens['access_token'],
-                    'refresh_token': new_tokens.get('refresh_token', tokens['refresh_token']),  # Keep old refresh token if not provided
-                    'expires_at': new_tokens['expires_at'],
-                    'expires_in': new_tokens['expires_in']
-                })
-                write_strava_tokens(tokens)
-                print("Successfully refreshed access token")
-                return tokens['access_token']
-                
-            # Handle specific error cases
-            elif resp.status_code in [400, 401]:
-                error_msg = resp.json().get('message', 'Unknown error')
-                if 'Invalid refresh token' in error_msg or 'Authorization Error' in error_msg:
-                    print("Refresh token is invalid. Manual re-authentication required.")
-                    break
-                print(f"Token refresh failed (attempt {attempt + 1}): {error_msg}")
-            else:
-                print(f"Unexpected status code {resp.status_code} during token refresh")
-                
-        except requests.exceptions.RequestException as e:
-            print(f"Network error during token refresh (attempt {attempt + 1}): {str(e)}")
-        except json.JSONDecodeError:
-            print(f"Invalid JSON response during token refresh (attempt {attempt + 1})")
-        except KeyError as e:
-            print(f"Missing expected key in token response (attempt {attempt + 1}): {str(e)}")
-            break  # No point retrying if response is malformed
-            
-        # Exponential backoff before retry (1s, 2s, 4s, etc.)
-        if attempt < max_retries - 1:
-            backoff = 2 ** attempt
-            print(f"Retrying in {backoff} seconds...")
-            time.sleep(backoff)
-    
-    # If we get here, all retries failed
-    error_msg = "Failed to refresh access token after maximum retries. Manual intervention required."
-    print(error_msg)
-    raise Exception(error_msg)
+# --- Configuration ---
+# (Strava token storage and refresh live in strava_tokens.py)
 
 FULCRUM_FORM_ID = os.environ.get("FULCRUM_FORM_ID")
 
-def fetch_activity(activity_id, access_token):
+def fetch_activity(activity_id, access_token, use_cache=True):
+    cache = get_activity_cache()
+    if use_cache:
+        cached = cache.get(activity_id)
+        if cached is not None:
+            return cached
+
     url = f"https://www.strava.com/api/v3/activities/{activity_id}"
     headers = {"Authorization": f"Bearer {access_token}"}
-    resp = requests.get(url, headers=headers)
+    resp = get_session().get(url, headers=headers)
     if resp.status_code == 200:
-        return resp.json()
+        activity = resp.json()
+        cache.put(activity_id, activity)
+        return activity
     else:
         print(f"Error fetching activity: {resp.status_code}")
         print(resp.text)
@@ -154,165 +71,15 @@ def get_geojson_linestring(activity):
     if not poly:
         print("No polyline found in activity.")
         return None
-    points = polyline.decode(poly)
-    coordinates = [[lon, lat] for lat, lon in points]
+    coordinates = decode_lonlat(poly)
     return {
         "type": "LineString",
         "coordinates": coordinates
     }
 
-def meters_to_miles(meters):
-    if meters is None:
-        return None
-    miles = meters / 1609.344
-    return round(miles, 2)
-
-def meters_to_feet(meters):
-    if meters is None:
-        return None
-    return round(meters * 3.28084, 1)
-
-def celsius_to_fahrenheit(c):
-    if c is None:
-        return None
-    return round((c * 9/5) + 32, 1)
-
-def seconds_per_mile(activity):
-    # Use moving_time for average pace, print debug info
-    distance_miles = meters_to_miles(activity.get("distance", 0))
-    moving_time = activity.get("moving_time", 0)
-    elapsed_time = activity.get("elapsed_time", 0)
-    print(f"[PACE DEBUG] Distance (miles): {distance_miles}, Moving time (sec): {moving_time}, Elapsed time (sec): {elapsed_time}")
-    if distance_miles and distance_miles > 0:
-        pace_sec = moving_time / distance_miles
-        minutes = int(pace_sec // 60)
-        seconds = int(pace_sec % 60)
-        print(f"[PACE DEBUG] Calculated pace: {minutes}:{seconds:02d} min/mi (using moving_time)")
-        return f"{minutes}:{seconds:02d} min/mi"
-    return None
-
-def seconds_per_km(activity):
-    distance_km = activity.get("distance", 0) / 1000.0
-    moving_time = activity.get("moving_time", 0)
-    if distance_km > 0:
-        pace_sec = moving_time / distance_km
-        minutes = int(pace_sec // 60)
-        seconds = int(pace_sec % 60)
-        return f"{minutes}:{seconds:02d} min/km"
-    return None
-
-# TODO 
-# - average pace and average HR do not match Garmin
-def round_or_none(value):
-    if value is None:
-        return None
-    return round(value)
-
-def seconds_to_hms(seconds):
-    if seconds is None:
-        return None
-    seconds = int(seconds)
-    hours = seconds // 3600
-    minutes = (seconds % 3600) // 60
-    secs = seconds % 60
-    return f"{hours}:{minutes:02d}:{secs:02d}"
-
-def build_fulcrum_payload(activity, geojson):
-    # Update these keys to match your Fulcrum Data Names exactly (Imperial units and correct conversions)
-    form_values = {
-        "7980": activity.get("name"),
-        "2d48": activity.get("start_date_local", "")[:10],
-        "3200": activity.get("type"),
-        "9000": meters_to_miles(activity.get("distance")),
-        "b890": round_or_none(activity.get("calories")),
-        "1acf": seconds_per_mile(activity),  # min/mile
-        "2050": round_or_none(activity.get("average_heartrate")),
-        "4c8d": round_or_none(activity.get("max_heartrate")),
-        "cca0": activity.get("start_date_local", "")[11:19],
-        "0880": seconds_to_hms(activity.get("elapsed_time")),
-        "2180": seconds_to_hms(activity.get("moving_time")),
-        "e2d0": activity.get("description"),
-        "4840": round_or_none(meters_to_feet(activity.get("total_elevation_gain"))),
-        "d000": round_or_none(meters_to_feet(activity.get("elev_low"))),
-        "6767": round_or_none(meters_to_feet(activity.get("elev_high"))),
-        "3350": celsius_to_fahrenheit(activity.get("average_temp")),
-        "25a0": str(activity.get("id"))  # Strava Activity ID for duplicate detection
-    }
-    # Convert all non-None values to strings (Fulcrum expects string values)
-    form_values = {k: str(v) for k, v in form_values.items() if v is not None}
-    return {
-        "record": {
-            "geometry": geojson,
-            "form_values": form_values
-        }
-    }
-
 def read_fulcrum_token():
     return os.environ.get("FULCRUM_API_TOKEN")
 
-def activity_exists_in_fulcrum(activity_id):
-    """Check if an activity already exists in Fulcrum.
-
-    Args:
-        activity_id: Strava activity ID to check
-
-    Returns:
-        bool: True if activity exists, False otherwise
-    """
-    try:
-        api_token = os.environ.get("FULCRUM_API_TOKEN")
-        form_id = os.environ.get("FULCRUM_FORM_ID")
-
-        if not api_token or not form_id:
-            print("Warning: Missing Fulcrum credentials, skipping duplicate check")
-            return False
-
-        # Query Fulcrum API to check if record with this activity_id exists
-        headers = {
-            "Accept": "application/json",
-            "X-ApiToken": api_token
-        }
-
-        # Use the form_id filter to only search this specific form
-        # We'll check all records by paginating through them
-        page = 1
-        per_page = 100  # Max per page
-
-        while True:
-            params = {
-                "form_id": form_id,
-                "page": page,
-                "per_page": per_page
-            }
-
-            url = "https://api.fulcrumapp.com/api/v2/records.json"
-            response = requests.get(url, headers=headers, params=params)
-
-            if response.status_code != 200:
-                print(f"Warning: Error checking Fulcrum page {page}: {response.status_code}")
-                return False
-
-            data = response.json()
-            records = data.get("records", [])
-
-            # Check this page for the activity_id
-            for record in records:
-                form_values = record.get("form_values", {})
-                if form_values.get("25a0") == str(activity_id):
-                    return True
-
-            # If we got fewer records than per_page, we've reached the end
-            if len(records) < per_page:
-                break
-
-            page += 1
-
-        return False
-
-    except Exception as e:
-        print(f"Warning: Error checking for duplicates in Fulcrum: {str(e)}")
-        return False
-
 def create_fulcrum_record(payload, form_id):
     api_token = read_fulcrum_token()
     url = "https://api.fulcrumapp.com/api/v2/records.json"
@@ -328,8 +95,9 @@ def create_fulcrum_record(payload, form_id):
     print(json.dumps(payload, indent=2))
     print("Form Values Keys:", list(payload['record']['form_values'].keys()))
 
-    resp = requests.post(url, headers=headers, json=payload)
+    resp = get_session().post(url, headers=headers, json=payload)
     print("Fulcrum response:", resp.status_code)
+    record_created(form_id, payload, resp)
     try:
         resp_json = resp.json()
         print(json.dumps(resp_json, indent=2))
@@ -343,6 +111,24 @@ def create_fulcrum_record(payload, form_id):
         print("Error creating Fulcrum record!")
     return resp
 
+_router = None
+
+def get_router():
+    """Return the form router built from forms.json (or FULCRUM_FORM_ID).
+
+    Without forms.json this app only writes the original form; ENABLE_DUAL_FORM
+    is for strava_webhook_dual_form.py.
+    """
+    global _router
+    if _router is None:
+        _router = FormRouter(
+            load_routes(dual=False),
+            fetch=lambda activity_id: fetch_activity(activity_id, get_valid_access_token()),
+            geometry=get_geojson_linestring,
+            create=lambda payload, form_id, form_name: create_fulcrum_record(payload, form_id),
+        )
+    return _router
+
 @app.route('/strava-webhook', methods=['GET', 'POST'])
 def strava_webhook():
     if request.method == 'GET':
@@ -356,21 +142,14 @@ def strava_webhook():
         print(event)
         if event['object_type'] == 'activity' and event['aspect_type'] == 'create':
             activity_id = event['object_id']
-            print(f"Fetching details for activity ID: {activity_id}")
-
-            # Check if this activity already exists in Fulcrum to prevent duplicates
-            if activity_exists_in_fulcrum(activity_id):
-                print(f"Activity {activity_id} already exists in Fulcrum - skipping duplicate webhook")
+            # Same routing table as the dual-form app; a duplicate form is skipped
+            try:
+                outcomes = get_router().dispatch(activity_id)
+            except RuntimeError as e:
+                print(e)
                 return '', 200
-
-            access_token = get_valid_access_token()
-            activity = fetch_activity(activity_id, access_token)
-            if activity:
-                geojson = get_geojson_linestring(activity)
-                payload = build_fulcrum_payload(activity, geojson)
-                print("Payload for Fulcrum:")
-                print(json.dumps(payload, indent=2))
-                create_fulcrum_record(payload, FULCRUM_FORM_ID)
+            for form_name, outcome in outcomes.items():
+                print(f"{form_name}: {outcome}")
         return '', 200
 
 if __name__ == '__main__':
@@ -14,19 +14,38 @@ To use:
 
 To switch back to single form:
 - Set ENABLE_DUAL_FORM=false or remove from .env
+
+Webhook events are written to a durable queue (job_queue.py) and acknowledged
+immediately; a background worker (webhook_worker.py) does the Strava/Fulcrum work.
+Target forms come from the routing table in form_router.py (forms.json, or the
+settings above when there is no config file). They are checked and written
+concurrently, and each form's outcome is reported separately.
 """
 
-from flask import Flask, request, jsonify
-import requests
-import polyline
+from flask import Flask, Response, abort, request, jsonify
+import hmac
 import os
 import json
-import time
 from dotenv import load_dotenv
 
-# Load environment variables from .env file
+# Load environment variables from .env file (before the project modules read their settings)
 load_dotenv()
 
+from http_client import get_session
+from polyline_batch import decode_lonlat
+from activity_streams import streams_enabled, get_stream_store, streams_linestring
+from gpx_export import iter_gpx, activity_streams_for_export, gpx_filename
+from activity_cache import get_activity_cache
+from activity_fields import FieldSpec
+from field_mapping import compile_mapping, load_form_schema
+from strava_tokens import write_strava_tokens, get_valid_access_token
+from job_queue import JobQueue
+from fulcrum_index import record_created
+from webhook_worker import start_background_worker
+from form_router import (
+    FormRouter, load_routes, register_builder, failed_routes, V1_FORM_SCHEMA, V2_FORM_SCHEMA
+)
+
 app = Flask(__name__)
 
 # --- OAuth Exchange Endpoint ---
@@ -42,7 +61,7 @@ def exchange_token():
     if not token_exchange_redirect_uri:
         return "CALLBACK_URL not set in environment", 500
 
-    resp = requests.post(
+    resp = get_session().post(
         "https://www.strava.com/oauth/token",
         data={
             'client_id': client_id,
@@ -56,106 +75,46 @@ def exchange_token():
         return f"Token exchange failed: {resp.text}", 400
     token_data = resp.json()
     # Save to .strava-tokens.json
-    with open('.strava-tokens.json', 'w') as f:
-        json.dump(token_data, f)
+    write_strava_tokens(token_data)
     return jsonify({"success": True, "token_data": token_data})
 
-# --- Utility functions to read secrets/config ---
-
-def read_strava_tokens():
-    if not os.path.isfile('.strava-tokens.json'):
-        raise Exception("Token file .strava-tokens.json not found!")
-    with open('.strava-tokens.json') as f:
-        content = f.read().strip()
-        if not content:
-            raise Exception(".strava-tokens.json is empty!")
-        return json.loads(content)
-
-def write_strava_tokens(tokens):
-    with open('.strava-tokens.json', 'w') as f:
-        json.dump(tokens, f)
-
-def get_valid_access_token(max_retries=3):
-    """Get a valid access token, refreshing if necessary."""
-    for attempt in range(max_retries):
-        try:
-            tokens = read_strava_tokens()
-            current_time = time.time()
-
-            # If token is still valid for at least 5 minutes, return it
-            if current_time < tokens.get('expires_at', 0) - 300:
-                return tokens['access_token']
-
-            print(f"Access token expired or expiring soon. Refreshing (attempt {attempt + 1}/{max_retries})...")
-
-            # Prepare refresh request
-            refresh_data = {
-                'client_id': os.environ.get("STRAVA_CLIENT_ID"),
-                'client_secret': os.environ.get("STRAVA_CLIENT_SECRET"),
-                'grant_type': 'refresh_token',
-                'refresh_token': tokens.get('refresh_token')
-            }
-
-            # Make the refresh request with timeout
-            resp = requests.post(
-                "https://www.strava.com/oauth/token",
-                data=refresh_data,
-                timeout=10
-            )
-
-            # Check for successful response
-            if resp.status_code == 200:
-                new_tokens = resp.json()
-                tokens.update({
-                    'access_token': new_tokens['access_token'],
-                    'refresh_token': new_tokens.get('refresh_token', tokens['refresh_token']),
-                    'expires_at': new_tokens['expires_at'],
-                    'expires_in': new_tokens['expires_in']
-                })
-                write_strava_tokens(tokens)
-                print("Successfully refreshed access token")
-                return tokens['access_token']
-
-            # Handle specific error cases
-            elif resp.status_code in [400, 401]:
-                error_msg = resp.json().get('message', 'Unknown error')
-                if 'Invalid refresh token' in error_msg or 'Authorization Error' in error_msg:
-                    print("Refresh token is invalid. Manual re-authentication required.")
-                    break
-                print(f"Token refresh failed (attempt {attempt + 1}): {error_msg}")
-            else:
-                print(f"Unexpected status code {resp.status_code} during token refresh")
-
-        except requests.exceptions.RequestException as e:
-            print(f"Network error during token refresh (attempt {attempt + 1}): {str(e)}")
-        except json.JSONDecodeError:
-            print(f"Invalid JSON response during token refresh (attempt {attempt + 1})")
-        except KeyError as e:
-            print(f"Missing expected key in token response (attempt {attempt + 1}): {str(e)}")
-            break
-
-        # Exponential backoff before retry
-        if attempt < max_retries - 1:
-            backoff = 2 ** attempt
-            print(f"Retrying in {backoff} seconds...")
-            time.sleep(backoff)
-
-    # If we get here, all retries failed
-    error_msg = "Failed to refresh access token after maximum retries. Manual intervention required."
-    print(error_msg)
-    raise Exception(error_msg)
+# --- Configuration ---
+# (Strava token storage and refresh live in strava_tokens.py)
 
 # Configuration for dual form support
 FULCRUM_FORM_ID = os.environ.get("FULCRUM_FORM_ID")  # Original form
 FULCRUM_FORM_ID_V2 = os.environ.get("FULCRUM_FORM_ID_V2")  # New enhanced form
 ENABLE_DUAL_FORM = os.environ.get("ENABLE_DUAL_FORM", "false").lower() == "true"
 
-def fetch_activity(activity_id, access_token):
+# Run the queue worker as a background thread inside the web process.
+# Set to false when running webhook_worker.py as its own service.
+WEBHOOK_INLINE_WORKER = os.environ.get("WEBHOOK_INLINE_WORKER", "true").lower() == "true"
+
+# Token required to download GPX tracks (the endpoint is off when unset)
+GPX_EXPORT_TOKEN = os.environ.get("GPX_EXPORT_TOKEN")
+
+_job_queue = None
+
+def get_job_queue():
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue()
+    return _job_queue
+
+def fetch_activity(activity_id, access_token, use_cache=True):
+    cache = get_activity_cache()
+    if use_cache:
+        cached = cache.get(activity_id)
+        if cached is not None:
+            return cached
+
     url = f"https://www.strava.com/api/v3/activities/{activity_id}"
     headers = {"Authorization": f"Bearer {access_token}"}
-    resp = requests.get(url, headers=headers)
+    resp = get_session().get(url, headers=headers)
     if resp.status_code == 200:
-        return resp.json()
+        activity = resp.json()
+        cache.put(activity_id, activity)
+        return activity
     else:
         print(f"Error fetching activity: {resp.status_code}")
         print(resp.text)
@@ -166,13 +125,26 @@ def get_geojson_linestring(activity):
     if not poly:
         print("No polyline found in activity.")
         return None
-    points = polyline.decode(poly)
-    coordinates = [[lon, lat] for lat, lon in points]
+    coordinates = decode_lonlat(poly)
     return {
         "type": "LineString",
         "coordinates": coordinates
     }
 
+def get_activity_geometry(activity):
+    """Route geometry for a record.
+
+    With the streams stage on (STRAVA_STREAMS_ENABLED or --streams), the
+    full-resolution GPS track from the streams store is used - fetched and
+    stored once if it isn't there yet. Otherwise, or without GPS streams,
+    falls back to the summary polyline.
+    """
+    if streams_enabled():
+        geojson = streams_linestring(get_stream_store().get(activity['id']))
+        if geojson:
+            return geojson
+    return get_geojson_linestring(activity)
+
 def meters_to_miles(meters):
     if meters is None:
         return None
@@ -288,33 +260,116 @@ def determine_gear_from_status(status):
 
     return gear_mapping.get(status)
 
+# Strava fields read by each payload builder (see activity_fields.py)
+PAYLOAD_V1_FIELDS = FieldSpec(
+    required=("id", "name", "start_date_local", "type"),
+    optional=(
+        "distance", "moving_time", "elapsed_time", "calories", "description",
+        "average_heartrate", "max_heartrate", "total_elevation_gain",
+        "elev_low", "elev_high", "average_temp", "map.summary_polyline",
+    ),
+)
+
+PAYLOAD_V2_FIELDS = FieldSpec(
+    required=("id", "name", "start_date_local", "type"),
+    optional=(
+        "distance", "moving_time", "elapsed_time", "max_speed", "calories",
+        "description", "device_name", "suffer_score",
+        "average_heartrate", "max_heartrate", "average_cadence",
+        "average_watts", "max_watts", "weighted_average_watts",
+        "total_elevation_gain", "elev_low", "elev_high", "average_temp",
+        "map.summary_polyline",
+    ),
+)
+
+def local_date(start_date_local):
+    return (start_date_local or "")[:10]
+
+def local_time(start_date_local):
+    return (start_date_local or "")[11:19]
+
+# Form definitions the mappings are checked against at import time. The
+# exported v1 schema predates the Strava Activity ID field, so 25a0 is listed
+# separately; the v2 mapping is checked when its export is present.
+def _form_schema(path):
+    return load_form_schema(path) if os.path.exists(path) else None
+
+# (Fulcrum key, Strava field, converters)
+PAYLOAD_V1_MAPPING = compile_mapping([
+    ("7980", "name"),
+    ("2d48", "start_date_local", local_date),
+    ("3200", "type"),
+    ("9000", "distance", meters_to_miles),
+    ("b890", "calories", round_or_none),
+    ("1acf", None, seconds_per_mile),
+    ("2050", "average_heartrate", round_or_none),
+    ("4c8d", "max_heartrate", round_or_none),
+    ("cca0", "start_date_local", local_time),
+    ("0880", "elapsed_time", seconds_to_hms),
+    ("2180", "moving_time", seconds_to_hms),
+    ("e2d0", "description"),
+    ("4840", "total_elevation_gain", (meters_to_feet, round_or_none)),
+    ("d000", "elev_low", (meters_to_feet, round_or_none)),
+    ("6767", "elev_high", (meters_to_feet, round_or_none)),
+    ("3350", "average_temp", celsius_to_fahrenheit),
+    ("25a0", "id", str),  # Strava Activity ID
+], schema=_form_schema(V1_FORM_SCHEMA), extra_keys=("25a0",))
+
+PAYLOAD_V2_MAPPING = compile_mapping([
+    # Basic info
+    ("7980", "name"),                                  # Title
+    ("2d48", "start_date_local", local_date),          # Date
+    ("3200", "type"),                                  # Activity Type
+    ("e2d0", "description"),                           # Notes
+    ("cca0", "start_date_local", local_time),          # Start Time
+    ("25a0", "id", str),                               # Strava Activity ID
+
+    # Distance & Pace (NumberFields in v2)
+    ("9000", "distance", meters_to_miles),             # Distance (miles)
+    ("a002", None, pace_seconds_per_mile),             # Pace (seconds/mile) - raw for calculations (HIDDEN)
+    ("a026", "max_speed"),                             # Max Speed (m/s) - for fastest pace calc (HIDDEN)
+    # Note: 1acf (avg_moving_pace) and a025 (fastest_pace) are CalculatedFields in v2, auto-calculated
+
+    # Time fields (NumberFields + CalculatedFields in v2)
+    ("a006", "moving_time"),                           # Moving Time (seconds) - raw (HIDDEN)
+    ("a007", "elapsed_time"),                          # Elapsed Time (seconds) - raw (HIDDEN)
+    # Note: 2180 and 0880 are CalculatedFields in v2, auto-calculated
+
+    # Heart Rate (NumberFields in v2)
+    ("2050", "average_heartrate", round_or_none),      # Average HR
+    ("4c8d", "max_heartrate", round_or_none),          # Max HR
+    # Note: a010 (hr_zone) is a CalculatedField in v2, auto-calculated
+
+    # Power & Cadence (NEW in v2)
+    ("a012", "average_cadence", round_or_none),        # Average Cadence
+    ("a013", "average_watts", round_or_none),          # Average Watts
+    ("a014", "max_watts", round_or_none),              # Max Watts
+    ("a015", "weighted_average_watts", round_or_none), # Weighted Avg Watts
+
+    # Calories & Effort (NumberFields in v2)
+    ("b890", "calories", round_or_none),               # Calories
+    ("a018", "suffer_score", round_or_none),           # Suffer Score / Relative Effort
+    # Note: a017 (calories_per_mile), a019 (effort_score) are CalculatedFields in v2
+
+    # Elevation (NumberFields in v2)
+    ("4840", "total_elevation_gain", meters_to_feet),  # Total Elevation Gain (ft)
+    ("d000", "elev_low", meters_to_feet),              # Min Elevation (ft)
+    ("6767", "elev_high", meters_to_feet),             # Max Elevation (ft)
+    # Note: a020 (elevation_gain_per_mile) is a CalculatedField in v2
+
+    # Notes & Details
+    ("3350", "average_temp", celsius_to_fahrenheit),   # Avg Temp (°F)
+    ("a022", "device_name"),                           # Device Name (NEW)
+    # a023 (Shoes/Gear) is chosen from the status in build_fulcrum_payload_v2
+    # Pattern Type (be00) and Garmin Link (2b00) can be added manually in Fulcrum
+], schema=_form_schema(V2_FORM_SCHEMA))
+
 def build_fulcrum_payload_v1(activity, geojson):
     """Build payload for ORIGINAL form (backward compatible)"""
-    form_values = {
-        "7980": activity.get("name"),
-        "2d48": activity.get("start_date_local", "")[:10],
-        "3200": activity.get("type"),
-        "9000": meters_to_miles(activity.get("distance")),
-        "b890": round_or_none(activity.get("calories")),
-        "1acf": seconds_per_mile(activity),
-        "2050": round_or_none(activity.get("average_heartrate")),
-        "4c8d": round_or_none(activity.get("max_heartrate")),
-        "cca0": activity.get("start_date_local", "")[11:19],
-        "0880": seconds_to_hms(activity.get("elapsed_time")),
-        "2180": seconds_to_hms(activity.get("moving_time")),
-        "e2d0": activity.get("description"),
-        "4840": round_or_none(meters_to_feet(activity.get("total_elevation_gain"))),
-        "d000": round_or_none(meters_to_feet(activity.get("elev_low"))),
-        "6767": round_or_none(meters_to_feet(activity.get("elev_high"))),
-        "3350": celsius_to_fahrenheit(activity.get("average_temp")),
-        "25a0": str(activity.get("id"))  # Strava Activity ID
-    }
-    # Convert all non-None values to strings
-    form_values = {k: str(v) for k, v in form_values.items() if v is not None}
     return {
         "record": {
             "geometry": geojson,
-            "form_values": form_values
+            "form_values": PAYLOAD_V1_MAPPING.form_values(activity)
         }
     }
 
@@ -334,57 +389,9 @@ def build_fulcrum_payload_v2(activity, geojson):
     strava_gear = activity.get("gear_id")
     selected_gear = default_gear  # Use our smart default
 
-    form_values = {
-        # Basic info
-        "7980": activity.get("name"),                          # Title
-        "2d48": activity.get("start_date_local", "")[:10],     # Date
-        "3200": activity.get("type"),                          # Activity Type
-        "e2d0": activity.get("description"),                   # Notes
-        "cca0": activity.get("start_date_local", "")[11:19],   # Start Time
-        "25a0": str(activity.get("id")),                       # Strava Activity ID
-
-        # Distance & Pace (NumberFields in v2)
-        "9000": meters_to_miles(activity.get("distance")),    # Distance (miles)
-        "a002": pace_seconds_per_mile(activity),               # Pace (seconds/mile) - raw for calculations (HIDDEN)
-        "a026": activity.get("max_speed"),                     # Max Speed (m/s) - for fastest pace calc (HIDDEN)
-        # Note: 1acf (avg_moving_pace) and a025 (fastest_pace) are CalculatedFields in v2, auto-calculated
-
-        # Time fields (NumberFields + CalculatedFields in v2)
-        "a006": activity.get("moving_time"),                   # Moving Time (seconds) - raw (HIDDEN)
-        "a007": activity.get("elapsed_time"),                  # Elapsed Time (seconds) - raw (HIDDEN)
-        # Note: 2180 and 0880 are CalculatedFields in v2, auto-calculated
-
-        # Heart Rate (NumberFields in v2)
-        "2050": round_or_none(activity.get("average_heartrate")),  # Average HR
-        "4c8d": round_or_none(activity.get("max_heartrate")),      # Max HR
-        # Note: a010 (hr_zone) is a CalculatedField in v2, auto-calculated
-
-        # Power & Cadence (NEW in v2)
-        "a012": round_or_none(activity.get("average_cadence")),           # Average Cadence
-        "a013": round_or_none(activity.get("average_watts")),             # Average Watts
-        "a014": round_or_none(activity.get("max_watts")),                 # Max Watts
-        "a015": round_or_none(activity.get("weighted_average_watts")),    # Weighted Avg Watts
-
-        # Calories & Effort (NumberFields in v2)
-        "b890": round_or_none(activity.get("calories")),       # Calories
-        "a018": round_or_none(activity.get("suffer_score")),   # Suffer Score / Relative Effort
-        # Note: a017 (calories_per_mile), a019 (effort_score) are CalculatedFields in v2
-
-        # Elevation (NumberFields in v2)
-        "4840": meters_to_feet(activity.get("total_elevation_gain")),  # Total Elevation Gain (ft)
-        "d000": meters_to_feet(activity.get("elev_low")),              # Min Elevation (ft)
-        "6767": meters_to_feet(activity.get("elev_high")),             # Max Elevation (ft)
-        # Note: a020 (elevation_gain_per_mile) is a CalculatedField in v2
-
-        # Notes & Details
-        "3350": celsius_to_fahrenheit(activity.get("average_temp")),  # Avg Temp (°F)
-        "a022": activity.get("device_name"),                           # Device Name (NEW)
-        "a023": selected_gear,                                         # Shoes/Gear (auto-selected based on activity type)
-        # Pattern Type (be00) and Garmin Link (2b00) can be added manually in Fulcrum
-    }
-
-    # Convert non-None values to strings (Fulcrum API expects strings)
-    form_values = {k: str(v) for k, v in form_values.items() if v is not None}
+    form_values = PAYLOAD_V2_MAPPING.form_values(activity)
+    if selected_gear is not None:
+        form_values["a023"] = str(selected_gear)  # Shoes/Gear (auto-selected based on activity type)
 
     payload = {
         "record": {
@@ -412,60 +419,6 @@ def build_fulcrum_payload_v2(activity, geojson):
 def read_fulcrum_token():
     return os.environ.get("FULCRUM_API_TOKEN")
 
-def activity_exists_in_fulcrum(activity_id, form_id=None):
-    """Check if an activity already exists in Fulcrum."""
-    try:
-        api_token = os.environ.get("FULCRUM_API_TOKEN")
-        if not form_id:
-            form_id = os.environ.get("FULCRUM_FORM_ID")
-
-        if not api_token or not form_id:
-            print("Warning: Missing Fulcrum credentials, skipping duplicate check")
-            return False
-
-        headers = {
-            "Accept": "application/json",
-            "X-ApiToken": api_token
-        }
-
-        page = 1
-        per_page = 100
-
-        while True:
-            params = {
-                "form_id": form_id,
-                "page": page,
-                "per_page": per_page
-            }
-
-            url = "https://api.fulcrumapp.com/api/v2/records.json"
-            response = requests.get(url, headers=headers, params=params)
-
-            if response.status_code != 200:
-                print(f"Warning: Error checking Fulcrum page {page}: {response.status_code}")
-                return False
-
-            data = response.json()
-            records = data.get("records", [])
-
-            # Check this page for the activity_id
-            for record in records:
-                form_values = record.get("form_values", {})
-                if form_values.get("25a0") == str(activity_id):
-                    return True
-
-            # If we got fewer records than per_page, we've reached the end
-            if len(records) < per_page:
-                break
-
-            page += 1
-
-        return False
-
-    except Exception as e:
-        print(f"Warning: Error checking for duplicates in Fulcrum: {str(e)}")
-        return False
-
 def create_fulcrum_record(payload, form_id, form_name=""):
     """Create a record in Fulcrum."""
     api_token = read_fulcrum_token()
@@ -481,8 +434,9 @@ def create_fulcrum_record(payload, form_id, form_name=""):
     print(f"Form ID: {form_id}")
     print("Payload preview:", json.dumps(payload['record']['form_values'], indent=2)[:500])
 
-    resp = requests.post(url, headers=headers, json=payload)
+    resp = get_session().post(url, headers=headers, json=payload)
     print(f"Fulcrum response{' (' + form_name + ')' if form_name else ''}: {resp.status_code}")
+    record_created(form_id, payload, resp)
 
     try:
         resp_json = resp.json()
@@ -501,6 +455,67 @@ def create_fulcrum_record(payload, form_id, form_name=""):
 
     return resp
 
+register_builder("v1", build_fulcrum_payload_v1, PAYLOAD_V1_FIELDS)
+register_builder("v2", build_fulcrum_payload_v2, PAYLOAD_V2_FIELDS)
+
+_router = None
+
+def get_router():
+    """Return the form router built from forms.json (or the .env form IDs)."""
+    global _router
+    if _router is None:
+        _router = FormRouter(
+            load_routes(),
+            fetch=lambda activity_id: fetch_activity(activity_id, get_valid_access_token()),
+            geometry=get_activity_geometry,
+            create=create_fulcrum_record,
+        )
+    return _router
+
+def process_webhook_event(event):
+    """Run the fetch/build/post pipeline for one queued webhook event.
+
+    Called by the queue worker, never from the request handler. The router
+    checks every configured form for duplicates, fetches the activity once
+    and posts to the matching forms concurrently, so the event takes as long
+    as the slowest form rather than the sum of them.
+
+    Returns:
+        dict: form name -> 'created', 'duplicate', 'filtered' or a failure description
+
+    Raises:
+        RuntimeError: if the fetch or any form's submission failed, so the
+            worker retries the event (forms that succeeded are skipped as
+            duplicates on the retry)
+    """
+    if event.get('object_type') != 'activity' or event.get('aspect_type') != 'create':
+        return {}
+
+    activity_id = event['object_id']
+    outcomes = get_router().dispatch(activity_id)
+
+    print("\n" + "="*60)
+    print(f"ACTIVITY {activity_id} SUBMISSION RESULTS")
+    print("="*60)
+    failed = failed_routes(outcomes)
+    for form_name, outcome in outcomes.items():
+        print(f"{'✗' if form_name in failed else '✓'} {form_name}: {outcome}")
+
+    if failed:
+        raise RuntimeError(f"Submission failed for {', '.join(failed)}")
+    return outcomes
+
+def start_inline_worker():
+    """Start this process's queue worker thread, when WEBHOOK_INLINE_WORKER is on.
+
+    Called at app init (gunicorn.conf.py's post_worker_init, or below when run
+    directly) so events queued before a restart are drained without waiting
+    for the next webhook. Not started on import: the backfill and sync tools
+    import this module for its helpers.
+    """
+    if WEBHOOK_INLINE_WORKER:
+        start_background_worker(process_webhook_event)
+
 @app.route('/strava-webhook', methods=['GET', 'POST'])
 def strava_webhook():
     if request.method == 'GET':
@@ -513,52 +528,35 @@ def strava_webhook():
         print("Received webhook event:")
         print(event)
 
-        if event['object_type'] == 'activity' and event['aspect_type'] == 'create':
-            activity_id = event['object_id']
-            print(f"Fetching details for activity ID: {activity_id}")
-
-            # Check if activity already exists in original form
-            if activity_exists_in_fulcrum(activity_id, FULCRUM_FORM_ID):
-                print(f"Activity {activity_id} already exists in original form - skipping")
-                return '', 200
-
-            # Fetch activity details
-            access_token = get_valid_access_token()
-            activity = fetch_activity(activity_id, access_token)
-
-            if not activity:
-                print("Failed to fetch activity details")
-                return '', 200
-
-            geojson = get_geojson_linestring(activity)
-
-            # Always submit to original form
-            print("\n" + "="*60)
-            print("SUBMITTING TO ORIGINAL FORM")
-            print("="*60)
-            payload_v1 = build_fulcrum_payload_v1(activity, geojson)
-            create_fulcrum_record(payload_v1, FULCRUM_FORM_ID, "Original Form")
-
-            # Optionally submit to v2 form
-            if ENABLE_DUAL_FORM and FULCRUM_FORM_ID_V2:
-                print("\n" + "="*60)
-                print("SUBMITTING TO ENHANCED V2 FORM")
-                print("="*60)
-
-                # Check if already exists in v2 form
-                if activity_exists_in_fulcrum(activity_id, FULCRUM_FORM_ID_V2):
-                    print(f"Activity {activity_id} already exists in v2 form - skipping")
-                else:
-                    payload_v2 = build_fulcrum_payload_v2(activity, geojson)
-                    create_fulcrum_record(payload_v2, FULCRUM_FORM_ID_V2, "Enhanced v2 Form")
-            elif ENABLE_DUAL_FORM and not FULCRUM_FORM_ID_V2:
-                print("\n⚠️  ENABLE_DUAL_FORM is true but FULCRUM_FORM_ID_V2 is not set!")
-                print("   Skipping v2 form submission.")
-            else:
-                print("\n📝 Dual form submission disabled (ENABLE_DUAL_FORM=false)")
+        # Only persist the event here - Strava wants a reply within ~2 seconds,
+        # so the Strava/Fulcrum round trips happen in the queue worker
+        if get_job_queue().enqueue(event):
+            print("Queued webhook event for processing")
+        else:
+            print("Duplicate webhook delivery - already queued")
+
+        # Normally already running since app init; restarts it if it died
+        start_inline_worker()
 
         return '', 200
 
+@app.route('/activities/<int:activity_id>.gpx')
+def activity_gpx(activity_id):
+    # Tracks reveal where the athlete lives and runs, so the endpoint only
+    # exists when a token is configured and the request carries it
+    token = request.args.get('token', '')
+    if not GPX_EXPORT_TOKEN or not hmac.compare_digest(token.encode(), GPX_EXPORT_TOKEN.encode()):
+        abort(404)
+
+    activity = fetch_activity(activity_id, get_valid_access_token())
+    if not activity:
+        abort(404)
+
+    # Streamed point by point, so long activities don't build up in memory
+    streams = activity_streams_for_export(activity_id)
+    return Response(iter_gpx(activity, streams), mimetype='application/gpx+xml',
+                    headers={'Content-Disposition': f'attachment; filename="{gpx_filename(activity)}"'})
+
 if __name__ == '__main__':
     print("\n" + "="*60)
     print("STRAVA WEBHOOK - DUAL FORM MODE")
@@ -566,5 +564,9 @@ if __name__ == '__main__':
     print(f"Original Form ID: {FULCRUM_FORM_ID}")
     print(f"Enhanced v2 Form ID: {FULCRUM_FORM_ID_V2 or 'Not configured'}")
     print(f"Dual Form Enabled: {ENABLE_DUAL_FORM}")
+    for route in get_router().routes:
+        print(f"Route: {route.name} -> {route.form_id} ({route.builder})")
+    print(f"Inline Queue Worker: {WEBHOOK_INLINE_WORKER}")
     print("="*60 + "\n")
+    start_inline_worker()
     app.run(port=5055)
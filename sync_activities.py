@@ -10,13 +10,22 @@ Usage:
 import os
 import sys
 import json
-import requests
 import inquirer
 import argparse
+import asyncio
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 from typing import List, Dict, Optional, Any
 
+# Load environment variables from .env file (before the project modules read their settings)
+load_dotenv()
+
+from activity_cache import get_activity_cache, set_trust_cache
+from activity_fields import resolve_activity, fields_needing_detail
+from async_client import AsyncBridgeClient, run_pipeline
+from fulcrum_batch import FulcrumBatchWriter
+from strava_activities import ActivityPager
+
 def debug_environment():
     """Print debug information about the environment."""
     print("\n==== Environment Debug ====")
@@ -28,16 +37,18 @@ def debug_environment():
     print("STRAVA_CLIENT_SECRET present:", "STRAVA_CLIENT_SECRET" in os.environ)
     print("STRAVA_REFRESH_TOKEN present:", "STRAVA_REFRESH_TOKEN" in os.environ)
 
-# Load environment variables from .env file
-load_dotenv()
-
 from strava_webhook import (
     get_valid_access_token,
     fetch_activity,
     get_geojson_linestring,
-    build_fulcrum_payload,
     create_fulcrum_record,
 )
+# The original form's payload builder, shared with both webhook apps
+from strava_webhook_dual_form import build_fulcrum_payload_v1, PAYLOAD_V1_FIELDS
+from fulcrum_index import activity_exists_in_fulcrum, refresh_form_index
+from geometry import shape_linestring, builtin_spec
+
+V1_GEOMETRY = builtin_spec("v1")
 
 # Import calendar sync functionality
 try:
@@ -47,170 +58,132 @@ except ImportError:
     CALENDAR_SYNC_AVAILABLE = False
     print("Warning: Calendar sync not available. Install training_calendar module to enable.")
 
-def fetch_recent_activities(count=1, before=None, after=None, page=1, per_page=30):
+def fetch_recent_activities(count=1, before=None, after=None, per_page=None):
     """Fetch recent activities from Strava.
     
     Args:
-        count: Number of activities to fetch (max 200)
+        count: Number of activities to fetch
         before: Unix timestamp for activities before this time
         after: Unix timestamp for activities after this time
-        page: Page number to fetch (for pagination)
-        per_page: Number of activities per page (max 200)
+        per_page: Number of activities per page (default: count, max 200)
     """
-    access_token = get_valid_access_token()
-    headers = {'Authorization': f'Bearer {access_token}'}
-    
-    # Build query parameters
-    params = {
-        'per_page': min(per_page, 200),  # Strava max is 200 per page
-        'page': page
-    }
-    if before:
-        params['before'] = before
-    if after:
-        params['after'] = after
-    
-    # Make the API request
-    response = requests.get(
-        'https://www.strava.com/api/v3/athlete/activities',
-        headers=headers,
-        params=params
-    )
-    
-    if response.status_code != 200:
-        print(f"Error fetching activities: {response.status_code}")
-        print(response.text)
-        return []
-    
-    activities = response.json()
-    
-    # If we didn't get enough activities and there might be more, fetch next page
-    if len(activities) < count and len(activities) == per_page:
-        next_page = fetch_recent_activities(
-            count - len(activities),
-            before,
-            after,
-            page + 1,
-            per_page
-        )
-        activities.extend(next_page)
-    
-    # Return only the requested number of activities, most recent first
-    return activities[:count]
-
-def activity_exists_in_fulcrum(activity_id):
-    """Check if an activity already exists in Fulcrum.
+    # Pages stream in and listing stops as soon as `count` is reached
+    pager = ActivityPager(after=after, before=before,
+                          per_page=per_page or max(count, 1), limit=count)
+    return list(pager)
 
-    Args:
-        activity_id: Strava activity ID to check
+def get_activity_details(activity, summary_only=False):
+    """Return the data to build the payload from for an activity summary.
 
-    Returns:
-        bool: True if activity exists, False otherwise
+    Only calls the Strava detail endpoint when the summary is missing a
+    field build_fulcrum_payload_v1 needs (or a cached detail isn't available).
     """
-    try:
-        api_token = os.environ.get("FULCRUM_API_TOKEN")
-        form_id = os.environ.get("FULCRUM_FORM_ID")
-
-        if not api_token or not form_id:
-            print("Warning: Missing Fulcrum credentials, skipping duplicate check")
-            return False
-
-        # Query Fulcrum API to check if record with this activity_id exists
-        headers = {
-            "Accept": "application/json",
-            "X-ApiToken": api_token
-        }
-
-        # Use the form_id filter to only search this specific form
-        params = {
-            "form_id": form_id,
-            "per_page": 1  # We only need to know if at least one exists
-        }
-
-        url = "https://api.fulcrumapp.com/api/v2/records.json"
-        response = requests.get(url, headers=headers, params=params)
-
-        if response.status_code != 200:
-            print(f"Warning: Error checking Fulcrum for duplicates: {response.status_code}")
-            return False
-
-        records = response.json().get("records", [])
-
-        # Check if any record has this activity_id in the strava_activity_id field (key: 25a0)
-        for record in records:
-            form_values = record.get("form_values", {})
-            if form_values.get("25a0") == str(activity_id):
-                return True
-
-        # If no match found in first page, we need to search all records
-        # This is a more thorough check but requires pagination
-        return check_all_fulcrum_records(activity_id, api_token, form_id)
-
-    except Exception as e:
-        print(f"Warning: Error checking for duplicates in Fulcrum: {str(e)}")
-        return False
+    full_activity, source = resolve_activity(
+        activity,
+        [PAYLOAD_V1_FIELDS],
+        fetch=lambda activity_id: fetch_activity(activity_id, get_valid_access_token()),
+        cache=get_activity_cache(),
+        summary_only=summary_only,
+    )
+    if source == "summary":
+        print("  Using summary data (no detail fetch needed)")
+    return full_activity
 
-def check_all_fulcrum_records(activity_id, api_token, form_id):
-    """Check all Fulcrum records for the given activity ID (with pagination).
+def sync_concurrently(activities, fulcrum_form_id, concurrency, summary_only=False):
+    """Create Fulcrum records for several activities at once via the async client.
 
-    Args:
-        activity_id: Strava activity ID to check
-        api_token: Fulcrum API token
-        form_id: Fulcrum form ID
+    Calendar sync is left to the caller so the calendar database is only
+    written from one thread.
 
     Returns:
-        bool: True if activity exists, False otherwise
+        list of (activity, status) where status is 'synced', 'duplicate' or 'failed'
     """
-    try:
-        headers = {
-            "Accept": "application/json",
-            "X-ApiToken": api_token
-        }
-
-        page = 1
-        per_page = 100  # Max per page
-
-        while True:
-            params = {
-                "form_id": form_id,
-                "page": page,
-                "per_page": per_page
-            }
-
-            url = "https://api.fulcrumapp.com/api/v2/records.json"
-            response = requests.get(url, headers=headers, params=params)
-
-            if response.status_code != 200:
-                print(f"Warning: Error checking Fulcrum page {page}: {response.status_code}")
-                return False
-
-            data = response.json()
-            records = data.get("records", [])
-
-            # Check this page for the activity_id
-            for record in records:
-                form_values = record.get("form_values", {})
-                if form_values.get("25a0") == str(activity_id):
-                    return True
-
-            # If we got fewer records than per_page, we've reached the end
-            if len(records) < per_page:
-                break
-
-            page += 1
+    async def sync_one(client, activity):
+        activity_id = activity['id']
+        name = activity.get('name', 'Unnamed Activity')
+        if await client.activity_exists(activity_id, fulcrum_form_id):
+            print(f"  ✓ {name}: already exists in Fulcrum - skipping")
+            return (activity, 'duplicate')
+
+        full_activity = activity
+        if fields_needing_detail(activity, [PAYLOAD_V1_FIELDS], summary_only):
+            full_activity = await client.fetch_activity(activity_id)
+        if not full_activity:
+            print(f"  ✗ {name}: could not fetch activity details")
+            return (activity, 'failed')
+
+        geojson = shape_linestring(get_geojson_linestring(full_activity), V1_GEOMETRY)
+        payload = build_fulcrum_payload_v1(full_activity, geojson)
+        response = await client.create_record(payload, fulcrum_form_id)
+        if response.status_code == 201:
+            print(f"  ✓ {name}: synced to Fulcrum")
+            return (full_activity, 'synced')
+        print(f"  ✗ {name}: failed to sync to Fulcrum (Status: {response.status_code})")
+        return (activity, 'failed')
+
+    async def run():
+        async with AsyncBridgeClient(concurrency=concurrency) as client:
+            return await run_pipeline(
+                activities, lambda activity: sync_one(client, activity), concurrency=concurrency
+            )
+
+    results = asyncio.run(run())
+    return [
+        (activity, 'failed') if isinstance(result, Exception) else result
+        for activity, result in zip(activities, results)
+    ]
 
-        return False
+def sync_batched(activities, fulcrum_form_id, write_concurrency, summary_only=False):
+    """Build payloads one at a time and post them through a batch writer.
 
-    except Exception as e:
-        print(f"Warning: Error during paginated check: {str(e)}")
-        return False
+    Returns:
+        list of (activity, status) where status is 'synced', 'duplicate' or 'failed'
+    """
+    outcomes = []
+    built = []  # (position in outcomes, full activity), in payload order
+
+    def payloads():
+        for activity in activities:
+            name = activity.get('name', 'Unnamed Activity')
+            if activity_exists_in_fulcrum(activity['id'], fulcrum_form_id):
+                print(f"  ✓ {name}: already exists in Fulcrum - skipping")
+                outcomes.append((activity, 'duplicate'))
+                continue
+            try:
+                full_activity = get_activity_details(activity, summary_only)
+            except Exception as e:
+                print(f"  ✗ {name}: error fetching activity details: {e}")
+                full_activity = None
+            if not full_activity:
+                outcomes.append((activity, 'failed'))
+                continue
+            built.append((len(outcomes), full_activity))
+            outcomes.append((activity, 'failed'))  # until the write succeeds
+            geojson = shape_linestring(get_geojson_linestring(full_activity), V1_GEOMETRY)
+            yield build_fulcrum_payload_v1(full_activity, geojson)
+
+    writer = FulcrumBatchWriter(fulcrum_form_id, concurrency=write_concurrency)
+    for result in writer.write(payloads()):
+        position, full_activity = built[result.index]
+        name = full_activity.get('name', 'Unnamed Activity')
+        if result.record_id:
+            print(f"  ✓ {name}: synced to Fulcrum ({result.record_id})")
+            outcomes[position] = (full_activity, 'synced')
+        else:
+            print(f"  ✗ {name}: failed to sync to Fulcrum ({result.error})")
+    return outcomes
 
-def sync_activities(count=1, days_back=30):
+def sync_activities(count=1, days_back=30, summary_only=False, concurrency=1, write_concurrency=0):
     """Sync recent activities to Fulcrum.
     
     Args:
         count: Number of recent activities to sync (max 200)
         days_back: Only sync activities from the last N days
+        summary_only: Skip the detail fetch when only optional detail fields
+            (calories, description) would be gained
+        concurrency: Activities to process at once (1 = sequential)
+        write_concurrency: Fulcrum writes in flight while payloads are built
+            sequentially (0 = write inline)
     """
     # Calculate timestamps
     now = int(datetime.now().timestamp())
@@ -239,77 +212,103 @@ def sync_activities(count=1, days_back=30):
     activities.sort(key=lambda x: x.get('start_date', ''), reverse=True)
     
     print(f"Found {len(activities)} activities to process...")
+
+    # Pick up records created/deleted by hand in Fulcrum since the last run
+    fulcrum_form_id = os.environ.get("FULCRUM_FORM_ID")
+    if fulcrum_form_id:
+        try:
+            refresh_form_index(fulcrum_form_id)
+        except Exception as e:
+            print(f"Warning: Could not refresh Fulcrum index: {e}")
     
     synced_count = 0
     skipped_count = 0
-    
-    for i, activity in enumerate(activities, 1):
-        activity_id = activity['id']
-        activity_name = activity.get('name', 'Unnamed Activity')
-        activity_date = activity.get('start_date_local', 'Unknown date')
-        
-        print(f"\n[{i}/{len(activities)}] Processing: {activity_name} ({activity_date})")
-        
-        # Check if this activity already exists in Fulcrum
-        if activity_exists_in_fulcrum(activity_id):
-            print(f"  ✓ Already exists in Fulcrum - skipping")
-            skipped_count += 1
 
-            # Still sync to calendar (might need to link to planned workout)
-            if CALENDAR_SYNC_AVAILABLE:
+    if (concurrency > 1 or write_concurrency > 0) and fulcrum_form_id:
+        if concurrency > 1:
+            print(f"Processing with {concurrency} activities in flight...")
+            outcomes = sync_concurrently(activities, fulcrum_form_id, concurrency, summary_only)
+        else:
+            print(f"Writing to Fulcrum with {write_concurrency} requests in flight...")
+            outcomes = sync_batched(activities, fulcrum_form_id, write_concurrency, summary_only)
+        for synced_activity, status in outcomes:
+            if status == 'synced':
+                synced_count += 1
+            else:
+                skipped_count += 1
+            if status != 'failed' and CALENDAR_SYNC_AVAILABLE:
                 try:
-                    sync_from_strava(activity)
+                    sync_from_strava(synced_activity)
                 except Exception as e:
                     print(f"  ⚠️  Calendar sync failed: {e}")
+    else:
+        for i, activity in enumerate(activities, 1):
+            activity_id = activity['id']
+            activity_name = activity.get('name', 'Unnamed Activity')
+            activity_date = activity.get('start_date_local', 'Unknown date')
 
-            continue
-            
-        try:
-            # Get full activity details
-            full_activity = fetch_activity(activity_id, get_valid_access_token())
-            if not full_activity:
-                print(f"  ✗ Skipping - could not fetch activity details")
+            print(f"\n[{i}/{len(activities)}] Processing: {activity_name} ({activity_date})")
+
+            # Check if this activity already exists in Fulcrum
+            if activity_exists_in_fulcrum(activity_id):
+                print(f"  ✓ Already exists in Fulcrum - skipping")
                 skipped_count += 1
+
+                # Still sync to calendar (might need to link to planned workout)
+                if CALENDAR_SYNC_AVAILABLE:
+                    try:
+                        sync_from_strava(activity)
+                    except Exception as e:
+                        print(f"  ⚠️  Calendar sync failed: {e}")
+
                 continue
             
-            # Prepare and send to Fulcrum
-            geojson = get_geojson_linestring(full_activity)
-            payload = build_fulcrum_payload(full_activity, geojson)
+            try:
+                # Get full activity details (if the summary isn't enough)
+                full_activity = get_activity_details(activity, summary_only)
+                if not full_activity:
+                    print(f"  ✗ Skipping - could not fetch activity details")
+                    skipped_count += 1
+                    continue
+
+                # Prepare and send to Fulcrum
+                geojson = shape_linestring(get_geojson_linestring(full_activity), V1_GEOMETRY)
+                payload = build_fulcrum_payload_v1(full_activity, geojson)
             
-            print(f"  Sending to Fulcrum...")
-            fulcrum_form_id = os.environ.get("FULCRUM_FORM_ID")
-            if not fulcrum_form_id:
-                print("  ✗ Error: FULCRUM_FORM_ID not found in environment variables")
-                skipped_count += 1
-                continue
+                print(f"  Sending to Fulcrum...")
+                fulcrum_form_id = os.environ.get("FULCRUM_FORM_ID")
+                if not fulcrum_form_id:
+                    print("  ✗ Error: FULCRUM_FORM_ID not found in environment variables")
+                    skipped_count += 1
+                    continue
                 
-            print(f"  Using Fulcrum form ID: {fulcrum_form_id}")
-            response = create_fulcrum_record(payload, fulcrum_form_id)
+                print(f"  Using Fulcrum form ID: {fulcrum_form_id}")
+                response = create_fulcrum_record(payload, fulcrum_form_id)
             
-            if response and hasattr(response, 'status_code'):
-                if response.status_code == 201:
-                    print(f"  ✓ Successfully synced to Fulcrum")
-                    synced_count += 1
-
-                    # Sync to calendar after successful Fulcrum sync
-                    if CALENDAR_SYNC_AVAILABLE:
-                        try:
-                            sync_from_strava(full_activity)
-                        except Exception as e:
-                            print(f"  ⚠️  Calendar sync failed: {e}")
-
+                if response and hasattr(response, 'status_code'):
+                    if response.status_code == 201:
+                        print(f"  ✓ Successfully synced to Fulcrum")
+                        synced_count += 1
+
+                        # Sync to calendar after successful Fulcrum sync
+                        if CALENDAR_SYNC_AVAILABLE:
+                            try:
+                                sync_from_strava(full_activity)
+                            except Exception as e:
+                                print(f"  ⚠️  Calendar sync failed: {e}")
+
+                    else:
+                        print(f"  ✗ Failed to sync to Fulcrum (Status: {response.status_code})")
+                        if hasattr(response, 'text'):
+                            print(f"  Response: {response.text}")
+                        skipped_count += 1
                 else:
-                    print(f"  ✗ Failed to sync to Fulcrum (Status: {response.status_code})")
-                    if hasattr(response, 'text'):
-                        print(f"  Response: {response.text}")
+                    print("  ✗ No valid response received from Fulcrum API")
                     skipped_count += 1
-            else:
-                print("  ✗ No valid response received from Fulcrum API")
-                skipped_count += 1
             
-        except Exception as e:
-            print(f"  ✗ Error processing activity: {str(e)}")
-            skipped_count += 1
+            except Exception as e:
+                print(f"  ✗ Error processing activity: {str(e)}")
+                skipped_count += 1
     
     # Print summary
     print("\n=== Sync Summary ===")
@@ -385,8 +384,19 @@ def main():
                       help='Number of days to look back for activities (default: 30)')
     parser.add_argument('--interactive', '-i', action='store_true',
                       help='Enable interactive mode to select activities')
+    parser.add_argument('--trust-cache', action='store_true',
+                      help='Reuse cached activity details regardless of age')
+    parser.add_argument('--summary-only', action='store_true',
+                      help='Skip detail fetches that would only add calories/description')
+    parser.add_argument('--concurrency', type=int, default=1,
+                      help='Activities to process at once (default: 1)')
+    parser.add_argument('--write-concurrency', type=int, default=0,
+                      help='Fulcrum writes in flight while records are built one at a time (default: 0)')
     
     args = parser.parse_args()
+
+    if args.trust_cache:
+        set_trust_cache(True)
     
     if args.interactive or args.count == 0:
         # Interactive mode
@@ -411,12 +421,14 @@ def main():
         # Process selected activities
         for i, activity in enumerate(selected, 1):
             print(f"\n[{i}/{len(selected)}] Processing activity...")
-            process_single_activity(activity)
+            process_single_activity(activity, summary_only=args.summary_only)
     else:
         # Non-interactive mode (original behavior)
-        sync_activities(count=args.count, days_back=args.days)
+        sync_activities(count=args.count, days_back=args.days,
+                        summary_only=args.summary_only, concurrency=args.concurrency,
+                        write_concurrency=args.write_concurrency)
 
-def process_single_activity(activity: Dict[str, Any]):
+def process_single_activity(activity: Dict[str, Any], summary_only: bool = False):
     """Process a single activity for syncing."""
     activity_id = activity['id']
     activity_name = activity.get('name', 'Unnamed Activity')
@@ -425,8 +437,8 @@ def process_single_activity(activity: Dict[str, Any]):
     print(f"  Activity: {activity_name} ({activity_date})")
     
     try:
-        # Get full activity details
-        full_activity = fetch_activity(activity_id, get_valid_access_token())
+        # Get full activity details (if the summary isn't enough)
+        full_activity = get_activity_details(activity, summary_only)
         if not full_activity:
             print("  ✗ Could not fetch activity details")
             return False
@@ -437,8 +449,8 @@ def process_single_activity(activity: Dict[str, Any]):
             return False
             
         # Prepare and send to Fulcrum
-        geojson = get_geojson_linestring(full_activity)
-        payload = build_fulcrum_payload(full_activity, geojson)
+        geojson = shape_linestring(get_geojson_linestring(full_activity), V1_GEOMETRY)
+        payload = build_fulcrum_payload_v1(full_activity, geojson)
         
         print(f"  Sending to Fulcrum...")
         fulcrum_form_id = os.environ.get("FULCRUM_FORM_ID")
@@ -0,0 +1,50 @@
+# test_activity_cache.py
+# Tests for the on-disk Strava activity detail cache.
+
+import os
+
+from activity_cache import ActivityCache
+
+def test_put_get_and_ttl(tmp_path):
+    cache = ActivityCache(str(tmp_path), ttl=60)
+    cache.put(1, {"id": 1, "name": "Morning Run"})
+    assert cache.get(1) == {"id": 1, "name": "Morning Run"}
+    assert cache.get(2) is None
+
+    expired = ActivityCache(str(tmp_path), ttl=-1)
+    assert expired.get(1) is None
+    expired.trust = True
+    assert expired.get(1)["name"] == "Morning Run"
+
+def test_corrupt_blob_is_a_miss(tmp_path):
+    cache = ActivityCache(str(tmp_path))
+    cache.put(1, {"id": 1})
+    for root, _dirs, files in os.walk(tmp_path / "blobs"):
+        for name in files:
+            with open(os.path.join(root, name), "w") as f:
+                f.write('{"id": 2}')
+    assert cache.get(1) is None
+
+def test_evict_removes_least_recently_used(tmp_path):
+    cache = ActivityCache(str(tmp_path), max_bytes=0)
+    cache.put(1, {"id": 1})
+    cache.put(2, {"id": 2})
+    os.utime(tmp_path / "refs" / "1.json", (0, 0))
+    cache.max_bytes = 10
+    assert cache.evict() == 1
+    assert cache.get(1) is None
+    assert cache.get(2) == {"id": 2}
+
+def test_evict_spares_new_blobs_without_a_ref(tmp_path):
+    cache = ActivityCache(str(tmp_path))
+    cache.put(1, {"id": 1})
+    cache.put(2, {"id": 2})
+    # Refs gone: one blob is old (an orphan), the other may be a put in progress
+    os.unlink(tmp_path / "refs" / "1.json")
+    os.unlink(tmp_path / "refs" / "2.json")
+    blobs = sorted(os.path.join(root, name) for root, _dirs, files in os.walk(tmp_path / "blobs") for name in files)
+    os.utime(blobs[0], (0, 0))
+
+    cache.evict()
+    remaining = [name for _root, _dirs, files in os.walk(tmp_path / "blobs") for name in files]
+    assert remaining == [os.path.basename(blobs[1])]
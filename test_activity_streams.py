@@ -0,0 +1,71 @@
+# test_activity_streams.py
+# Tests for the compact streams store and derived splits.
+
+from activity_streams import StreamStore, encode_streams, decode_streams, mile_splits, streams_linestring
+
+# ~2.1 miles due north at 10 m per second, HR climbing, 1 m of gain per point
+POINTS = 341
+STREAMS = {
+    "latlng": [[37.5 + i * 0.0000904, -77.4] for i in range(POINTS)],
+    "time": list(range(0, POINTS * 1, 1)),
+    "distance": [i * 10.0 for i in range(POINTS)],
+    "heartrate": [120 + i // 10 for i in range(POINTS)],
+    "altitude": [50.0 + i for i in range(POINTS)],
+}
+
+
+def test_round_trip_is_compact_and_lossless_at_stored_precision(tmp_path):
+    data = encode_streams(1, STREAMS)
+    assert len(data) < len(str(STREAMS)) / 10
+
+    decoded = decode_streams(data)
+    assert decoded["time"] == STREAMS["time"]
+    assert decoded["heartrate"] == STREAMS["heartrate"]
+    assert decoded["altitude"] == STREAMS["altitude"]
+    for (lat, lng), (lat0, lng0) in zip(decoded["latlng"], STREAMS["latlng"]):
+        assert abs(lat - lat0) < 1e-6 and abs(lng - lng0) < 1e-6
+
+    store = StreamStore(str(tmp_path))
+    assert store.get(1, fetch=False) is None
+    store.save(1, STREAMS)
+    assert store.has(1)
+    assert store.load(1)["time"] == STREAMS["time"]
+    assert store.stats()[0] == 1
+
+
+def test_mile_splits_and_geometry():
+    splits = mile_splits(STREAMS)
+    assert [s["mile"] for s in splits] == [1, 2, 3]
+    assert splits[0]["seconds"] == 161  # first point past 1609.344 m is at 1610 m
+    assert splits[0]["elevation_gain_ft"] == round(161 * 3.28084, 1)
+    assert splits[-1]["miles"] < 1
+
+    # Without a distance stream, distance comes from the GPS track
+    gps_only = dict(STREAMS)
+    del gps_only["distance"]
+    assert len(mile_splits(gps_only)) == 3
+
+    line = streams_linestring(STREAMS)
+    assert len(line["coordinates"]) == POINTS
+    assert line["coordinates"][0] == [-77.4, 37.5]
+    assert streams_linestring({"time": [1, 2]}) is None
+
+
+def test_missing_samples_stay_missing():
+    streams = {
+        "latlng": [[37.5, -77.4], None, [37.5009, -77.4], [37.5018, -77.4]],
+        "time": [0, 1, 2, 3],
+        "distance": [0.0, 50.0, 100.0, 200.0],
+        "heartrate": [150, None, None, 152],
+        "altitude": [None, 10.0, None, 12.5],
+    }
+    decoded = decode_streams(encode_streams(1, streams))
+    assert decoded["heartrate"] == [150, None, None, 152]
+    assert decoded["altitude"] == [None, 10.0, None, 12.5]
+    assert decoded["latlng"][1] is None
+    assert decoded["time"] == streams["time"]
+
+    split = mile_splits(decoded)[0]
+    assert split["average_heartrate"] == 151
+    assert split["elevation_gain_ft"] == round(2.5 * 3.28084, 1)
+    assert len(streams_linestring(decoded)["coordinates"]) == 3
@@ -0,0 +1,104 @@
+# test_backfill_journal.py
+# Tests for the resumable backfill journal.
+
+import calendar
+
+from backfill_journal import BackfillJournal, JournaledActivities
+
+
+def summary(activity_id, day):
+    return {"id": activity_id, "name": f"Run {activity_id}", "start_date": f"2024-06-{day:02d}T10:00:00Z"}
+
+
+class FakePager:
+    def __init__(self, summaries):
+        self.summaries = summaries
+        self.exhausted = False
+        self.error = None
+
+    def __iter__(self):
+        yield from self.summaries
+        self.exhausted = True
+
+
+def test_interrupted_run_resumes_without_relisting(tmp_path):
+    journal = BackfillJournal(str(tmp_path / "journal.db"))
+    run = journal.start("form", "2024-06-01", "2024-07-01")
+    listed = [summary(i, i) for i in range(1, 6)]
+    calls = []
+
+    def make_pager(after):
+        calls.append(after)
+        return FakePager([s for s in listed if after is None or s["id"] >= 3])
+
+    # First run: listing stops after activity 3 (Ctrl-C), having posted 1,
+    # found 2 already in the form and failed 3's POST
+    activities = JournaledActivities(run, make_pager)
+    for s in activities:
+        if s["id"] == 1:
+            run.mark(1, "posted", record_id="rec-1")
+        elif s["id"] == 2:
+            run.mark(2, "skipped")
+        else:
+            run.failed(3, "post", "HTTP 500")
+            break
+    assert not activities.exhausted
+
+    run = journal.start("form", "2024-06-01", "2024-07-01", resume=True)
+    assert run.counts() == {"posted": 1, "skipped": 1, "failed": 1}
+    assert run.needs_dedup(3)  # the POST may have gone through
+
+    resumed = JournaledActivities(run, make_pager)
+    assert [s["id"] for s in resumed] == [3, 4, 5]
+    # Listing continues from activity 3's start, not the beginning of the range
+    assert calls[-1] == calendar.timegm((2024, 6, 3, 10, 0, 0)) - 1
+    assert resumed.exhausted and run.listing_complete
+
+    for activity_id in (3, 4, 5):
+        run.mark(activity_id, "fetched")
+    assert not run.needs_dedup(4)
+    run.failed(4, "fetch", "HTTP 500")
+    assert not run.needs_dedup(4)
+    # A failed duplicate check never finished, so it has to run again
+    run.failed(5, "dedup", "timeout")
+    assert run.needs_dedup(5)
+
+    # Nothing is listed again once the range is complete
+    run = journal.start("form", "2024-06-01", "2024-07-01", resume=True)
+    assert [s["id"] for s in JournaledActivities(run, make_pager)] == [3, 4, 5]
+    assert len(calls) == 2
+    assert journal.latest_run("form") == ("2024-06-01", "2024-07-01")
+
+
+def test_fresh_run_discards_old_journal(tmp_path):
+    journal = BackfillJournal(str(tmp_path / "journal.db"))
+    run = journal.start("form", "2024-06-01", "2024-07-01")
+    run.record_listed(summary(1, 1))
+    run.mark(1, "posted", record_id="rec-1")
+
+    run = journal.start("form", "2024-06-01", "2024-07-01")
+    assert run.states == {}
+
+
+def test_batched_writes_are_journaled_by_activity_id(tmp_path, monkeypatch):
+    import backfill_date_range
+    from fulcrum_batch import WriteResult
+
+    class FakeWriter:
+        def __init__(self, form_id, concurrency):
+            pass
+
+        def write(self, payloads):
+            list(payloads)
+            yield WriteResult(0, "1", "rec-1", 201, None)
+            yield WriteResult(1, "2", None, 500, "HTTP 500")
+
+    monkeypatch.setattr(backfill_date_range, "FulcrumBatchWriter", FakeWriter)
+    monkeypatch.setattr(backfill_date_range, "build_payloads", lambda *args, **kwargs: iter([]))
+    run = BackfillJournal(str(tmp_path / "journal.db")).start("form", "2024-06-01", "2024-07-01")
+    for activity_id in (1, 2):
+        run.record_listed(summary(activity_id, activity_id))
+
+    assert backfill_date_range.backfill_batched([], "form", 2, journal=run) == (1, 0, 1)
+    assert run.counts() == {"posted": 1, "failed": 1}
+    assert set(run.states) == {1, 2}
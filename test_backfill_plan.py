@@ -0,0 +1,60 @@
+# test_backfill_plan.py
+# Tests for backfill call counting and finish-time projection.
+
+from backfill_plan import plan_backfill, project_finish, BackfillPlan
+from activity_fields import FieldSpec
+from rate_limit import RateBucket
+
+SPEC = FieldSpec(required=("id", "calories"), optional=())
+DAY_START = 1718236800  # 2024-06-13 00:00 UTC
+
+
+class FakeIndex:
+    def strava_ids(self, form_id):
+        return {"1", "2"}
+
+
+class FakeCache:
+    def get(self, activity_id):
+        return {"id": activity_id} if activity_id == 3 else None
+
+
+class FakeStore:
+    def has(self, activity_id):
+        return activity_id == 4
+
+
+def bucket(usage, limits=(100, 1000)):
+    b = RateBucket(limits)
+    b.roll(DAY_START)
+    b.usage = list(usage)
+    return b
+
+
+def test_plan_counts_only_missing_activities():
+    summaries = [{"id": i} for i in range(1, 6)]
+    plan = plan_backfill(summaries, "form", [SPEC], FakeIndex(), cache=FakeCache(), stream_store=FakeStore())
+    assert plan.listed == 5 and plan.existing == 2 and plan.new == 3
+    assert plan.detail_calls == 2 and plan.covered == 1  # 3 is cached
+    assert plan.streams_calls == 2  # 4 is already stored
+    assert plan.fulcrum_calls == 3
+
+
+def test_projection_waits_for_windows_and_days():
+    small = BackfillPlan(10, 1, 0, 10, 10, 0, 0, 10)
+    projection = project_finish(small, [bucket((0, 0))], now=DAY_START, headroom=0,
+                                strava_seconds=1, fulcrum_seconds=1)
+    assert projection.finish == DAY_START + 20
+    assert projection.window_waits == 0 and projection.daily_left == 990
+
+    # 150 calls with 60 left in this window: one wait for the next window
+    big = BackfillPlan(150, 1, 0, 150, 150, 0, 0, 0)
+    projection = project_finish(big, [bucket((40, 40))], now=DAY_START, headroom=0, strava_seconds=1)
+    assert projection.window_waits == 1 and projection.daily_waits == 0
+    assert projection.finish == DAY_START + 15 * 60 + 90
+
+    # Only 20 daily calls left: the rest waits for midnight UTC, then the
+    # 15-minute window caps the new day's first burst at 100
+    projection = project_finish(big, [bucket((0, 980))], now=DAY_START, headroom=0, strava_seconds=1)
+    assert projection.daily_waits == 1 and projection.window_waits == 1
+    assert projection.finish == DAY_START + 86400 + 15 * 60 + 30
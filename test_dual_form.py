@@ -9,8 +9,8 @@ from strava_webhook_dual_form import (
     get_geojson_linestring,
     build_fulcrum_payload_v2,
     create_fulcrum_record,
-    activity_exists_in_fulcrum
 )
+from fulcrum_index import activity_exists_in_fulcrum
 import os
 from dotenv import load_dotenv
 
@@ -39,9 +39,9 @@ def test_v2_form():
     access_token = get_valid_access_token()
 
     # List activities
-    import requests
+    from http_client import get_session
     headers = {"Authorization": f"Bearer {access_token}"}
-    resp = requests.get(
+    resp = get_session().get(
         "https://www.strava.com/api/v3/athlete/activities",
         headers=headers,
         params={"per_page": 1}
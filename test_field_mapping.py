@@ -0,0 +1,39 @@
+# test_field_mapping.py
+# Tests for compiled Fulcrum field mappings.
+
+import pytest
+
+from field_mapping import compile_mapping, load_form_schema, MappingError
+
+SCHEMA_PATH = "run_fulcrum_app_builder.fulcrumapp"
+
+
+def test_form_values_convert_and_drop_missing():
+    mapping = compile_mapping([
+        ("a", "name"),
+        ("b", "map.summary_polyline"),
+        ("c", "distance", (lambda m: m and m / 1000, lambda km: km and round(km, 1))),
+        ("d", None, lambda activity: activity.get("moving_time")),
+        ("e", "calories"),
+    ])
+    values = mapping.form_values({"name": "Run", "map": {"summary_polyline": "xyz"},
+                                  "distance": 5123, "moving_time": 1500})
+    assert values == {"a": "Run", "b": "xyz", "c": "5.1", "d": "1500"}
+
+
+def test_schema_includes_nested_fields():
+    schema = load_form_schema(SCHEMA_PATH)
+    assert schema["cca0"]["type"] == "TimeField"  # inside the "time" section
+    assert "@status" in schema
+
+
+def test_unknown_or_container_keys_fail_at_compile_time():
+    schema = load_form_schema(SCHEMA_PATH)
+    compile_mapping([("9000", "distance"), ("25a0", "id", str)], schema=schema, extra_keys=("25a0",))
+
+    with pytest.raises(MappingError, match="9001"):
+        compile_mapping([("9001", "distance")], schema=schema)
+    with pytest.raises(MappingError, match="Section"):
+        compile_mapping([("78aa", "moving_time")], schema=schema)
+    with pytest.raises(MappingError, match="twice"):
+        compile_mapping([("9000", "distance"), ("9000", "distance")])
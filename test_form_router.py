@@ -0,0 +1,128 @@
+# test_form_router.py
+# Tests for fanning one activity out to the configured Fulcrum forms.
+
+import json
+import threading
+
+import pytest
+
+from form_router import FormRouter, Route, load_routes, register_builder, failed_routes
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+register_builder("test", lambda activity, geojson: {"record": {"form_values": {"25a0": str(activity["id"])}}})
+
+
+def make_router(routes, exists=lambda activity_id, form_id: False, status=lambda form_id: 201):
+    fetched = []
+    posted = []
+    router = FormRouter(
+        routes,
+        fetch=lambda activity_id: fetched.append(activity_id) or
+            {"id": activity_id, "type": "Run", "start_date_local": "2025-03-01T07:00:00Z"},
+        geometry=lambda activity: None,
+        create=lambda payload, form_id, form_name: posted.append(form_id) or FakeResponse(status(form_id)),
+        exists=exists,
+    )
+    return router, fetched, posted
+
+
+def test_each_form_gets_its_own_outcome():
+    routes = [Route("A", "form-a", "test"), Route("B", "form-b", "test"),
+              Route("Rides", "form-c", "test", types=("Ride",))]
+    router, fetched, posted = make_router(routes, exists=lambda activity_id, form_id: form_id == "form-a")
+
+    outcomes = router.dispatch(42)
+
+    assert outcomes == {"A": "duplicate", "B": "created", "Rides": "filtered"}
+    assert fetched == [42]
+    assert posted == ["form-b"]
+    assert failed_routes(outcomes) == []
+
+
+def test_forms_are_posted_concurrently():
+    # Both posts have to be in flight at once to get past the barrier
+    barrier = threading.Barrier(2, timeout=5)
+    posted = []
+
+    def create(payload, form_id, form_name):
+        barrier.wait()
+        posted.append(form_id)
+        return FakeResponse(201)
+
+    router = FormRouter([Route("A", "form-a", "test"), Route("B", "form-b", "test")],
+                        fetch=lambda activity_id: {"id": activity_id, "type": "Run"},
+                        geometry=lambda activity: None, create=create,
+                        exists=lambda activity_id, form_id: False)
+
+    assert router.dispatch(42) == {"A": "created", "B": "created"}
+    assert sorted(posted) == ["form-a", "form-b"]
+
+
+def test_webhook_event_raises_so_the_worker_retries(monkeypatch):
+    import strava_webhook_dual_form as webhook
+
+    routes = [Route("A", "form-a", "test"), Route("B", "form-b", "test")]
+    router, _fetched, _posted = make_router(routes, status=lambda form_id: 201 if form_id == "form-a" else 500)
+    monkeypatch.setattr(webhook, "get_router", lambda: router)
+
+    with pytest.raises(RuntimeError, match="B"):
+        webhook.process_webhook_event({"object_type": "activity", "aspect_type": "create", "object_id": 42})
+    # Other events are acknowledged without touching the forms
+    assert webhook.process_webhook_event({"object_type": "athlete", "aspect_type": "update"}) == {}
+
+
+def test_all_duplicates_skip_the_fetch():
+    router, fetched, posted = make_router([Route("A", "form-a", "test")],
+                                          exists=lambda activity_id, form_id: True)
+    assert router.dispatch(42) == {"A": "duplicate"}
+    assert fetched == [] and posted == []
+
+
+def test_failed_form_is_reported():
+    routes = [Route("A", "form-a", "test"), Route("B", "form-b", "test", after="2025-01-01")]
+    router, _fetched, _posted = make_router(routes, status=lambda form_id: 201 if form_id == "form-a" else 500)
+    assert failed_routes(router.dispatch(42)) == ["B"]
+
+
+def test_load_routes_from_config(tmp_path, monkeypatch):
+    monkeypatch.setenv("MY_FORM", "form-env")
+    config = tmp_path / "forms.json"
+    config.write_text(json.dumps([
+        {"name": "Env form", "form_id_env": "MY_FORM", "builder": "test"},
+        {"name": "Off", "form_id": "x", "builder": "test", "enabled": False},
+        {"name": "Runs", "form_id": "form-runs", "builder": "test", "types": ["Run"], "after": "2025-01-01"},
+    ]))
+    routes = load_routes(str(config))
+    assert [(r.name, r.form_id) for r in routes] == [("Env form", "form-env"), ("Runs", "form-runs")]
+    assert routes[1].types == ("Run",)
+
+    config.write_text(json.dumps([{"name": "Typo", "form_id": "x", "builder": "nope"}]))
+    with pytest.raises(ValueError):
+        load_routes(str(config))
+
+
+def test_env_routes_without_config(tmp_path, monkeypatch):
+    monkeypatch.setenv("FULCRUM_FORM_ID", "form-v1")
+    monkeypatch.setenv("FULCRUM_FORM_ID_V2", "form-v2")
+    monkeypatch.setenv("ENABLE_DUAL_FORM", "true")
+    missing = str(tmp_path / "forms.json")
+    assert [r.builder for r in load_routes(missing)] == ["v1", "v2"]
+    # The single-form app ignores ENABLE_DUAL_FORM
+    assert [r.builder for r in load_routes(missing, dual=False)] == ["v1"]
+
+
+def test_invalid_payload_is_not_posted_or_retried():
+    register_builder("bad-v1", lambda activity, geojson: {"record": {"form_values": {"9000": "far"}}})
+    routes = [Route("A", "form-a", "bad-v1", schema="run_fulcrum_app_builder.fulcrumapp")]
+    router, _fetched, posted = make_router(routes)
+
+    outcomes = router.dispatch(42)
+
+    assert outcomes["A"].startswith("invalid")
+    assert posted == []
+    assert failed_routes(outcomes) == []
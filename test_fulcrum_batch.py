@@ -0,0 +1,47 @@
+# test_fulcrum_batch.py
+# Tests for the concurrent Fulcrum record writer.
+
+import fulcrum_batch
+from fulcrum_batch import FulcrumBatchWriter
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.body = body or {}
+        self.headers = headers or {}
+        self.text = str(self.body)
+
+    def json(self):
+        return self.body
+
+
+def payload(strava_id):
+    return {"record": {"form_values": {"25a0": str(strava_id)}}}
+
+
+def test_write_retries_429_and_keeps_input_order(monkeypatch):
+    calls = []
+
+    class FakeSession:
+        def post(self, url, headers=None, json=None):
+            strava_id = json["record"]["form_values"]["25a0"]
+            calls.append(strava_id)
+            if strava_id == "2" and calls.count("2") == 1:
+                return FakeResponse(429, headers={"Retry-After": "0"})
+            if strava_id == "3":
+                return FakeResponse(422, {"record": {"errors": ["bad"]}})
+            return FakeResponse(201, {"record": {"id": f"rec-{strava_id}"}})
+
+    created = []
+    monkeypatch.setattr(fulcrum_batch, "get_session", FakeSession)
+    monkeypatch.setattr(fulcrum_batch, "record_created", lambda form_id, p, resp: created.append(form_id))
+
+    writer = FulcrumBatchWriter("form-1", concurrency=3, api_token="token")
+    results = list(writer.write(payload(i) for i in range(1, 6)))
+
+    assert [r.index for r in results] == [0, 1, 2, 3, 4]
+    assert [r.record_id for r in results] == ["rec-1", "rec-2", None, "rec-4", "rec-5"]
+    assert results[2].status_code == 422
+    assert calls.count("2") == 2
+    assert created == ["form-1"] * 4
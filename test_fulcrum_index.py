@@ -0,0 +1,110 @@
+# test_fulcrum_index.py
+# Tests for the local Strava activity ID -> Fulcrum record ID index.
+
+from fulcrum_index import FulcrumIndex
+
+def test_add_and_lookup(tmp_path):
+    index = FulcrumIndex(str(tmp_path / "index.db"))
+    assert index.lookup("form-1", 123) is None
+    index.add("form-1", 123, "rec-abc")
+    assert index.lookup("form-1", "123") == "rec-abc"
+    assert index.contains("form-1", 123)
+    # Entries are per form
+    assert not index.contains("form-2", 123)
+
+def test_replace_form_marks_indexed(tmp_path):
+    index = FulcrumIndex(str(tmp_path / "index.db"))
+    index.add("form-1", 1, "old")
+    assert not index.is_indexed("form-1")
+
+    index.replace_form("form-1", [("2", "rec-2"), ("3", "rec-3")])
+    assert index.is_indexed("form-1")
+    assert index.strava_ids("form-1") == {"2", "3"}
+    assert index.stats()["form-1"][0] == 2
+
+def test_apply_changes_handles_edits_and_deletes(tmp_path):
+    index = FulcrumIndex(str(tmp_path / "index.db"))
+    index.replace_form("form-1", [("1", "rec-1"), ("2", "rec-2")], cursor=100)
+    assert index.refresh_cursor("form-1") == 100
+
+    # rec-2 was edited to point at activity 3; rec-1 was deleted in the UI
+    index.apply_changes("form-1", [("3", "rec-2"), ("4", "rec-4")], ["rec-1"], cursor=200)
+    assert index.strava_ids("form-1") == {"3", "4"}
+    assert index.refresh_cursor("form-1") == 200
+
+def test_scan_form_records_fetches_all_pages(monkeypatch):
+    import fulcrum_index
+
+    class FakeResponse:
+        status_code = 200
+        def __init__(self, page):
+            self.page = page
+        def json(self):
+            records = [{"id": f"rec-{self.page}-{i}"} for i in range(fulcrum_index.SCAN_PAGE_SIZE if self.page < 3 else 5)]
+            return {"records": records, "total_pages": 3}
+
+    class FakeSession:
+        def get(self, url, headers=None, params=None):
+            return FakeResponse(params["page"])
+
+    monkeypatch.setattr(fulcrum_index, "get_session", FakeSession)
+    records = list(fulcrum_index.scan_form_records("form-1", api_token="token", workers=2))
+    assert len(records) == 2 * fulcrum_index.SCAN_PAGE_SIZE + 5
+    assert len({record["id"] for record in records}) == len(records)
+
+def test_concurrent_checks_rebuild_a_new_form_once(tmp_path, monkeypatch):
+    import threading
+    import time
+    import fulcrum_index
+
+    index = FulcrumIndex(str(tmp_path / "index.db"))
+    rebuilds = []
+
+    def fake_rebuild(form_id, index):
+        rebuilds.append(form_id)
+        time.sleep(0.05)
+        index.replace_form(form_id, [("7", "rec-7")])
+
+    monkeypatch.setenv("FULCRUM_API_TOKEN", "token")
+    monkeypatch.setattr(fulcrum_index, "get_index", lambda: index)
+    monkeypatch.setattr(fulcrum_index, "rebuild_form_index", fake_rebuild)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(fulcrum_index.activity_exists_in_fulcrum(7, "form-1")))
+               for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert rebuilds == ["form-1"]
+    assert results == [True] * 4
+
+def test_duplicate_records_and_cleared_strava_ids(tmp_path):
+    index = FulcrumIndex(str(tmp_path / "index.db"))
+    index.replace_form("form-1", [("1", "rec-a"), ("1", "rec-b"), ("2", "rec-c")], cursor=100)
+
+    # Deleting one of two records for an activity leaves it indexed
+    index.apply_changes("form-1", [], ["rec-a"], cursor=200)
+    assert index.lookup("form-1", 1) == "rec-b"
+
+    # rec-c had its Strava ID cleared in the UI
+    index.apply_changes("form-1", [(None, "rec-c")], [], cursor=300)
+    assert index.strava_ids("form-1") == {"1"}
+
+def test_activity_keyed_index_is_migrated(tmp_path):
+    import sqlite3
+
+    db_path = str(tmp_path / "index.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE records (form_id TEXT NOT NULL, strava_id TEXT NOT NULL, record_id TEXT,
+                              indexed_at REAL NOT NULL, PRIMARY KEY (form_id, strava_id))
+    """)
+    conn.execute("INSERT INTO records VALUES ('form-1', '1', 'rec-a', 0)")
+    conn.commit()
+    conn.close()
+
+    index = FulcrumIndex(db_path)
+    assert index.lookup("form-1", 1) == "rec-a"
+    index.add("form-1", 1, "rec-b")
+    index.apply_changes("form-1", [], ["rec-a"], cursor=100)
+    assert index.lookup("form-1", 1) == "rec-b"
@@ -0,0 +1,39 @@
+# test_geometry.py
+# Tests for per-form line simplification.
+
+import polyline
+
+from geometry import GeometrySpec, douglas_peucker, visvalingam, round_coords, shape_linestring
+
+# ~1 km east-west line (at ~37.5N) with a 1 m wobble and one 50 m detour
+LINE = [[-77.4 + i * 0.0001, 37.5 + (0.000009 if i % 2 else 0)] for i in range(90)]
+LINE[45][1] += 0.00045
+
+
+def test_douglas_peucker_keeps_real_detours():
+    simplified = douglas_peucker(LINE, tolerance=5)
+    assert simplified[0] == LINE[0] and simplified[-1] == LINE[-1]
+    assert LINE[45] in simplified
+    assert len(simplified) < 10
+    # Zero tolerance keeps every vertex
+    assert douglas_peucker(LINE, tolerance=0) == LINE
+
+
+def test_visvalingam_drops_small_triangles_first():
+    simplified = visvalingam(LINE, min_area=100)
+    assert LINE[45] in simplified
+    assert len(simplified) < 10
+
+
+def test_precision_rounding_merges_duplicates():
+    assert round_coords([[1.123456, 2.0], [1.123457, 2.0], [1.2, 2.0]], 5) == [[1.12346, 2.0], [1.2, 2.0]]
+
+
+def test_shape_linestring_resolutions_from_one_decode():
+    coords = [[lon, lat] for lat, lon in polyline.decode(polyline.encode([(lat, lon) for lon, lat in LINE]))]
+    geojson = {"type": "LineString", "coordinates": coords}
+    coarse = shape_linestring(geojson, GeometrySpec("dp", 20.0, 4))
+    fine = shape_linestring(geojson, GeometrySpec("dp", 0.5, 5))
+    assert len(coarse["coordinates"]) < len(fine["coordinates"]) <= len(coords)
+    assert geojson["coordinates"] == coords  # the shared decode is untouched
+    assert shape_linestring(None, GeometrySpec()) is None
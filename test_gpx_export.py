@@ -0,0 +1,67 @@
+# test_gpx_export.py
+# Tests for the streaming GPX export.
+
+import io
+
+import gpxpy
+import polyline
+
+from activity_streams import StreamStore
+from gpx_export import iter_gpx, write_gpx, export_activity
+
+ACTIVITY = {
+    "id": 42,
+    "name": "Morning Run & Hills",
+    "type": "Run",
+    "start_date": "2024-06-01T10:00:00Z",
+    "start_date_local": "2024-06-01T06:00:00Z",
+}
+POINTS = 500
+STREAMS = {
+    "latlng": [[37.5 + i * 0.0001, -77.4] for i in range(POINTS)],
+    "time": list(range(POINTS)),
+    "altitude": [50.0 + i / 10 for i in range(POINTS)],
+    "heartrate": [130 + i % 20 for i in range(POINTS)],
+}
+
+
+def test_streams_export_parses_with_times_elevation_and_heartrate():
+    out = io.StringIO()
+    write_gpx(ACTIVITY, out, STREAMS)
+    gpx = gpxpy.parse(out.getvalue())
+
+    assert gpx.tracks[0].name == "Morning Run & Hills"
+    points = gpx.tracks[0].segments[0].points
+    assert len(points) == POINTS
+    assert points[10].latitude == STREAMS["latlng"][10][0]
+    assert points[10].elevation == 51.0
+    assert points[10].time.isoformat() == "2024-06-01T10:00:10+00:00"
+    assert "<gpxtpx:hr>140</gpxtpx:hr>" in out.getvalue()
+
+
+def test_polyline_export_is_streamed_in_chunks(tmp_path):
+    coords = [(round(37.5 + i * 0.001, 5), round(-77.4 + i * 0.001, 5)) for i in range(20)]
+    activity = dict(ACTIVITY, map={"summary_polyline": polyline.encode(coords)})
+
+    chunks = list(iter_gpx(activity))
+    assert len(chunks) == len(coords) + 2  # header, one per point, footer
+
+    path = export_activity(activity, str(tmp_path / "run.gpx"), streams={})
+    with open(path) as f:
+        points = gpxpy.parse(f).tracks[0].segments[0].points
+    assert [(p.latitude, p.longitude) for p in points] == coords
+
+
+def test_stored_streams_are_exported_row_by_row(tmp_path):
+    store = StreamStore(str(tmp_path))
+    store.save(42, dict(STREAMS, heartrate=[None] + STREAMS["heartrate"][1:]))
+    rows = store.iter_rows(42)
+    assert not isinstance(rows, (list, dict))
+
+    out = io.StringIO()
+    write_gpx(ACTIVITY, out, rows)
+    points = gpxpy.parse(out.getvalue()).tracks[0].segments[0].points
+    assert len(points) == POINTS
+    assert abs(points[10].latitude - STREAMS["latlng"][10][0]) < 1e-6
+    assert points[10].elevation == 51.0
+    assert out.getvalue().count("<gpxtpx:hr>") == POINTS - 1
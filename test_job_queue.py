@@ -0,0 +1,67 @@
+# test_job_queue.py
+# Tests for the durable webhook job queue and worker loop.
+
+from job_queue import JobQueue, MAX_ATTEMPTS
+from webhook_worker import run_worker
+
+SAMPLE_EVENT = {
+    "object_type": "activity",
+    "aspect_type": "create",
+    "object_id": 1234567890,
+    "event_time": 1700000000,
+    "owner_id": 1,
+    "subscription_id": 1,
+    "updates": {}
+}
+
+def test_enqueue_drops_redelivered_events(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.db"))
+    assert queue.enqueue(SAMPLE_EVENT) is True
+    assert queue.enqueue(dict(SAMPLE_EVENT)) is False
+    assert queue.counts() == {"pending": 1}
+
+def test_queue_survives_reopen(tmp_path):
+    db_path = str(tmp_path / "queue.db")
+    JobQueue(db_path).enqueue(SAMPLE_EVENT)
+    job = JobQueue(db_path).claim()
+    assert job["event"]["object_id"] == 1234567890
+    assert job["attempts"] == 1
+
+def test_worker_completes_and_retries(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.db"))
+    queue.enqueue(SAMPLE_EVENT)
+    queue.enqueue(dict(SAMPLE_EVENT, object_id=42))
+
+    def handler(event):
+        if event["object_id"] == 42:
+            raise RuntimeError("boom")
+
+    run_worker(handler, queue=queue, once=True)
+    # The failing job is rescheduled with backoff, not lost
+    assert queue.counts() == {"done": 1, "pending": 1}
+
+def test_fail_gives_up_after_max_attempts(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.db"))
+    queue.enqueue(SAMPLE_EVENT)
+    job = queue.claim()
+    for _ in range(MAX_ATTEMPTS - 1):
+        assert queue.fail(job["id"], "error") is True
+        conn = queue._connect()
+        conn.execute("UPDATE jobs SET available_at = 0")
+        conn.close()
+        job = queue.claim()
+    assert queue.fail(job["id"], "error") is False
+    assert queue.counts() == {"failed": 1}
+
+def test_worker_purges_old_completed_jobs(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue.db"))
+    queue.enqueue(SAMPLE_EVENT)
+    run_worker(lambda event: None, queue=queue, once=True)
+    conn = queue._connect()
+    conn.execute("UPDATE jobs SET finished_at = 0")
+    conn.close()
+    queue.enqueue(dict(SAMPLE_EVENT, object_id=42))
+
+    run_worker(lambda event: None, queue=queue, once=True)
+    # The old job is gone; the one just completed is kept
+    assert queue.counts() == {"done": 1}
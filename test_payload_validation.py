@@ -0,0 +1,58 @@
+# test_payload_validation.py
+# Tests for checking payloads against a Fulcrum form export before posting.
+
+from payload_validation import PayloadValidator, get_validator
+
+SCHEMA_PATH = "run_fulcrum_app_builder.fulcrumapp"
+
+
+def payload(form_values, status=None):
+    record = {"form_values": form_values}
+    if status is not None:
+        record["status"] = status
+    return {"record": record}
+
+
+def test_valid_v1_payload_has_no_problems():
+    validator = get_validator(SCHEMA_PATH)
+    assert validator.validate(payload({"7980": "Run", "9000": "6.21", "b890": "712", "25a0": "1"},
+                                      status="trail")) == []
+
+
+def test_all_problems_are_reported_together():
+    validator = get_validator(SCHEMA_PATH)
+    problems = validator.validate(payload(
+        {"9000": "far", "b890": "712.5", "zzzz": "x", "78aa": "x"},
+        status="strength",
+    ))
+    assert len(problems) == 5
+    assert any(p.startswith("9000") and "not a number" in p for p in problems)
+    assert any(p.startswith("b890") and "whole number" in p for p in problems)
+    assert any(p.startswith("zzzz") for p in problems)
+    assert any(p.startswith("78aa") for p in problems)
+    assert any(p.startswith("status") for p in problems)
+
+
+def test_choice_fields_and_batches():
+    schema = {
+        "a023": {"key": "a023", "type": "ChoiceField", "label": "Gear",
+                 "choices": [{"value": "bondi74"}, {"value": "speedgoat5_red2"}]},
+        "b000": {"key": "b000", "type": "TextField", "required": True},
+    }
+    validator = PayloadValidator(schema)
+    good = payload({"a023": "bondi74", "b000": "x"})
+    bad = payload({"a023": "clifton9", "25a0": "77"})
+
+    assert validator.validate(good) == []
+    invalid = validator.validate_batch([good, bad])
+    assert [(index, strava_id, len(problems)) for index, strava_id, problems in invalid] == [(1, "77", 2)]
+
+
+def test_missing_export_means_no_validator():
+    assert get_validator("does-not-exist.fulcrumapp") is None
+
+
+def test_missing_export_is_reported_once(capsys):
+    get_validator("also-missing.fulcrumapp")
+    get_validator("also-missing.fulcrumapp")
+    assert capsys.readouterr().out.count("also-missing.fulcrumapp") == 1
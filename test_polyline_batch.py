@@ -0,0 +1,60 @@
+# test_polyline_batch.py
+# Tests for batch polyline decoding (NumPy or pure-Python backend).
+
+import polyline
+import pytest
+
+import polyline_batch
+from polyline_batch import decode_batch, decode_lonlat, iter_lonlat, predecode
+
+LINES = [
+    "_p~iF~ps|U_ulLnnqC_mqNvxq`@",
+    "",
+    polyline.encode([(37.5, -77.4), (37.50001, -77.40002), (-33.9, 151.2)]),
+]
+
+
+@pytest.fixture(autouse=True, params=["python", "numpy"])
+def backend(request, monkeypatch):
+    """Run every test against both decoders."""
+    if request.param == "numpy":
+        monkeypatch.setattr(polyline_batch, "np", pytest.importorskip("numpy"))
+        monkeypatch.setattr(polyline_batch, "HAVE_NUMPY", True)
+    else:
+        monkeypatch.setattr(polyline_batch, "HAVE_NUMPY", False)
+    return request.param
+
+
+def test_batch_matches_polyline_decode():
+    batch = decode_batch(LINES + [None])
+    assert len(batch) == 4
+    assert batch.point_count == 6
+    for i, encoded in enumerate(LINES):
+        expected = [[lon, lat] for lat, lon in polyline.decode(encoded)]
+        assert batch.line(i) == expected
+    assert batch.line(3) == []
+
+
+def test_bboxes_and_lengths():
+    batch = decode_batch(LINES)
+    bboxes = batch.bboxes()
+    assert bboxes[0] == (-126.453, 38.5, -120.2, 43.252)
+    assert bboxes[1] is None
+
+    lengths = batch.lengths_m()
+    assert lengths[1] == 0.0
+    # Richmond, VA -> Sydney is roughly 15,700 km
+    assert 15_000_000 < lengths[2] < 16_500_000
+    assert batch.rounded(1).line(0)[0] == [-120.2, 38.5]
+
+
+def test_predecoded_lines_are_served_once():
+    predecode([LINES[0], None])
+    assert LINES[0] in polyline_batch._predecoded
+    assert decode_lonlat(LINES[0]) == decode_batch([LINES[0]]).line(0)
+    assert LINES[0] not in polyline_batch._predecoded
+
+
+def test_iter_lonlat_matches_polyline_decode():
+    for encoded in LINES:
+        assert list(iter_lonlat(encoded)) == [[lon, lat] for lat, lon in polyline.decode(encoded)]
@@ -0,0 +1,47 @@
+# test_rate_limit.py
+# Tests for the header-driven Strava rate limiter.
+
+from rate_limit import StravaRateLimiter, parse_rate_header
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+        self.slept = []
+    def time(self):
+        return self.now
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+class FakeResponse:
+    def __init__(self, limit, usage, status_code=200):
+        self.status_code = status_code
+        self.headers = {"X-RateLimit-Limit": limit, "X-RateLimit-Usage": usage}
+
+def make_limiter(now, headroom=0):
+    clock = FakeClock(now)
+    return StravaRateLimiter(headroom=headroom, clock=clock.time, sleep=clock.sleep), clock
+
+def test_parse_rate_header():
+    assert parse_rate_header("100,1000") == (100, 1000)
+    assert parse_rate_header("") is None
+    assert parse_rate_header("garbage") is None
+
+def test_no_wait_while_budget_remains():
+    limiter, clock = make_limiter(900 * 10 + 60)
+    limiter.update(FakeResponse("100,1000", "50,200"))
+    assert limiter.acquire() == 0
+    assert clock.slept == []
+
+def test_waits_exactly_until_short_window_resets():
+    # 5 minutes into a 15 minute window with the budget used up
+    limiter, clock = make_limiter(900 * 10 + 300)
+    limiter.update(FakeResponse("100,1000", "100,200"))
+    limiter.acquire()
+    assert clock.slept == [600]
+
+def test_429_exhausts_window():
+    limiter, clock = make_limiter(900 * 10 + 840)
+    limiter.update(FakeResponse("100,1000", "10,20", status_code=429))
+    limiter.acquire()
+    assert clock.slept == [60]
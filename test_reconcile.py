@@ -0,0 +1,71 @@
+# test_reconcile.py
+# Tests for the Strava / Fulcrum / calendar reconciliation.
+
+import sqlite3
+import time
+
+from reconcile import reconcile, calendar_activity_ids, form_records
+
+STRAVA = {
+    "101": {"id": 101, "name": "Easy Run", "start_date_local": "2024-06-03T06:30:00Z"},
+    "102": {"id": 102, "name": "Long Run", "start_date_local": "2024-06-08T07:00:00Z"},
+    "103": {"id": 103, "name": "Bootcamp", "start_date_local": "2024-06-10T05:30:00Z"},
+}
+
+FORM_RECORDS = {
+    "v1": [
+        ("101", "v1-a", "2024-06-03"),
+        ("102", "v1-b", "2024-06-08"),
+        ("103", "v1-c", "2024-06-10"),
+    ],
+    "v2": [
+        ("101", "v2-a", "2024-06-03"),
+        ("101", "v2-a2", "2024-06-03"),   # duplicate
+        ("999", "v2-x", "2024-06-05"),    # activity deleted from Strava
+        ("555", "v2-old", "2023-01-01"),  # outside the range - not an orphan
+        (None, "v2-manual", "2024-06-06"),
+    ],
+}
+
+
+def test_reconcile_builds_repair_plan():
+    result = reconcile("2024-06-01", "2024-07-01", STRAVA, FORM_RECORDS, {"101", "103", "777"})
+
+    assert result.missing == {"v1": [], "v2": ["102", "103"]}
+    assert result.orphaned == {"v1": [], "v2": [("999", "v2-x")]}
+    assert result.duplicates["v2"] == {"101": ["v2-a", "v2-a2"]}
+    assert result.unlinked["v2"] == ["v2-manual"]
+    assert result.calendar_without_fulcrum == ["777"]
+
+    plan = result.repair_plan()
+    assert plan["orphaned"]["v2"] == [{"strava_id": "999", "record_id": "v2-x"}]
+    assert plan["strava_activities"] == 3
+
+
+def test_calendar_ids_are_limited_to_the_range(tmp_path):
+    db_path = str(tmp_path / "training_plan.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE completed_activities (id TEXT PRIMARY KEY, date DATE NOT NULL)")
+    conn.executemany("INSERT INTO completed_activities VALUES (?, ?)",
+                     [("101", "2024-06-03"), ("88", "2024-05-31"), ("103", "2024-06-10")])
+    conn.commit()
+    conn.close()
+
+    assert calendar_activity_ids(db_path, "2024-06-01", "2024-07-01") == {"101", "103"}
+    assert calendar_activity_ids(str(tmp_path / "missing.db"), "2024-06-01", "2024-07-01") == set()
+
+
+def test_form_scan_refreshes_the_index_with_overlap(tmp_path, monkeypatch):
+    import fulcrum_index
+
+    index = fulcrum_index.FulcrumIndex(str(tmp_path / "index.db"))
+    monkeypatch.setattr(fulcrum_index, "get_index", lambda: index)
+    monkeypatch.setattr(fulcrum_index, "scan_form_records", lambda form_id: iter([
+        {"id": "rec-1", "form_values": {"25a0": "101", "2d48": "2024-06-03"}},
+        {"id": "rec-2", "form_values": None},
+    ]))
+
+    before = time.time()
+    assert form_records("form") == [("101", "rec-1", "2024-06-03"), (None, "rec-2", None)]
+    assert index.strava_ids("form") == {"101"}
+    assert index.refresh_cursor("form") <= before - fulcrum_index.CURSOR_OVERLAP_SECONDS + 1
@@ -0,0 +1,66 @@
+# test_shared_budget.py
+# Tests for the rate budget shared between backfill processes.
+
+from datetime import datetime
+
+from backfill_shards import split_range
+from shared_budget import SharedStravaRateLimiter, SharedPause
+
+NOW = 1718236800  # 2024-06-13 00:00 UTC, the start of both windows
+
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+        self.slept = []
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {"X-RateLimit-Limit": "100,1000", "X-RateLimit-Usage": "0,0"}
+
+
+def test_limiters_in_two_processes_spend_one_budget(tmp_path):
+    db_path = str(tmp_path / "budget.db")
+    clock = FakeClock(NOW)
+    first = SharedStravaRateLimiter(db_path, headroom=0, clock=clock.time, sleep=clock.sleep)
+    second = SharedStravaRateLimiter(db_path, headroom=0, clock=clock.time, sleep=clock.sleep)
+    first.update(FakeResponse())
+
+    for _ in range(60):
+        first.acquire("POST")
+    for _ in range(40):
+        second.acquire("POST")
+    assert clock.slept == []
+    assert first.remaining()[0] == (0, 900)
+
+    # The 101st call waits for the next 15 minute window, whichever process makes it
+    first.acquire("POST")
+    assert clock.slept == [15 * 60]
+
+
+def test_pause_is_seen_by_every_process(tmp_path):
+    db_path = str(tmp_path / "budget.db")
+    clock = FakeClock(NOW)
+    SharedPause("fulcrum", db_path, clock=clock.time).pause(30)
+    other = SharedPause("fulcrum", db_path, clock=clock.time)
+    assert other.remaining() == 30
+    other.pause(10)  # never shortens a longer pause
+    assert other.remaining() == 30
+    clock.now += 31
+    assert other.remaining() == 0
+
+
+def test_split_range_covers_the_range_without_gaps():
+    shards = split_range(datetime(2024, 1, 1), datetime(2024, 12, 31), 4)
+    assert len(shards) == 4
+    assert shards[0][0] == datetime(2024, 1, 1) and shards[-1][1] == datetime(2024, 12, 31)
+    assert all(a[1] == b[0] for a, b in zip(shards, shards[1:]))
+    assert len(split_range(datetime(2024, 1, 1), datetime(2024, 1, 3), 8)) == 2
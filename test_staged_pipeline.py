@@ -0,0 +1,86 @@
+# test_staged_pipeline.py
+# Tests for the staged thread pipeline.
+
+import threading
+import time
+
+from staged_pipeline import Stage, StagedPipeline
+
+
+def test_items_flow_through_every_stage():
+    results = []
+    lock = threading.Lock()
+    errors = []
+
+    def double(n):
+        if n == 7:
+            raise ValueError("bad item")
+        return n * 2
+
+    def keep_even_tens(n):
+        return n if n % 4 == 0 else None
+
+    def collect(n):
+        with lock:
+            results.append(n)
+
+    stages = [
+        Stage("double", double, workers=3),
+        Stage("filter", keep_even_tens, workers=2),
+        Stage("collect", collect, workers=2),
+    ]
+    pipeline = StagedPipeline(range(20), stages,
+                              on_error=lambda stage, item, e: errors.append((stage.name, item)))
+    pipeline.run()
+
+    assert sorted(results) == [n * 2 for n in range(20) if n != 7 and (n * 2) % 4 == 0]
+    assert errors == [("double", 7)]
+    assert pipeline.listed == 20
+    assert [s.done for s in stages] == [20, 19, 10]
+    assert stages[0].errors == 1 and stages[1].passed == 10
+    assert "collect q=0 10 done" in pipeline.progress_line()
+
+
+def test_slow_stage_holds_back_the_source():
+    read = []
+
+    def source():
+        for n in range(100):
+            read.append(n)
+            yield n
+
+    release = threading.Event()
+    stages = [Stage("pass", lambda n: n, queue_size=2), Stage("slow", lambda n: release.wait(), queue_size=2)]
+    pipeline = StagedPipeline(source(), stages)
+    runner = threading.Thread(target=pipeline.run)
+    runner.start()
+    time.sleep(0.3)
+
+    # Only the queues and the workers' hands hold items; listing waits
+    assert len(read) <= 2 + 1 + 2 + 1 + 1
+    release.set()
+    runner.join(timeout=5)
+    assert stages[1].done == 100
+
+
+def test_failing_error_handler_does_not_stall_the_pipeline():
+    collected = []
+
+    def fail(n):
+        raise ValueError("bad item")
+
+    def broken_handler(stage, item, error):
+        raise RuntimeError("journal is locked")
+
+    # More items than the queues hold, so a dead worker would block the source
+    pipeline = StagedPipeline(range(20), [
+        Stage("fail", fail, workers=1, queue_size=2),
+        Stage("collect", collected.append, workers=1, queue_size=2),
+    ], on_error=broken_handler)
+    runner = threading.Thread(target=pipeline.run, daemon=True)
+    runner.start()
+    runner.join(timeout=5)
+
+    assert not runner.is_alive()
+    assert pipeline.stages[0].done == 20 and pipeline.stages[0].errors == 20
+    assert collected == []
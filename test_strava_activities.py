@@ -0,0 +1,40 @@
+# test_strava_activities.py
+# Tests for the streaming /athlete/activities paginator.
+
+import strava_activities
+from strava_activities import ActivityPager
+
+class FakeResponse:
+    status_code = 200
+    def __init__(self, activities):
+        self.activities = activities
+    def json(self):
+        return self.activities
+
+class FakeSession:
+    def __init__(self, total):
+        self.total = total
+        self.pages = []
+    def get(self, url, headers=None, params=None):
+        page, per_page = params["page"], params["per_page"]
+        self.pages.append(page)
+        start = (page - 1) * per_page
+        return FakeResponse([{"id": i} for i in range(start, min(start + per_page, self.total))])
+
+def use_fake_session(monkeypatch, total):
+    session = FakeSession(total)
+    monkeypatch.setattr(strava_activities, "get_session", lambda: session)
+    return session
+
+def test_yields_every_page_in_order(monkeypatch):
+    session = use_fake_session(monkeypatch, total=25)
+    pager = ActivityPager(per_page=10, access_token="token")
+    assert [a["id"] for a in pager] == list(range(25))
+    assert pager.exhausted and pager.count == 25
+    assert sorted(session.pages) == [1, 2, 3]
+
+def test_stops_at_limit_without_fetching_unneeded_pages(monkeypatch):
+    session = use_fake_session(monkeypatch, total=100)
+    pager = ActivityPager(per_page=10, limit=15, access_token="token")
+    assert len(list(pager)) == 15
+    assert sorted(session.pages) == [1, 2]
@@ -0,0 +1,40 @@
+# test_strava_tokens.py
+# Tests for token caching, atomic writes and the single-refresh guarantee.
+
+import json
+import time
+
+import strava_tokens
+
+def test_cached_token_reread_only_when_file_changes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    strava_tokens.write_strava_tokens({"access_token": "a", "expires_at": time.time() + 3600})
+    assert strava_tokens.get_valid_access_token() == "a"
+
+    # Another process replaces the file: the cache must notice
+    with open(strava_tokens.TOKEN_FILE, "w") as f:
+        json.dump({"access_token": "b-changed", "expires_at": time.time() + 3600}, f)
+    assert strava_tokens.get_valid_access_token() == "b-changed"
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_refresh_skipped_when_other_worker_refreshed(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    strava_tokens.write_strava_tokens({"access_token": "old", "refresh_token": "r", "expires_at": 0})
+
+    calls = []
+    original_read = strava_tokens.read_strava_tokens
+
+    def read_then_simulate_refresh():
+        tokens = original_read()
+        if not calls:
+            # Another worker finishes its refresh while we wait for the lock
+            calls.append(1)
+            strava_tokens.write_strava_tokens({"access_token": "new", "expires_at": time.time() + 3600})
+        return tokens
+
+    def fail_post(*args, **kwargs):
+        raise AssertionError("should not call Strava")
+
+    monkeypatch.setattr(strava_tokens, "read_strava_tokens", read_then_simulate_refresh)
+    monkeypatch.setattr(strava_tokens.get_session(), "post", fail_post)
+    assert strava_tokens.get_valid_access_token() == "new"
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Webhook Queue Worker
+====================
+
+Drains the durable job queue filled by the `/strava-webhook` endpoint and runs
+the Strava fetch -> Fulcrum create pipeline for each event.
+
+By default the webhook app starts one of these as a background thread in each
+gunicorn worker (WEBHOOK_INLINE_WORKER=true). Claims are atomic, so several
+workers can share one queue safely. Completed jobs older than
+WEBHOOK_JOB_RETENTION_DAYS (default 30) are purged about once an hour.
+It can also be run on its own:
+
+Usage:
+    python3 webhook_worker.py          # Run forever, polling the queue
+    python3 webhook_worker.py --once   # Drain what's queued now and exit
+    python3 webhook_worker.py --status # Show queue counts
+"""
+
+import argparse
+import os
+import threading
+import time
+import traceback
+
+from job_queue import JobQueue
+
+POLL_INTERVAL = 2  # seconds between polls when the queue is empty
+PURGE_INTERVAL = 3600  # seconds between purges of old completed jobs
+JOB_RETENTION_DAYS = int(os.environ.get("WEBHOOK_JOB_RETENTION_DAYS", "30"))
+
+_worker_thread = None
+_worker_lock = threading.Lock()
+
+
+def process_next_job(queue, handler):
+    """Claim one job and run it through the handler.
+
+    Returns:
+        bool: True if a job was processed (successfully or not), False if the queue was empty
+    """
+    job = queue.claim()
+    if job is None:
+        return False
+
+    event = job["event"]
+    print(f"[worker] Processing job {job['id']} (attempt {job['attempts']}): "
+          f"{event.get('object_type')} {event.get('aspect_type')} {event.get('object_id')}")
+
+    try:
+        handler(event)
+    except Exception as e:
+        traceback.print_exc()
+        if queue.fail(job["id"], e):
+            print(f"[worker] Job {job['id']} failed, will retry: {e}")
+        else:
+            print(f"[worker] Job {job['id']} failed permanently: {e}")
+        return True
+
+    queue.complete(job["id"])
+    return True
+
+
+def purge_old_jobs(queue, older_than_days=JOB_RETENTION_DAYS):
+    """Delete old completed jobs so the queue database doesn't grow forever."""
+    try:
+        purged = queue.purge_finished(older_than_days)
+    except Exception as e:
+        print(f"[worker] Error purging finished jobs: {e}")
+        return 0
+    if purged:
+        print(f"[worker] Purged {purged} completed jobs older than {older_than_days} days")
+    return purged
+
+
+def run_worker(handler, queue=None, once=False, poll_interval=POLL_INTERVAL):
+    """Process queued webhook events until stopped (or until empty if once=True)."""
+    queue = queue or JobQueue()
+    next_purge = 0
+    while True:
+        if time.time() >= next_purge:
+            purge_old_jobs(queue)
+            next_purge = time.time() + PURGE_INTERVAL
+
+        try:
+            processed = process_next_job(queue, handler)
+        except Exception as e:
+            # Database trouble shouldn't kill the worker thread
+            print(f"[worker] Error reading job queue: {e}")
+            processed = False
+
+        if not processed:
+            if once:
+                return
+            time.sleep(poll_interval)
+
+
+def start_background_worker(handler):
+    """Start the queue worker as a daemon thread in this process (once)."""
+    global _worker_thread
+    with _worker_lock:
+        if _worker_thread is not None and _worker_thread.is_alive():
+            return _worker_thread
+        _worker_thread = threading.Thread(
+            target=run_worker, args=(handler,), name="webhook-worker", daemon=True
+        )
+        _worker_thread.start()
+        return _worker_thread
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Process queued Strava webhook events')
+    parser.add_argument('--once', action='store_true',
+                        help='Drain the queue and exit instead of polling forever')
+    parser.add_argument('--status', action='store_true',
+                        help='Print job counts by status and exit')
+    args = parser.parse_args()
+
+    queue = JobQueue()
+
+    if args.status:
+        counts = queue.counts()
+        for status in ('pending', 'processing', 'done', 'failed'):
+            print(f"{status:>10}: {counts.get(status, 0)}")
+        return 0
+
+    from strava_webhook_dual_form import process_webhook_event
+    run_worker(process_webhook_event, queue=queue, once=args.once)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())